@@ -1,789 +1,24 @@
-import logging
-import os
-import re
-import shutil
-import subprocess
-import tempfile
-import warnings
-from pathlib import Path
-
-from .version import __version__
-
-DEFAULT_MODEL_NAME = "google:gemini-3.7-flash"
-
-
-def map_ai_key(ai_key: str, model_name: str):
-    """
-    Maps the universal AIAUTOCOMMIT_AI_KEY to the provider-specific environment variable name.
-
-    This allows a single configuration variable to work across different providers (OpenAI,
-    Anthropic, Gemini, etc.) by detecting the provider from the model name.
-
-    Specific keys (e.g. OPENAI_API_KEY) already present in the environment take precedence.
-    """
-    provider = model_name.split(":")[0]
-
-    # Map the universal key to the provider-specific environment variable name
-    # https://ai.pydantic.dev/models/overview/
-    mapping = {
-        "openai": "OPENAI_API_KEY",
-        "anthropic": "ANTHROPIC_API_KEY",
-        "google": "GOOGLE_API_KEY",
-        "gemini": "GOOGLE_API_KEY",
-        "azure": "AZURE_OPENAI_API_KEY",
-        "groq": "GROQ_API_KEY",
-        "mistral": "MISTRAL_API_KEY",
-        "cohere": "CO_API_KEY",
-    }
-
-    if target_key := mapping.get(provider):
-        # Only set if not already present (specific keys take precedence)
-        if target_key not in os.environ:
-            os.environ[target_key] = ai_key
-
-
-def update_env_variables():
-    """
-    Allow keys specific to AIAUTOCOMMIT to be set globally so project-specific keys can be used for AI calls.
-    """
-    prefix = "AIAUTOCOMMIT_"
-    # Create a list copy of keys to avoid "dictionary changed size during iteration" errors
-    # as we update os.environ within the loop.
-    for key in list(os.environ.keys()):
-        if key.startswith(prefix):
-            base_key = key[len(prefix) :]
-            # AIAUTOCOMMIT_ prefixed variables take precedence over existing variables
-            os.environ[base_key] = os.environ[key]
-
-    # Handle universal AIAUTOCOMMIT_AI_KEY mapping
-    if ai_key := os.environ.get("AIAUTOCOMMIT_AI_KEY"):
-        model_name = os.environ.get("AIAUTOCOMMIT_MODEL", DEFAULT_MODEL_NAME)
-        map_ai_key(ai_key, model_name)
-
-
-update_env_variables()
-
-from importlib.metadata import PackageNotFoundError, version  # noqa: E402
-
-import click  # noqa: E402
-from pydantic_ai import Agent, ModelSettings  # noqa: E402
-from pydantic_ai.exceptions import (  # noqa: E402
-    ModelAPIError,
-    ModelHTTPError,
-    UserError,
-)
-
-from .internet import wait_for_internet_connection  # noqa: E402
-from .log import log  # noqa: E402
-from .pull_request import get_pull_request_context  # noqa: E402
-from .timing import log_execution_time  # noqa: E402
-from .utils import (  # noqa: E402
-    GIT_SAFE_DIFF_FLAGS,
-    get_current_branch,
-    run_command,
-    safe_git_cmd,
-    safe_git_diff_cmd,
-)
-
-
-def is_local_source_checkout() -> bool:
-    package_dir = Path(__file__).resolve().parent
-    repo_root = package_dir.parent
-
-    return (repo_root / ".git").exists() and (repo_root / "pyproject.toml").exists()
+"""
+Generate commit messages with AI.
 
+The package root stays light: `aiautocommit.api` and `aiautocommit.config` can be imported without loading the
+CLI (click, and the mapping of `AIAUTOCOMMIT_` variables into the environment), which lives in `aiautocommit.cli`.
+"""
 
-def get_cli_version() -> str:
-    if not is_local_source_checkout():
-        return __version__
-
-    if __version__.endswith(".dev"):
-        return __version__
-
-    return f"{__version__}.dev"
+from importlib import metadata
 
+from .env import DEFAULT_MODEL_NAME  # noqa: F401
+from .version import __version__
 
 try:
-    __version__ = version("aiautocommit")
-except PackageNotFoundError:
+    __version__ = metadata.version("aiautocommit")
+except metadata.PackageNotFoundError:
     # Package is not installed in the environment (e.g. running from source during development)
     __version__ = "unknown"
 
 
-# Config file locations in priority order
-LOCAL_REPO_AUTOCOMMIT_DIR_NAME = ".aiautocommit"
-CONFIG_PATHS = [
-    Path(LOCAL_REPO_AUTOCOMMIT_DIR_NAME),  # $PWD/.aiautocommit
-    Path(os.environ.get("XDG_CONFIG_HOME", "~/.config")).expanduser()
-    / "aiautocommit",  # XDG config dir
-    Path(__file__).parent / "prompt",  # package config dir
-]
-
-if custom_config_path := os.environ.get("AIAUTOCOMMIT_CONFIG", None):
-    CONFIG_PATHS.insert(-2, Path(custom_config_path))
-
-COMMIT_PROMPT_FILE = "commit_prompt.txt"
-EXCLUSIONS_FILE = "excluded_files.txt"
-COMMIT_SUFFIX_FILE = "commit_suffix.txt"
-
-# https://ai.pydantic.dev/models/overview
-MODEL_NAME = os.environ.get("AIAUTOCOMMIT_MODEL", DEFAULT_MODEL_NAME)
-
-COMMIT_PROMPT = ""
-EXCLUDED_FILES = []
-
-# trailers are a native git feature that can be used to add metadata to a commit
-# https://git-scm.com/docs/git-interpret-trailers
-# GitHub requires two blank lines before trailers for some features to work correctly
-# See: https://github.com/orgs/community/discussions/143092
-# Note: This may require `git commit --cleanup=verbatim` to prevent git from collapsing the blank lines.
-# let's indicate that this message was generated by aiautocommit
-COMMIT_SUFFIX = ""
-
-# characters, not tokens
-_prompt_cutoff_env = os.environ.get("AIAUTOCOMMIT_PROMPT_CUTOFF", "10000")
-PROMPT_CUTOFF = None if _prompt_cutoff_env == "*" else int(_prompt_cutoff_env)
-
-LOCK_FILE_MESSAGES = {
-    "uv.lock": "chore(deps): update uv.lock",
-    "poetry.lock": "chore(deps): update poetry.lock",
-    "Pipfile.lock": "chore(deps): update Pipfile.lock",
-    "package-lock.json": "chore(deps): update package-lock.json",
-    "yarn.lock": "chore(deps): update yarn.lock",
-    "pnpm-lock.yaml": "chore(deps): update pnpm-lock.yaml",
-    "bun.lockb": "chore(deps): update bun.lockb",
-    "bun.lock": "chore(deps): update bun.lock",
-    "Gemfile.lock": "chore(deps): update Gemfile.lock",
-    "composer.lock": "chore(deps): update composer.lock",
-    "mix.lock": "chore(deps): update mix.lock",
-    "mise.lock": "chore(deps): update mise.lock",
-    "Cargo.lock": "chore(deps): update Cargo.lock",
-    "go.sum": "chore(deps): update go.sum",
-    ".terraform.lock.hcl": "chore(deps): update .terraform.lock.hcl",
-}
-
-
-# this is called within py dev environments. Unless it looks like we are explicitly debugging aiautocommit, we force a
-# more silent operation. Checking for AIAUTOCOMMIT_LOG_PATH is not a perfect heuristic, but it works for now.
-if not os.environ.get("AIAUTOCOMMIT_LOG_PATH"):
-    # Suppress ResourceWarnings
-    warnings.filterwarnings("ignore", category=ResourceWarning)
-
-    # Optional: Disable httpx logging if desired
-    logging.getLogger("httpx").setLevel(logging.WARNING)
-
-
-def configure_prompts(config_dir=None):
-    global COMMIT_PROMPT, COMMIT_SUFFIX, EXCLUDED_FILES, CONFIG_PATHS
-
-    # Use custom config_dir if provided; otherwise use the default prompt directory
-    if config_dir:
-        CONFIG_PATHS.insert(0, Path(config_dir))
-
-    # Skip .aiautocommit if it's a file — file mode appends to the base prompt rather than replacing it
-    config_dir = next((path for path in CONFIG_PATHS if path and path.is_dir()), None)
-
-    if not config_dir:
-        log.debug("No config directory found")
-        return
-
-    log.debug(f"Found config directory at {config_dir}")
-
-    commit_file = config_dir / COMMIT_PROMPT_FILE
-    if commit_file.exists():
-        log.debug("Loading commit prompt")
-        COMMIT_PROMPT = commit_file.read_text().strip()
-    else:
-        log.debug(f"'commit_prompt.txt' does not exist in {config_dir}")
-
-    # A plain .aiautocommit file (not a directory) lets developers extend the stock prompt without fully replacing it
-    local_append_file = Path(LOCAL_REPO_AUTOCOMMIT_DIR_NAME)
-    if local_append_file.is_file():
-        log.debug("found .aiautocommit file, appending to prompt")
-        COMMIT_PROMPT += "\n\n" + local_append_file.read_text().strip()
-
-    examples_dir = config_dir / "examples"
-    if examples_dir.exists():
-        log.debug("Loading examples")
-        pattern = re.compile(r"example_\d\.md$")
-        example_files = sorted(
-            [
-                file
-                for file in examples_dir.iterdir()
-                if file.is_file() and pattern.match(file.name)
-            ],
-            key=lambda f: f.name,
-        )
-
-        if example_files:
-            COMMIT_PROMPT += "\n\n## Examples\n"
-
-        for file in example_files:
-            log.debug(f"Adding example from {file}")
-            COMMIT_PROMPT += "\n\n" + file.read_text().strip() + "\n\n"
-    else:
-        log.debug(f"'examples' directory does not exist in {config_dir}")
-
-    exclusions_file = config_dir / EXCLUSIONS_FILE
-    if exclusions_file.exists():
-        log.debug("Loading exclusions")
-        EXCLUDED_FILES = [
-            line.strip()
-            for line in exclusions_file.read_text().splitlines()
-            if line.strip()
-        ]
-    else:
-        log.debug(f"'{EXCLUSIONS_FILE}' does not exist in {config_dir.absolute()}")
-
-    commit_suffix_file = config_dir / COMMIT_SUFFIX_FILE
-    if commit_suffix_file.exists():
-        log.debug("Loading custom commit suffix")
-        # GitHub requires two blank lines before trailers for some features to work correctly
-        # See: https://github.com/orgs/community/discussions/143092
-        # Note: This may require `git commit --cleanup=verbatim` to prevent git from collapsing the blank lines.
-        COMMIT_SUFFIX = "\n\n\n" + commit_suffix_file.read_text().strip()
-    else:
-        log.debug(f"'{COMMIT_SUFFIX_FILE}' does not exist in {config_dir.absolute()}")
-
-
-def get_diff_size(section: list[str]) -> int:
-    """Calculate the number of changed lines in a diff section."""
-    try:
-        i = next(j for j, line in enumerate(section) if line.startswith("@@"))
-        return sum(
-            1 for line in section[i:] if line.startswith("+") or line.startswith("-")
-        )
-    except StopIteration:
-        return 0
-
-
-def sort_git_diff(diff_str: str) -> str:
-    """Sort git diff string by number of changed lines, smallest first."""
-    if not diff_str:
-        return diff_str
-
-    lines: list[str] = diff_str.splitlines()
-    sections: list[list[str]] = []
-    current_section: list[str] = []
-
-    for line in lines:
-        if line.startswith("diff --git"):
-            if current_section:
-                sections.append(current_section)
-            current_section = [line]
-        else:
-            current_section.append(line)
-    if current_section:
-        sections.append(current_section)
-
-    sorted_sections: list[list[str]] = sorted(sections, key=get_diff_size)
-    return "\n".join("\n".join(section) for section in sorted_sections)
-
-
-def get_diff(ignore_whitespace=True):
-    arguments = safe_git_diff_cmd()
-
-    if ignore_whitespace:
-        arguments += [
-            "--ignore-space-change",
-            "--ignore-blank-lines",
-        ]
-
-    for file in EXCLUDED_FILES:
-        arguments += [f":(exclude)**{file}"]
-
-    diff_process = run_command(
-        arguments,
-        timing_label=f"Running git diff command: {arguments}",
-    )
-    diff_process.check_returncode()
-    normalized_diff = diff_process.stdout.strip()
-
-    # Sort the diff output by size (smallest diffs first)
-    sorted_diff = sort_git_diff(normalized_diff)
-
-    log.debug(f"Discovered Diff (sorted by size):\n{sorted_diff}")
-
-    return sorted_diff
-
-
-class UserFacingError(click.ClickException):
-    """Configuration/usage error shown as a single red line (no traceback)."""
-
-    def show(self, file=None):
-        click.secho(self.format_message(), fg="red", err=True)
-
-
-@log_execution_time("ai_generation")
-def complete(prompt, diff):
-    if PROMPT_CUTOFF is not None and len(diff) > PROMPT_CUTOFF:
-        log.info(
-            f"Prompt length ({len(diff)}) exceeds the maximum allowed length, truncating."
-        )
-
-    # Allow custom provider settings via environment variables
-    # Pydantic AI automatically handles OPENAI_API_KEY, ANTHROPIC_API_KEY, etc.
-    # but we map our legacy/custom prefixes if they exist and standard ones don't
-
-    try:
-        # Create the agent with the configured model
-        agent = Agent(MODEL_NAME, system_prompt=prompt)
-
-        model_settings: ModelSettings | None = None
-        from pydantic_ai.models.google import GoogleModel
-
-        if isinstance(agent.model, GoogleModel):
-            # Gemini 3.7+ rejects thinking_level=minimal; low is the cheapest
-            # level still accepted across current Gemini models.
-            # https://ai.pydantic.dev/models/google/#configure-thinking
-            model_settings = ModelSettings(thinking="low")
-
-        # Run the agent synchronously
-        result = agent.run_sync(diff[:PROMPT_CUTOFF], model_settings=model_settings)
-    except UserError as e:
-        raise UserFacingError(e.message) from None
-    except ModelHTTPError as e:
-        log.warning(
-            f"AI model is currently unavailable (HTTP {e.status_code}). "
-            "Falling back to manual commit message."
-        )
-        return "# aiautocommit: AI model unavailable. Falling back to manual message."
-    except ModelAPIError as e:
-        log.warning(f"AI API error: {e}. Falling back to manual commit message.")
-        return "# aiautocommit: AI model unavailable. Falling back to manual message."
-
-    # Pydantic AI returns a RunResult object, we need the output data
-    completion = result.output
-
-    if completion is None:
-        return ""
-    return completion.strip()
-
-
-def generate_commit_message(diff):
-    if not diff:
-        log.debug("No commit message generated")
-        return ""
-
-    branch = get_current_branch()
-    prompt = COMMIT_PROMPT
-    if branch:
-        repo_info = f"## Repo Information\n- Current branch: {branch}\n"
-
-        pr_context = get_pull_request_context(branch)
-        if pr_context:
-            repo_info += f"\n{pr_context}\n"
-
-        if "## Examples" in prompt:
-            prompt = prompt.replace("## Examples", f"{repo_info}\n## Examples")
-        else:
-            prompt = f"{prompt}\n\n{repo_info}"
-
-    message = complete(prompt, diff)
-    # If the generated message is empty, do not add the commit suffix.
-    if not message.strip() or message.strip() == '""':
-        return ""
-    if message.strip().startswith("#"):
-        return message
-    return message + COMMIT_SUFFIX
-
-
-def git_commit(message):
-    # will ignore message if diff is empty
-    args = ["git", "commit"]
-    temp_path = None
-
-    if message:
-        if message.startswith("#"):
-            # Write to a temp file and use as a template so Git still appends the status and diff (if commit.verbose=true)
-            fd, temp_path = tempfile.mkstemp(text=True)
-            with os.fdopen(fd, "w") as f:
-                f.write(f"{message}\n\n")
-            args += ["--template", temp_path]
-        else:
-            args += ["--message", message]
-
-    args.append("--edit")
-
-    try:
-        return run_command(
-            args,
-            capture_output=False,
-        ).returncode
-    finally:
-        if temp_path:
-            os.remove(temp_path)
-
-
-def get_git_dir():
-    try:
-        return Path(
-            run_command(
-                ["git", "rev-parse", "--git-dir"],
-                check=True,
-            ).stdout.strip()
-        )
-    except subprocess.CalledProcessError:
-        return None
-
-
-def is_reversion(commit_msg_path=None):
-    git_dir = get_git_dir()
-    if not git_dir:
-        return False
-
-    # Check if we're in the middle of a git revert
-    if (git_dir / "REVERT_HEAD").exists():
-        return True
-
-    # Or a merge
-    if (git_dir / "MERGE_MSG").exists():
-        return True
-
-    # Detect fixup commits by checking if the commit message starts with "fixup!"
-    # If commit_msg_path is provided, use it. If not, we don't want to use the stale COMMIT_EDITMSG.
-    if not commit_msg_path:
-        return False
-
-    commit_editmsg = Path(commit_msg_path)
-
-    if commit_editmsg.exists():
-        try:
-            first_line = commit_editmsg.read_text(
-                encoding="utf-8", errors="ignore"
-            ).splitlines()[0]
-            if first_line.startswith("fixup!"):
-                return True
-        except IndexError:
-            pass
-
-        # Check if a commit amend is happening by comparing the commit edit message
-        # with the last commit message (which is pre-populated during amend)
-        try:
-            current_first_line = (
-                commit_editmsg.read_text(encoding="utf-8", errors="ignore")
-                .splitlines()[0]
-                .strip()
-            )
-            head_first_line = (
-                run_command(
-                    ["git", "log", "-1", "--pretty=%B"],
-                )
-                .stdout.splitlines()[0]
-                .strip()
-            )
-            if current_first_line == head_first_line:
-                return True
-        except Exception:
-            pass
-
-    return False
-
-
-def check_lock_files():
-    """
-    Check if only lock files are changed and return a standard commit message if so.
-    """
-    staged_files = get_staged_files()
-    if not staged_files:
-        return None
-
-    # Mapping of filename to commit message
-    messages = []
-
-    for file_path in staged_files:
-        filename = Path(file_path).name
-
-        if filename in LOCK_FILE_MESSAGES:
-            messages.append(LOCK_FILE_MESSAGES[filename])
-        elif filename.startswith("mise") and filename.endswith("lock"):
-            messages.append(f"chore(deps): update {filename}")
-        else:
-            # If any file is not a recognized lock file, we can't use a static message
-            return None
-
-    if not messages:
-        return None
-
-    # If we are here, all staged files are recognized lock files
-    unique_messages = set(messages)
-
-    if len(unique_messages) == 1:
-        return unique_messages.pop() + COMMIT_SUFFIX
-
-    return "chore(deps): update lock files" + COMMIT_SUFFIX
-
-
-def echo_cli_version(ctx: click.Context, param: click.Parameter, value: bool) -> None:
-    if not value or ctx.resilient_parsing:
-        return
-
-    prog_name = ctx.find_root().info_name or "aiautocommit"
-    click.echo(f"{prog_name}, version {get_cli_version()}")
-    click.echo(f"model: {MODEL_NAME}")
-    ctx.exit()
-
-
-@click.group(invoke_without_command=True)
-@click.option(
-    "--version",
-    is_flag=True,
-    expose_value=False,
-    is_eager=True,
-    callback=echo_cli_version,
-    help="Show the version and configured model and exit.",
-)
 def main():
-    """
-    Generate a commit message for staged files and commit them.
-    Git will prompt you to edit the generated commit message.
-    """
-    ctx = click.get_current_context()
-    if ctx.invoked_subcommand is None:
-        ctx.invoke(commit)
-
-
-def get_staged_files() -> list[str]:
-    """Get a list of all staged files."""
-    result = run_command([*safe_git_diff_cmd(), "--name-only"])
-    return result.stdout.strip().splitlines()
-
-
-@main.command()
-@click.option(
-    "-p",
-    "--print-message",
-    is_flag=True,
-    default=False,
-    help="print commit msg to stdout instead of performing commit",
-)
-@click.option(
-    "-o",
-    "--output-file",
-    type=click.Path(writable=True),
-    help="write commit message to specified file",
-)
-@click.option(
-    "--config-dir",
-    type=click.Path(exists=True, file_okay=False, dir_okay=True),
-    help="specify custom config directory",
-)
-def commit(print_message, output_file, config_dir):
-    """
-    Generate commit message from git diff.
-    """
-
-    # click.get_current_context().exit() is used instead of sys.exit() because it's the
-    # idiomatic way to exit in Click, allowing for proper context cleanup and better testability.
-    if is_reversion(output_file):
-        click.get_current_context().exit(0)
-
-    with log_execution_time("overall_execution"):
-        configure_prompts(config_dir)
-
-        try:
-            staged_diff = get_diff(ignore_whitespace=False)
-
-            if not staged_diff:
-                # If no staged diff (likely due to exclusions), check if we have any staged files
-                # that we can handle with a static commit message.
-                if lock_message := check_lock_files():
-                    commit_message = lock_message
-                    log.info(
-                        f"Detected lock file change, using message: {commit_message}"
-                    )
-                else:
-                    click.echo(
-                        "No changes staged. Use `git add` to stage files before invoking aiautocommit.",
-                        err=True,
-                    )
-                    click.get_current_context().exit(1)
-            else:
-                diff = get_diff()
-                if not diff:
-                    commit_message = "style: whitespace change" + COMMIT_SUFFIX
-                else:
-                    try:
-                        wait_for_internet_connection()
-                    except Exception:
-                        log.warning("No internet connection. Skipping AI completion.")
-                        click.get_current_context().exit(0)
-
-                    commit_message = generate_commit_message(diff)
-        except UnicodeDecodeError:
-            click.echo("aiautocommit does not support binary files", err=True)
-
-            commit_message = (
-                # TODO use heredoc
-                "# aiautocommit does not support binary files. "
-                "Please enter a commit message manually or unstage any binary files."
-            )
-
-        if output_file:
-            if commit_message:
-                out_path = Path(output_file)
-                original_content = out_path.read_text() if out_path.exists() else ""
-                if original_content:
-                    out_path.write_text(f"{commit_message}\n\n{original_content}")
-                else:
-                    out_path.write_text(commit_message)
-            click.get_current_context().exit(0)
-        elif print_message:
-            click.echo(commit_message)
-            click.get_current_context().exit(0)
-        else:
-            click.get_current_context().exit(git_commit(commit_message))
-
-
-@main.command()
-@click.option(
-    "--overwrite",
-    is_flag=True,
-    help="Overwrite existing pre-commit hook if it exists",
-)
-@click.option(
-    "--skip-edit",
-    is_flag=True,
-    help="Set local core.editor to true so git commit does not open an editor after the hook",
-)
-def install(overwrite, skip_edit):
-    """Install pre-commit script into git hooks directory"""
-    git_result = run_command(
-        ["git", "rev-parse", "--git-path", "hooks"],
-        check=True,
-    )
-
-    target_hooks_dir = Path(git_result.stdout.strip())
-    target_hooks_dir.mkdir(exist_ok=True, parents=True)
-
-    commit_msg_git_hook_name = "prepare-commit-msg"
-    pre_commit = target_hooks_dir / commit_msg_git_hook_name
-    pre_commit_script = Path(__file__).parent / commit_msg_git_hook_name
-
-    if not pre_commit.exists() or overwrite:
-        pre_commit.write_text(pre_commit_script.read_text())
-        pre_commit.chmod(0o755)
-        click.echo("Installed pre-commit hook")
-    else:
-        click.echo(
-            "pre-commit hook already exists. Here's the contents we would have written:\n"
-        )
-        click.echo(pre_commit_script.read_text())
-
-    if skip_edit:
-        run_command(
-            ["git", "config", "core.editor", "true"],
-            check=True,
-        )
-        click.echo("Set local core.editor=true (git commit will skip the editor)")
-
-
-@main.command()
-def uninstall():
-    """Remove pre-commit script from git hooks directory"""
-    git_result = run_command(
-        ["git", "rev-parse", "--git-path", "hooks"],
-        check=True,
-    )
-
-    target_hooks_dir = Path(git_result.stdout.strip())
-    commit_msg_git_hook_name = "prepare-commit-msg"
-    pre_commit = target_hooks_dir / commit_msg_git_hook_name
-
-    if pre_commit.exists():
-        pre_commit.unlink()
-        click.echo("Removed pre-commit hook")
-    else:
-        click.echo("pre-commit hook not found")
-
-
-@main.command()
-def dump_prompts():
-    "Dump default prompts by copying the contents of the prompt directory to PWD for customization"
-
-    config_dir = Path(LOCAL_REPO_AUTOCOMMIT_DIR_NAME)
-    config_dir.mkdir(exist_ok=True)
-    source_prompt_dir = Path(__file__).parent / "prompt"
-
-    if not source_prompt_dir.exists():
-        click.echo("Source prompt directory does not exist; nothing to copy.")
-        return
-
-    # Copy each item from source_prompt_dir into config_dir
-    for item in source_prompt_dir.iterdir():
-        target = config_dir / item.name
-        if target.exists():
-            click.echo(f"{target} already exists. Skipping copy of {item.name}.")
-            continue
-        if item.is_dir():
-            shutil.copytree(item, target)
-        else:
-            shutil.copy(item, target)
-
-    click.echo(f"Copied contents of {source_prompt_dir} to {config_dir}")
-
-
-@main.command()
-def output_prompt():
-    "Dump compiled prompt, helpful for debugging"
-
-    configure_prompts()
-    click.echo(COMMIT_PROMPT)
-
-
-@main.command()
-def output_exclusions():
-    "Dump file exclusions, helpful for debugging"
-
-    configure_prompts()
-    click.echo(EXCLUDED_FILES)
-
-
-@main.command()
-@click.argument("sha")
-@click.argument("message")
-def debug_prompt(sha, message):
-    """
-    Generate a ChatGPT-ready block for iterating on the prompt.
-
-    SHA is the commit to debug. MESSAGE describes what was wrong with the
-    generated commit message (e.g. "the subject line was too vague"). The
-    output includes the diff, the generated commit message, and the full
-    system prompt — paste it into ChatGPT to get improvement suggestions.
-    """
-    configure_prompts()
-
-    diff_cmd = [*safe_git_cmd(), "show", *GIT_SAFE_DIFF_FLAGS, sha, "--pretty="]
-    diff_output = run_command(diff_cmd).stdout
-
-    commit_msg_cmd = ["git", "log", "--format=%B", "-n", "1", sha]
-    commit_message = run_command(commit_msg_cmd).stdout
-
-    # remove the fixed commit suffix
-    commit_message = commit_message.replace(COMMIT_SUFFIX, "").strip()
-
-    click.echo(f"""
-Your job is to help me improve a prompt that is being sent to an LLM in order to write a get commit message.
-
-{message}
-
-Explain why and suggest a improved prompt (without examples) in a markdown block. Keep your response concise.
-
-Here is the diff:
-
-```
-{diff_output}
-```
-
-Here was the commit message that was generated:
-
-```
-{commit_message}
-```
-
-It was written using the following LLM prompt:
-
----
+    """Entry point kept for installs whose console script still points at `aiautocommit:main`."""
+    from .cli import main
 
-{COMMIT_PROMPT}
-""")
+    return main()
@@ -0,0 +1,266 @@
+"""
+Async Python API.
+
+    config = AutoCommitConfig.from_config_dir(".aiautocommit")
+    message = await AutoCommit(config).generate("path/to/repo")
+
+Everything is read from the config object and the repository path rather than module globals or the working
+directory, so generations for several repositories can run concurrently in one event loop. Git and diff
+processing run in worker threads; only the model call is awaited directly.
+"""
+
+import asyncio
+from pathlib import Path
+
+from pydantic_ai.exceptions import UserError
+
+from .completion import complete_async
+from .config import AutoCommitConfig
+from .diff import compact_diff, dedupe_hunks, sort_git_diff
+from .lock_files import get_lock_file_message
+from .log import log
+from .pull_request import get_pull_request_context
+from .ranking import rank_git_diff
+from .reducers import BLOB_REVISIONS, reduce_diff
+from .repo import get_current_branch, get_repo_context, repo_context
+from .utils import (
+    GIT_SAFE_DIFF_FLAGS,
+    REPO_PATH,
+    compact_git_diff_flags,
+    run_command,
+    safe_git_cmd,
+    safe_git_diff_cmd,
+)
+
+WHITESPACE_MESSAGE = "style: whitespace change"
+
+
+class AutoCommitError(Exception):
+    """Nothing to generate a message for, or the model is misconfigured."""
+
+
+def order_diff(diff_str: str, config: AutoCommitConfig) -> str:
+    if config.diff_order == "size":
+        return sort_git_diff(diff_str)
+
+    return rank_git_diff(diff_str, config.ranking_weights, config.ranking_scorer)
+
+
+def get_diff_flags(
+    config: AutoCommitConfig, ignore_whitespace: bool = True
+) -> list[str]:
+    """Flags and pathspecs shared by every diff sent to the model."""
+    arguments = []
+
+    if config.diff_mode == "compact":
+        arguments += compact_git_diff_flags(config.diff_context, config.diff_algorithm)
+
+    if ignore_whitespace:
+        arguments += [
+            "--ignore-space-change",
+            "--ignore-blank-lines",
+        ]
+
+    return arguments
+
+
+def get_exclusion_pathspecs(config: AutoCommitConfig) -> list[str]:
+    return [f":(exclude)**{file}" for file in config.excluded_files]
+
+
+def process_diff(diff_str: str, config: AutoCommitConfig) -> str:
+    """Encode, reduce, deduplicate and order a diff as it is sent to the model."""
+    if config.diff_mode == "compact":
+        diff_str = compact_diff(diff_str)
+
+    diff_str = reduce_diff(diff_str, list(config.reducers))
+    diff_str = dedupe_hunks(diff_str)
+
+    sorted_diff = order_diff(diff_str, config)
+
+    # passed as a field so the diff is only formatted when debug logging is on
+    log.debug("Discovered diff", order=config.diff_order, diff=sorted_diff)
+
+    return sorted_diff
+
+
+def get_head_tree() -> str:
+    """HEAD, or the empty tree before the first commit."""
+    if get_repo_context().head_commit:
+        return "HEAD"
+
+    return run_command(
+        ["git", "hash-object", "-t", "tree", "--stdin"], input="", check=True
+    ).stdout.strip()
+
+
+def get_staged_diff(
+    config: AutoCommitConfig,
+    ignore_whitespace: bool = True,
+    base: str | None = None,
+    tree: str | None = None,
+) -> str:
+    """
+    The staged diff, encoded, reduced and ordered as it is sent to the model.
+
+    `tree` is a tree written from the index earlier, see `get_staged_tree_id`. It is diffed instead of the
+    index, so a caller that already knows the tree id gets that tree's diff even if the index changed since.
+    """
+    if tree:
+        arguments = [
+            *safe_git_cmd(),
+            "diff",
+            *GIT_SAFE_DIFF_FLAGS,
+            base or get_head_tree(),
+            tree,
+        ]
+    else:
+        arguments = safe_git_diff_cmd()
+
+        # compare the index against another tree instead of HEAD, used for incremental updates
+        if base:
+            arguments.append(base)
+
+    arguments += get_diff_flags(config, ignore_whitespace)
+    arguments += get_exclusion_pathspecs(config)
+
+    diff_process = run_command(
+        arguments,
+        timing_label=f"Running git diff command: {arguments}",
+    )
+    diff_process.check_returncode()
+
+    if not base and not tree:
+        return process_diff(diff_process.stdout.strip(), config)
+
+    # reducers read file contents from the same sides as the diff, not HEAD and the index
+    token = BLOB_REVISIONS.set((base or "HEAD", tree or ""))
+    try:
+        return process_diff(diff_process.stdout.strip(), config)
+    finally:
+        BLOB_REVISIONS.reset(token)
+
+
+def get_commit_diff(config: AutoCommitConfig, sha: str) -> str:
+    """The diff a historical commit introduced, processed like the staged diff would have been."""
+    arguments = [
+        *safe_git_cmd(),
+        "show",
+        *GIT_SAFE_DIFF_FLAGS,
+        "--pretty=",
+        *get_diff_flags(config),
+        sha,
+        "--",
+        *get_exclusion_pathspecs(config),
+    ]
+    diff = run_command(arguments, check=True).stdout.strip()
+
+    # reducers compare the commit with its parent instead of HEAD with the index
+    token = BLOB_REVISIONS.set((f"{sha}^", sha))
+    try:
+        return process_diff(diff, config)
+    finally:
+        BLOB_REVISIONS.reset(token)
+
+
+def get_staged_files() -> list[str]:
+    """Get a list of all staged files."""
+    result = run_command([*safe_git_diff_cmd(), "--name-only"])
+    return result.stdout.strip().splitlines()
+
+
+def build_prompt(prompt: str, branch: str | None, pr_context: str | None) -> str:
+    """Add repository information to the prompt, ahead of the examples so they stay last."""
+    if not branch:
+        return prompt
+
+    repo_info = f"## Repo Information\n- Current branch: {branch}\n"
+
+    if pr_context:
+        repo_info += f"\n{pr_context}\n"
+
+    if "## Examples" in prompt:
+        return prompt.replace("## Examples", f"{repo_info}\n## Examples")
+
+    return f"{prompt}\n\n{repo_info}"
+
+
+def finalize_message(message: str, suffix: str) -> str:
+    # If the generated message is empty, do not add the commit suffix.
+    if not message.strip() or message.strip() == '""':
+        return ""
+    if message.strip().startswith("#"):
+        return message
+    return message + suffix
+
+
+class AutoCommit:
+    """
+    Generate commit messages for the staged changes of any repository.
+
+    Holds no state between calls besides its config, so one instance can serve many repositories.
+    """
+
+    def __init__(self, config: AutoCommitConfig | None = None):
+        self.config = config or AutoCommitConfig.from_config_dir()
+
+    async def generate(self, repo_path: str | Path = ".") -> str:
+        """
+        Return a commit message for the changes staged in `repo_path`.
+
+        Messages starting with `#` are fallbacks for the user to replace, e.g. when the model is unavailable.
+        Raises `AutoCommitError` when nothing is staged.
+        """
+        token = REPO_PATH.set(Path(repo_path).resolve())
+        try:
+            with repo_context():
+                return await self._generate()
+        finally:
+            REPO_PATH.reset(token)
+
+    async def _generate(self) -> str:
+        config = self.config
+
+        try:
+            staged_diff = await asyncio.to_thread(get_staged_diff, config, False)
+
+            if not staged_diff:
+                # likely only excluded files are staged, which may still get a static message
+                staged_files = await asyncio.to_thread(get_staged_files)
+                if lock_message := get_lock_file_message(staged_files):
+                    return lock_message + config.suffix
+
+                raise AutoCommitError("No changes staged")
+
+            diff = await asyncio.to_thread(get_staged_diff, config)
+        except UnicodeDecodeError:
+            raise AutoCommitError("Binary files are not supported") from None
+
+        if not diff:
+            return WHITESPACE_MESSAGE + config.suffix
+
+        prompt = await asyncio.to_thread(self.get_prompt)
+        message = await self.complete(prompt, diff)
+
+        return finalize_message(message, config.suffix)
+
+    def get_prompt(self) -> str:
+        branch = get_current_branch()
+        pr_context = (
+            get_pull_request_context(
+                branch,
+                enabled=self.config.include_pr_context,
+                summary_model=(
+                    self.config.model_name if self.config.summarize_pr_context else None
+                ),
+            )
+            if branch
+            else None
+        )
+        return build_prompt(self.config.prompt, branch, pr_context)
+
+    async def complete(self, prompt: str, diff: str) -> str:
+        try:
+            return await complete_async(prompt, diff, self.config)
+        except UserError as e:
+            raise AutoCommitError(e.message) from None
@@ -0,0 +1,126 @@
+"""
+Per-run debug bundles.
+
+With `AIAUTOCOMMIT_DEBUG_BUNDLE=true`, every `commit` writes a gzipped JSON file to `.git/aiautocommit/runs/`
+holding the compiled prompt, the diff as sent, the model response, token usage and stage timings. Pass one to
+`aiautocommit debug-prompt` instead of a commit to iterate on the prompt with exactly what the model saw.
+
+The file is written from a background thread so compressing it doesn't delay `git commit`.
+"""
+
+import gzip
+import json
+import os
+import threading
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import UTC, datetime
+from pathlib import Path
+
+from .log import log
+from .repo import get_cache_dir
+
+DEBUG_BUNDLE_ENABLED = os.environ.get("AIAUTOCOMMIT_DEBUG_BUNDLE", "false").lower() in (
+    "true",
+    "1",
+    "yes",
+)
+
+DEBUG_BUNDLE_DIR = "runs"
+DEBUG_BUNDLE_SUFFIX = ".json.gz"
+
+# older bundles are deleted once a run writes a new one
+MAX_DEBUG_BUNDLES = 20
+
+
+class DebugBundle:
+    def __init__(self):
+        self.created_at = datetime.now(UTC)
+        self.fields: dict = {"created_at": self.created_at.isoformat()}
+
+    def record(self, **fields) -> None:
+        self.fields.update(fields)
+
+    def write(self, bundle_dir: Path) -> Path:
+        bundle_dir.mkdir(parents=True, exist_ok=True)
+        path = bundle_dir / (
+            self.created_at.strftime("%Y%m%dT%H%M%S%fZ") + DEBUG_BUNDLE_SUFFIX
+        )
+
+        # unknown values, e.g. provider specific usage details, are kept as their string form
+        path.write_bytes(
+            gzip.compress(json.dumps(self.fields, default=str, indent=2).encode())
+        )
+
+        for stale_bundle in sorted(bundle_dir.glob(f"*{DEBUG_BUNDLE_SUFFIX}"))[
+            :-MAX_DEBUG_BUNDLES
+        ]:
+            stale_bundle.unlink(missing_ok=True)
+
+        return path
+
+
+CURRENT_DEBUG_BUNDLE: ContextVar[DebugBundle | None] = ContextVar(
+    "debug_bundle", default=None
+)
+
+
+def record_debug_artifacts(**fields) -> None:
+    """Add fields to the current run's bundle, a no-op unless bundles are enabled."""
+    if bundle := CURRENT_DEBUG_BUNDLE.get():
+        bundle.record(**fields)
+
+
+def is_debug_bundle_enabled() -> bool:
+    return CURRENT_DEBUG_BUNDLE.get() is not None
+
+
+def write_debug_bundle(bundle: DebugBundle, bundle_dir: Path) -> None:
+    try:
+        path = bundle.write(bundle_dir)
+    except OSError as e:
+        log.warning(f"Could not write debug bundle: {e}")
+        return
+
+    log.info("Wrote debug bundle", path=str(path))
+
+
+@contextmanager
+def debug_bundle_scope(enabled: bool | None = None) -> Iterator[DebugBundle | None]:
+    """
+    Collect a bundle for the duration of a run and write it in a background thread afterwards.
+
+    The thread isn't a daemon, so the interpreter waits for the write before exiting.
+    """
+    if enabled is None:
+        enabled = DEBUG_BUNDLE_ENABLED
+
+    cache_dir = get_cache_dir() if enabled else None
+    if not cache_dir:
+        yield None
+        return
+
+    bundle = DebugBundle()
+    token = CURRENT_DEBUG_BUNDLE.set(bundle)
+
+    try:
+        yield bundle
+    finally:
+        CURRENT_DEBUG_BUNDLE.reset(token)
+
+    # runs that never got as far as a diff, e.g. nothing staged, have nothing to debug
+    if "diff" in bundle.fields:
+        threading.Thread(
+            target=write_debug_bundle,
+            args=(bundle, cache_dir / DEBUG_BUNDLE_DIR),
+            name="aiautocommit-debug-bundle",
+        ).start()
+
+
+def load_debug_bundle(path: str | Path) -> dict:
+    return json.loads(gzip.decompress(Path(path).read_bytes()))
+
+
+def is_debug_bundle_path(value: str) -> bool:
+    return value.endswith(DEBUG_BUNDLE_SUFFIX) and Path(value).is_file()
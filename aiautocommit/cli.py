@@ -0,0 +1,1142 @@
+import asyncio
+import json
+import logging
+import os
+import shutil
+import tempfile
+import warnings
+from pathlib import Path
+
+from . import __version__
+from .env import DEFAULT_MODEL_NAME, map_ai_key, update_env_variables  # noqa: F401
+
+update_env_variables()
+
+from dataclasses import asdict, replace  # noqa: E402
+
+import click  # noqa: E402
+from pydantic_ai.exceptions import UserError  # noqa: E402
+
+from . import completion, profiles, ranking, ratelimit  # noqa: E402
+from .api import (  # noqa: E402
+    AutoCommit,  # noqa: F401
+    AutoCommitError,  # noqa: F401
+    build_prompt,
+    finalize_message,
+    get_commit_diff,
+    get_staged_diff,
+    get_staged_files,
+    order_diff,
+)
+from .artifacts import (  # noqa: E402
+    debug_bundle_scope,
+    is_debug_bundle_path,
+    load_debug_bundle,
+    record_debug_artifacts,
+)
+from .completion import FALLBACK_MESSAGE  # noqa: E402, F401
+from .config import (  # noqa: E402
+    COMMIT_PROMPT_FILE,
+    COMMIT_SUFFIX_FILE,
+    CONFIG_FILE,
+    EXAMPLES_DIR,
+    EXCLUSIONS_FILE,
+    AutoCommitConfig,
+    format_examples,
+    read_commit_prompt,
+    read_commit_suffix,
+    read_config_file,
+    read_examples,
+    read_exclusions,
+)
+from .deadline import (  # noqa: E402
+    DeadlineExceeded,
+    deadline_scope,
+    get_deadline,
+    get_deadline_fallback_message,
+)
+from .diff import (  # noqa: E402
+    estimate_tokens,
+    get_diff_size,  # noqa: F401
+    sort_git_diff,
+)
+from .evaluation import (  # noqa: E402
+    Variant,
+    format_summary,
+    load_variant,
+    run_eval,
+    summarize_results,
+)
+from .incremental import (  # noqa: E402
+    build_update_input,
+    get_incremental_base,
+    get_staged_snapshot,
+    is_small_delta,
+    record_generation,
+)
+from .internet import wait_for_internet_connection  # noqa: E402
+from .lock_files import (  # noqa: E402
+    LOCK_FILE_MESSAGES,  # noqa: F401
+    get_lock_file_message,
+)
+from .log import log  # noqa: E402
+from .metrics import increment, metrics_scope, record_deadline  # noqa: E402
+from .offline import (  # noqa: E402
+    generate_offline_message,
+    get_offline_fallback_message,
+)
+from .profiles import configure_profiles  # noqa: E402
+from .pull_request import (  # noqa: E402
+    get_pull_request_context,
+    is_pr_context_enabled,
+    is_pr_summary_enabled,
+)
+from .ranking import (  # noqa: E402
+    configure_ranking,
+    measure_source_retention,
+    rank_git_diff,
+)
+from .ratelimit import configure_rate_limits  # noqa: E402
+from .reducers import USER_REDUCERS, configure_reducers  # noqa: E402
+from .repo import (  # noqa: E402
+    get_current_branch,
+    get_git_dir,
+    get_repo_context,
+    repo_context,
+)
+from .routing import ROUTES, configure_routing  # noqa: E402
+from .store import get_store_path, open_store, remove_legacy_files  # noqa: E402
+from .structured import (  # noqa: E402
+    DEFAULT_MAX_OUTPUT_TOKENS,
+)
+from .style import (  # noqa: E402
+    DEFAULT_STYLE_COMMITS,
+    clear_style_profiles,
+    format_style_profile,
+    get_style_profile_file,
+    get_style_prompt,
+    learn_style,
+)
+from .timing import log_execution_time  # noqa: E402
+from .utils import (  # noqa: E402
+    GIT_SAFE_DIFF_FLAGS,
+    run_command,
+    safe_git_cmd,
+)
+from .watch import (  # noqa: E402
+    DEFAULT_DEBOUNCE,
+    DEFAULT_MIN_INTERVAL,
+    IndexWatcher,
+    load_precomputed_message,
+)
+
+
+def is_local_source_checkout() -> bool:
+    package_dir = Path(__file__).resolve().parent
+    repo_root = package_dir.parent
+
+    return (repo_root / ".git").exists() and (repo_root / "pyproject.toml").exists()
+
+
+def get_cli_version() -> str:
+    if not is_local_source_checkout():
+        return __version__
+
+    if __version__.endswith(".dev"):
+        return __version__
+
+    return f"{__version__}.dev"
+
+
+# Config file locations in priority order
+LOCAL_REPO_AUTOCOMMIT_DIR_NAME = ".aiautocommit"
+CONFIG_PATHS = [
+    Path(LOCAL_REPO_AUTOCOMMIT_DIR_NAME),  # $PWD/.aiautocommit
+    Path(os.environ.get("XDG_CONFIG_HOME", "~/.config")).expanduser()
+    / "aiautocommit",  # XDG config dir
+    Path(__file__).parent / "prompt",  # package config dir
+]
+
+if custom_config_path := os.environ.get("AIAUTOCOMMIT_CONFIG", None):
+    CONFIG_PATHS.insert(-2, Path(custom_config_path))
+
+# https://ai.pydantic.dev/models/overview
+MODEL_NAME = os.environ.get("AIAUTOCOMMIT_MODEL", DEFAULT_MODEL_NAME)
+
+COMMIT_PROMPT = ""
+# the learned style profile at the end of COMMIT_PROMPT, refreshed by `watch` as HEAD moves
+STYLE_PROMPT = None
+EXCLUDED_FILES = []
+
+# structured settings from config.toml, e.g. `[[reducers]]`
+CONFIG = {}
+
+# trailers are a native git feature that can be used to add metadata to a commit
+# https://git-scm.com/docs/git-interpret-trailers
+# GitHub requires two blank lines before trailers for some features to work correctly
+# See: https://github.com/orgs/community/discussions/143092
+# Note: This may require `git commit --cleanup=verbatim` to prevent git from collapsing the blank lines.
+# let's indicate that this message was generated by aiautocommit
+COMMIT_SUFFIX = ""
+
+# "full" sends git's stock unified diff, "compact" trims context, renames, deletions and headers
+DIFF_MODE = os.environ.get("AIAUTOCOMMIT_DIFF_MODE", "full")
+DIFF_CONTEXT = int(os.environ.get("AIAUTOCOMMIT_DIFF_CONTEXT", "1"))
+# histogram, patience, minimal or myers
+DIFF_ALGORITHM = os.environ.get("AIAUTOCOMMIT_DIFF_ALGORITHM", "histogram")
+
+# "relevance" sends the most informative files first, "size" sends the smallest first
+DIFF_ORDER = os.environ.get("AIAUTOCOMMIT_DIFF_ORDER", "relevance")
+
+# characters, not tokens
+_prompt_cutoff_env = os.environ.get("AIAUTOCOMMIT_PROMPT_CUTOFF", "10000")
+PROMPT_CUTOFF = None if _prompt_cutoff_env == "*" else int(_prompt_cutoff_env)
+
+NO_INTERNET_MESSAGE = (
+    "# aiautocommit: no internet connection. Please enter a commit message manually."
+)
+
+# end-to-end budget for `commit`, after which a `#` template is used. 0 disables it.
+DEADLINE_MS = int(os.environ.get("AIAUTOCOMMIT_DEADLINE_MS", "0")) or None
+
+# the model fills in commit message fields under an output token cap, see `structured`
+STRUCTURED_OUTPUT = os.environ.get(
+    "AIAUTOCOMMIT_STRUCTURED_OUTPUT", "false"
+).lower() in ("true", "1", "yes")
+MAX_OUTPUT_TOKENS = int(
+    os.environ.get("AIAUTOCOMMIT_MAX_OUTPUT_TOKENS", str(DEFAULT_MAX_OUTPUT_TOKENS))
+)
+
+
+# this is called within py dev environments. Unless it looks like we are explicitly debugging aiautocommit, we force a
+# more silent operation. Checking for AIAUTOCOMMIT_LOG_PATH is not a perfect heuristic, but it works for now.
+if not os.environ.get("AIAUTOCOMMIT_LOG_PATH"):
+    # Suppress ResourceWarnings
+    warnings.filterwarnings("ignore", category=ResourceWarning)
+
+    # Optional: Disable httpx logging if desired
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+
+def configure_prompts(config_dir=None):
+    global \
+        COMMIT_PROMPT, \
+        STYLE_PROMPT, \
+        COMMIT_SUFFIX, \
+        EXCLUDED_FILES, \
+        CONFIG_PATHS, \
+        CONFIG
+
+    # Use custom config_dir if provided; otherwise use the default prompt directory
+    if config_dir:
+        CONFIG_PATHS.insert(0, Path(config_dir))
+
+    # Skip .aiautocommit if it's a file — file mode appends to the base prompt rather than replacing it
+    config_dir = next((path for path in CONFIG_PATHS if path and path.is_dir()), None)
+
+    if not config_dir:
+        log.debug("No config directory found")
+        return
+
+    log.debug(f"Found config directory at {config_dir}")
+
+    if (commit_prompt := read_commit_prompt(config_dir)) is not None:
+        log.debug("Loading commit prompt")
+        COMMIT_PROMPT = commit_prompt
+    else:
+        log.debug(f"'{COMMIT_PROMPT_FILE}' does not exist in {config_dir}")
+
+    # A plain .aiautocommit file (not a directory) lets developers extend the stock prompt without fully replacing it
+    local_append_file = Path(LOCAL_REPO_AUTOCOMMIT_DIR_NAME)
+    if local_append_file.is_file():
+        log.debug("found .aiautocommit file, appending to prompt")
+        COMMIT_PROMPT += "\n\n" + local_append_file.read_text().strip()
+
+    # a profile learned from the repo's history stands in for the much longer examples
+    if (style_prompt := get_style_prompt()) is not None:
+        log.debug("Using learned style profile instead of examples")
+        STYLE_PROMPT = style_prompt
+        COMMIT_PROMPT += "\n\n" + style_prompt
+    elif (example_files := read_examples(config_dir)) is not None:
+        log.debug(f"Loading examples: {[file.name for file in example_files]}")
+        COMMIT_PROMPT += format_examples(example_files)
+    else:
+        log.debug(f"'{EXAMPLES_DIR}' directory does not exist in {config_dir}")
+
+    if (excluded_files := read_exclusions(config_dir)) is not None:
+        log.debug("Loading exclusions")
+        EXCLUDED_FILES = excluded_files
+    else:
+        log.debug(f"'{EXCLUSIONS_FILE}' does not exist in {config_dir.absolute()}")
+
+    if (commit_suffix := read_commit_suffix(config_dir)) is not None:
+        log.debug("Loading custom commit suffix")
+        COMMIT_SUFFIX = commit_suffix
+    else:
+        log.debug(f"'{COMMIT_SUFFIX_FILE}' does not exist in {config_dir.absolute()}")
+
+    if (settings := read_config_file(config_dir)) is not None:
+        log.debug("Loading config")
+        CONFIG = settings
+    else:
+        log.debug(f"'{CONFIG_FILE}' does not exist in {config_dir.absolute()}")
+        CONFIG = {}
+
+    try:
+        configure_reducers(CONFIG.get("reducers", []), config_dir)
+        configure_ranking(CONFIG.get("ranking", {}), config_dir)
+        configure_routing(CONFIG.get("routes", []))
+        configure_rate_limits(CONFIG.get("rate_limits", {}))
+        configure_profiles(CONFIG.get("profiles", {}))
+    except UserError as e:
+        # a typo in config.toml shouldn't surface as a traceback from the commit hook
+        raise UserFacingError(f"{config_dir / CONFIG_FILE}: {e.message}") from None
+
+
+def refresh_style_prompt():
+    """Swap in the style profile for the current HEAD, for long running commands like `watch`."""
+    global COMMIT_PROMPT, STYLE_PROMPT
+
+    if STYLE_PROMPT is None:
+        return
+
+    style_prompt = get_style_prompt()
+    if style_prompt is not None and style_prompt != STYLE_PROMPT:
+        log.debug("Refreshed learned style profile")
+        COMMIT_PROMPT = COMMIT_PROMPT.removesuffix(STYLE_PROMPT) + style_prompt
+        STYLE_PROMPT = style_prompt
+
+
+def get_runtime_config() -> AutoCommitConfig:
+    """Snapshot the CLI's module-level settings, as set by env variables and `configure_prompts`."""
+    return AutoCommitConfig(
+        model_name=MODEL_NAME,
+        prompt=COMMIT_PROMPT,
+        suffix=COMMIT_SUFFIX,
+        excluded_files=tuple(EXCLUDED_FILES),
+        prompt_cutoff=PROMPT_CUTOFF,
+        diff_mode=DIFF_MODE,
+        diff_context=DIFF_CONTEXT,
+        diff_algorithm=DIFF_ALGORITHM,
+        diff_order=DIFF_ORDER,
+        reducers=tuple(USER_REDUCERS),
+        ranking_weights=ranking.WEIGHTS,
+        ranking_scorer=ranking.SCORER,
+        routes=tuple(ROUTES),
+        rate_limits=ratelimit.RATE_LIMITS,
+        include_pr_context=is_pr_context_enabled(),
+        summarize_pr_context=is_pr_summary_enabled(),
+        profile=profiles.PROFILE,
+        structured_output=STRUCTURED_OUTPUT,
+        max_output_tokens=MAX_OUTPUT_TOKENS,
+        settings=CONFIG,
+    )
+
+
+def order_git_diff(diff_str):
+    if DIFF_ORDER == "size":
+        return sort_git_diff(diff_str)
+
+    return rank_git_diff(diff_str)
+
+
+def get_diff(ignore_whitespace=True, base=None, tree=None):
+    return get_staged_diff(get_runtime_config(), ignore_whitespace, base, tree)
+
+
+class UserFacingError(click.ClickException):
+    """Configuration/usage error shown as a single red line (no traceback)."""
+
+    def show(self, file=None):
+        click.secho(self.format_message(), fg="red", err=True)
+
+
+@log_execution_time("ai_generation")
+def complete(prompt, diff):
+    try:
+        return completion.complete(prompt, diff, get_runtime_config())
+    except UserError as e:
+        raise UserFacingError(e.message) from None
+
+
+def generate_commit_message(diff):
+    if not diff:
+        log.debug("No commit message generated")
+        return ""
+
+    with get_deadline().stage("prompt"):
+        branch = get_current_branch()
+        pr_context = (
+            get_pull_request_context(
+                branch, summary_model=MODEL_NAME if is_pr_summary_enabled() else None
+            )
+            if branch
+            else None
+        )
+        prompt = build_prompt(COMMIT_PROMPT, branch, pr_context)
+
+    return finalize_message(complete(prompt, diff), COMMIT_SUFFIX)
+
+
+def generate_or_update_commit_message(diff, tree=None):
+    """
+    Generate a commit message, updating the previous one when only a little more has been staged since.
+
+    Covers the generate, abort, stage another small file, commit again loop: only the previous message and
+    the delta diff are sent, which is far smaller than the full diff. `diff` is for `tree` when one is passed,
+    and for the index otherwise.
+    """
+    snapshot = get_staged_snapshot(tree)
+    if not snapshot:
+        return generate_commit_message(diff)
+
+    message = None
+
+    if last_generation := get_incremental_base(snapshot, diff):
+        delta = get_diff(base=last_generation.tree, tree=tree)
+
+        if is_small_delta(delta, diff):
+            log.info(
+                f"Updating previous commit message from a {len(delta)} character delta"
+            )
+            increment("fast_path", path="incremental")
+            message = generate_commit_message(
+                build_update_input(last_generation.message, delta)
+            )
+        else:
+            log.debug("Delta since last generation is too large, generating in full")
+
+    if message is None:
+        message = generate_commit_message(diff)
+
+    if message and not message.startswith("#"):
+        record_generation(snapshot, diff, message.removesuffix(COMMIT_SUFFIX))
+
+    return message
+
+
+def git_commit(message):
+    # will ignore message if diff is empty
+    args = ["git", "commit"]
+    temp_path = None
+
+    if message:
+        if message.startswith("#"):
+            # Write to a temp file and use as a template so Git still appends the status and diff (if commit.verbose=true)
+            fd, temp_path = tempfile.mkstemp(text=True)
+            with os.fdopen(fd, "w") as f:
+                f.write(f"{message}\n\n")
+            args += ["--template", temp_path]
+        else:
+            args += ["--message", message]
+
+    args.append("--edit")
+
+    try:
+        return run_command(
+            args,
+            capture_output=False,
+        ).returncode
+    finally:
+        if temp_path:
+            os.remove(temp_path)
+
+
+def is_reversion(commit_msg_path=None):
+    git_dir = get_git_dir()
+    if not git_dir:
+        return False
+
+    # Check if we're in the middle of a git revert
+    if (git_dir / "REVERT_HEAD").exists():
+        return True
+
+    # Or a merge
+    if (git_dir / "MERGE_MSG").exists():
+        return True
+
+    # Detect fixup commits by checking if the commit message starts with "fixup!"
+    # If commit_msg_path is provided, use it. If not, we don't want to use the stale COMMIT_EDITMSG.
+    if not commit_msg_path:
+        return False
+
+    commit_editmsg = Path(commit_msg_path)
+
+    if commit_editmsg.exists():
+        try:
+            first_line = commit_editmsg.read_text(
+                encoding="utf-8", errors="ignore"
+            ).splitlines()[0]
+            if first_line.startswith("fixup!"):
+                return True
+        except IndexError:
+            pass
+
+        # Check if a commit amend is happening by comparing the commit edit message
+        # with the last commit message (which is pre-populated during amend)
+        try:
+            current_first_line = (
+                commit_editmsg.read_text(encoding="utf-8", errors="ignore")
+                .splitlines()[0]
+                .strip()
+            )
+            if current_first_line == get_repo_context().head_subject:
+                return True
+        except Exception:
+            pass
+
+    return False
+
+
+def check_lock_files():
+    """
+    Check if only lock files are changed and return a standard commit message if so.
+    """
+    lock_message = get_lock_file_message(get_staged_files())
+    if not lock_message:
+        return None
+
+    return lock_message + COMMIT_SUFFIX
+
+
+def echo_cli_version(ctx: click.Context, param: click.Parameter, value: bool) -> None:
+    if not value or ctx.resilient_parsing:
+        return
+
+    prog_name = ctx.find_root().info_name or "aiautocommit"
+    click.echo(f"{prog_name}, version {get_cli_version()}")
+    click.echo(f"model: {MODEL_NAME}")
+    ctx.exit()
+
+
+@click.group(invoke_without_command=True)
+@click.option(
+    "--version",
+    is_flag=True,
+    expose_value=False,
+    is_eager=True,
+    callback=echo_cli_version,
+    help="Show the version and configured model and exit.",
+)
+def main():
+    """
+    Generate a commit message for staged files and commit them.
+    Git will prompt you to edit the generated commit message.
+    """
+    ctx = click.get_current_context()
+    if ctx.invoked_subcommand is None:
+        ctx.invoke(commit)
+
+
+@main.command()
+@click.option(
+    "-p",
+    "--print-message",
+    is_flag=True,
+    default=False,
+    help="print commit msg to stdout instead of performing commit",
+)
+@click.option(
+    "-o",
+    "--output-file",
+    type=click.Path(writable=True),
+    help="write commit message to specified file",
+)
+@click.option(
+    "--config-dir",
+    type=click.Path(exists=True, file_okay=False, dir_okay=True),
+    help="specify custom config directory",
+)
+@click.option(
+    "--offline",
+    is_flag=True,
+    default=False,
+    help="draft the message from the diff alone, without the model",
+)
+def commit(print_message, output_file, config_dir, offline):
+    """
+    Generate commit message from git diff.
+    """
+
+    # one RepoContext serves every git lookup of this invocation
+    click.get_current_context().with_resource(repo_context())
+
+    # click.get_current_context().exit() is used instead of sys.exit() because it's the
+    # idiomatic way to exit in Click, allowing for proper context cleanup and better testability.
+    if is_reversion(output_file):
+        click.get_current_context().exit(0)
+
+    # metrics are emitted once the whole run, including `overall_execution`, has been timed
+    with metrics_scope(), log_execution_time("overall_execution"):
+        configure_prompts(config_dir)
+
+        # the budget and the debug bundle cover generating the message, not the editor or `git commit`
+        with debug_bundle_scope(), deadline_scope(DEADLINE_MS) as deadline:
+            diff = None
+
+            try:
+                with deadline.stage("diff"):
+                    staged_diff = get_diff(ignore_whitespace=False)
+                    lock_message = None if staged_diff else check_lock_files()
+
+                if not staged_diff:
+                    # If no staged diff (likely due to exclusions), check if we have any staged files
+                    # that we can handle with a static commit message.
+                    if lock_message:
+                        increment("fast_path", path="lock_files")
+                        commit_message = lock_message
+                        log.info(
+                            f"Detected lock file change, using message: {commit_message}"
+                        )
+                    else:
+                        click.echo(
+                            "No changes staged. Use `git add` to stage files before invoking aiautocommit.",
+                            err=True,
+                        )
+                        click.get_current_context().exit(1)
+                else:
+                    with deadline.stage("diff"):
+                        diff = get_diff()
+
+                    if not diff:
+                        increment("fast_path", path="whitespace")
+                        commit_message = "style: whitespace change" + COMMIT_SUFFIX
+                    elif offline:
+                        increment("fast_path", path="offline")
+                        commit_message = finalize_message(
+                            generate_offline_message(diff), COMMIT_SUFFIX
+                        )
+                    elif precomputed_message := load_precomputed_message():
+                        increment("fast_path", path="precomputed")
+                        commit_message = precomputed_message
+                    else:
+                        with deadline.stage("internet"):
+                            try:
+                                wait_for_internet_connection()
+                                is_online = True
+                            except Exception:
+                                if deadline.expired():
+                                    raise deadline.exceeded("internet") from None
+                                is_online = False
+
+                        if is_online:
+                            commit_message = generate_or_update_commit_message(diff)
+                        else:
+                            log.warning(
+                                "No internet connection. Skipping AI completion."
+                            )
+                            increment("fallback", reason="no_internet")
+                            commit_message = get_offline_fallback_message(
+                                NO_INTERNET_MESSAGE, diff
+                            )
+
+                            # nothing to draft from, leave the message to the user
+                            if commit_message == NO_INTERNET_MESSAGE:
+                                click.get_current_context().exit(0)
+            except UnicodeDecodeError:
+                click.echo("aiautocommit does not support binary files", err=True)
+                increment("fallback", reason="binary")
+
+                commit_message = (
+                    # TODO use heredoc
+                    "# aiautocommit does not support binary files. "
+                    "Please enter a commit message manually or unstage any binary files."
+                )
+            except DeadlineExceeded as e:
+                click.echo(f"aiautocommit: {e}", err=True)
+                # the route is only known if the deadline ran out after picking one
+                increment(
+                    "fallback",
+                    reason="deadline",
+                    route=deadline.labels.get("route", "none"),
+                )
+                commit_message = get_offline_fallback_message(
+                    get_deadline_fallback_message(e), diff
+                )
+
+            record_debug_artifacts(message=commit_message, timings=deadline.report())
+            record_deadline(deadline)
+
+        if output_file:
+            if commit_message:
+                out_path = Path(output_file)
+                original_content = out_path.read_text() if out_path.exists() else ""
+                if original_content:
+                    out_path.write_text(f"{commit_message}\n\n{original_content}")
+                else:
+                    out_path.write_text(commit_message)
+            click.get_current_context().exit(0)
+        elif print_message:
+            click.echo(commit_message)
+            click.get_current_context().exit(0)
+        else:
+            click.get_current_context().exit(git_commit(commit_message))
+
+
+@main.command()
+@click.option(
+    "--debounce",
+    type=float,
+    default=DEFAULT_DEBOUNCE,
+    show_default=True,
+    help="seconds the index must be unchanged before generating",
+)
+@click.option(
+    "--min-interval",
+    type=float,
+    default=DEFAULT_MIN_INTERVAL,
+    show_default=True,
+    help="minimum seconds between two generations",
+)
+@click.option(
+    "--config-dir",
+    type=click.Path(exists=True, file_okay=False, dir_okay=True),
+    help="specify custom config directory",
+)
+def watch(debounce, min_interval, config_dir):
+    """
+    Pre-generate commit messages whenever the staged files change.
+
+    Messages are stored by staged tree id, so a later `git commit` of the same tree uses the precomputed
+    message instead of waiting on the AI model.
+    """
+    configure_prompts(config_dir)
+
+    index_path = Path(
+        run_command(
+            ["git", "rev-parse", "--git-path", "index"], check=True
+        ).stdout.strip()
+    )
+
+    def generate(tree_id):
+        # HEAD and branch can change between generations
+        with repo_context():
+            refresh_style_prompt()
+
+            # the index may have changed since the tree was written, diff the tree the message is stored for
+            diff = get_diff(tree=tree_id)
+            if not diff:
+                return None
+
+            return generate_or_update_commit_message(diff, tree_id)
+
+    click.echo(f"Watching {index_path} for staged changes (ctrl-c to stop)")
+
+    try:
+        IndexWatcher(
+            index_path,
+            generate,
+            debounce=debounce,
+            min_interval=min_interval,
+        ).run()
+    except KeyboardInterrupt:
+        pass
+
+
+@main.command()
+@click.option(
+    "--overwrite",
+    is_flag=True,
+    help="Overwrite existing pre-commit hook if it exists",
+)
+@click.option(
+    "--skip-edit",
+    is_flag=True,
+    help="Set local core.editor to true so git commit does not open an editor after the hook",
+)
+def install(overwrite, skip_edit):
+    """Install pre-commit script into git hooks directory"""
+    git_result = run_command(
+        ["git", "rev-parse", "--git-path", "hooks"],
+        check=True,
+    )
+
+    target_hooks_dir = Path(git_result.stdout.strip())
+    target_hooks_dir.mkdir(exist_ok=True, parents=True)
+
+    commit_msg_git_hook_name = "prepare-commit-msg"
+    pre_commit = target_hooks_dir / commit_msg_git_hook_name
+    pre_commit_script = Path(__file__).parent / commit_msg_git_hook_name
+
+    if not pre_commit.exists() or overwrite:
+        pre_commit.write_text(pre_commit_script.read_text())
+        pre_commit.chmod(0o755)
+        click.echo("Installed pre-commit hook")
+    else:
+        click.echo(
+            "pre-commit hook already exists. Here's the contents we would have written:\n"
+        )
+        click.echo(pre_commit_script.read_text())
+
+    if skip_edit:
+        run_command(
+            ["git", "config", "core.editor", "true"],
+            check=True,
+        )
+        click.echo("Set local core.editor=true (git commit will skip the editor)")
+
+
+@main.command()
+def uninstall():
+    """Remove pre-commit script from git hooks directory"""
+    git_result = run_command(
+        ["git", "rev-parse", "--git-path", "hooks"],
+        check=True,
+    )
+
+    target_hooks_dir = Path(git_result.stdout.strip())
+    commit_msg_git_hook_name = "prepare-commit-msg"
+    pre_commit = target_hooks_dir / commit_msg_git_hook_name
+
+    if pre_commit.exists():
+        pre_commit.unlink()
+        click.echo("Removed pre-commit hook")
+    else:
+        click.echo("pre-commit hook not found")
+
+
+@main.command(name="learn-style")
+@click.option(
+    "-n",
+    "--limit",
+    type=int,
+    default=DEFAULT_STYLE_COMMITS,
+    show_default=True,
+    help="number of recent commits to learn from",
+)
+@click.option(
+    "--clear",
+    is_flag=True,
+    default=False,
+    help="delete the learned profile and go back to the prompt examples",
+)
+def learn_style_command(limit, clear):
+    """
+    Learn the repo's commit style from its history.
+
+    The profile replaces the examples in the prompt and is refreshed with new commits as they land.
+    """
+
+    click.get_current_context().with_resource(repo_context())
+
+    if not get_style_profile_file():
+        raise click.ClickException("Not in a git repository")
+
+    if clear:
+        if clear_style_profiles():
+            click.echo("Removed style profile")
+        else:
+            click.echo("No style profile found")
+        return
+
+    if not (profile := learn_style(limit)) or not profile.commits:
+        raise click.ClickException("No commits to learn from")
+
+    click.echo(format_style_profile(profile), nl=False)
+
+
+@main.group()
+def cache():
+    """Inspect or prune the repository's cache store."""
+
+
+@cache.command(name="stats")
+def cache_stats():
+    "Show rows, cached bytes and expired rows per table"
+
+    path = get_store_path()
+    if not path or not path.exists():
+        click.echo("No cache store found")
+        return
+
+    with open_store(path) as store:
+        if not store:
+            raise click.ClickException(f"Could not open the cache store at {path}")
+
+        table_stats = store.stats()
+
+    file_size = sum(
+        file.stat().st_size
+        for file in path.parent.glob(f"{path.name}*")
+        if file.is_file()
+    )
+    click.echo(f"store: {path} ({file_size / 1024:.1f} KB)")
+    for table, counts in table_stats.items():
+        click.echo(
+            f"{table + ':':<22}{counts['rows']} rows, {counts['bytes'] / 1024:.1f} KB, "
+            f"{counts['expired']} expired"
+        )
+
+
+@cache.command(name="prune")
+@click.option(
+    "--max-bytes",
+    type=int,
+    default=None,
+    help="evict least recently used rows until the store holds at most this many bytes",
+)
+def cache_prune(max_bytes):
+    "Delete expired rows, evict down to the size limit and compact the store"
+
+    path = get_store_path()
+    if not path:
+        raise click.ClickException("Not in a git repository")
+
+    with open_store(path) as store:
+        if not store:
+            raise click.ClickException(f"Could not open the cache store at {path}")
+
+        expired, evicted = store.prune(max_bytes)
+
+    legacy = remove_legacy_files(path.parent)
+    click.echo(
+        f"Deleted {expired} expired and evicted {evicted} least recently used rows"
+        + (f", removed {legacy} legacy cache files" if legacy else "")
+    )
+
+
+@main.command()
+def dump_prompts():
+    "Dump default prompts by copying the contents of the prompt directory to PWD for customization"
+
+    config_dir = Path(LOCAL_REPO_AUTOCOMMIT_DIR_NAME)
+    config_dir.mkdir(exist_ok=True)
+    source_prompt_dir = Path(__file__).parent / "prompt"
+
+    if not source_prompt_dir.exists():
+        click.echo("Source prompt directory does not exist; nothing to copy.")
+        return
+
+    # Copy each item from source_prompt_dir into config_dir
+    for item in source_prompt_dir.iterdir():
+        target = config_dir / item.name
+        if target.exists():
+            click.echo(f"{target} already exists. Skipping copy of {item.name}.")
+            continue
+        if item.is_dir():
+            shutil.copytree(item, target)
+        else:
+            shutil.copy(item, target)
+
+    click.echo(f"Copied contents of {source_prompt_dir} to {config_dir}")
+
+
+@main.command()
+def output_prompt():
+    "Dump compiled prompt, helpful for debugging"
+
+    configure_prompts()
+    click.echo(COMMIT_PROMPT)
+
+
+@main.command()
+def output_exclusions():
+    "Dump file exclusions, helpful for debugging"
+
+    configure_prompts()
+    click.echo(EXCLUDED_FILES)
+
+
+@main.command()
+@click.argument("revision_range")
+def diff_stats(revision_range):
+    """
+    Measure prompt savings of the compact diff encoding on historical commits.
+
+    For commits truncated by the prompt cutoff, also compares how much of the changed source survives
+    truncation with the size and relevance orderings.
+
+    REVISION_RANGE is anything `git rev-list` accepts, e.g. HEAD~200..HEAD.
+    """
+    configure_prompts()
+
+    # the same processing a commit, and `eval`, apply: reducers, dedupe and ordering
+    config = get_runtime_config()
+    full_config = replace(config, diff_mode="full")
+    compact_config = replace(config, diff_mode="compact")
+
+    shas = run_command(
+        ["git", "rev-list", "--no-merges", revision_range], check=True
+    ).stdout.split()
+
+    full_tokens = 0
+    compact_tokens = 0
+    savings = []
+
+    # changed source lines kept within PROMPT_CUTOFF for each ordering, on truncated commits only
+    truncated = 0
+    retention = {"size": [0, 0], "relevance": [0, 0]}
+
+    for sha in shas:
+        full_diff = get_commit_diff(full_config, sha)
+        full = estimate_tokens(full_diff)
+        compact = estimate_tokens(get_commit_diff(compact_config, sha))
+
+        if config.prompt_cutoff is not None and len(full_diff) > config.prompt_cutoff:
+            truncated += 1
+            for order in retention:
+                ordered_diff = order_diff(full_diff, replace(config, diff_order=order))
+                kept, total = measure_source_retention(
+                    ordered_diff, config.prompt_cutoff
+                )
+                retention[order][0] += kept
+                retention[order][1] += total
+
+        full_tokens += full
+        compact_tokens += compact
+        if full:
+            savings.append(1 - compact / full)
+
+    if not full_tokens:
+        click.echo("No diffs found in range")
+        return
+
+    savings.sort()
+
+    click.echo(f"commits:        {len(shas)}")
+    click.echo(f"full tokens:    {full_tokens}")
+    click.echo(f"compact tokens: {compact_tokens}")
+    click.echo(f"total savings:  {1 - compact_tokens / full_tokens:.1%}")
+    click.echo(f"median savings: {savings[len(savings) // 2]:.1%}")
+
+    if not truncated:
+        return
+
+    click.echo(f"truncated:      {truncated}")
+    for order, (kept, total) in retention.items():
+        share = kept / total if total else 0
+        click.echo(f"source lines kept, {order} order: {share:.1%}")
+
+
+@main.command(name="eval")
+@click.option(
+    "--range",
+    "revision_range",
+    required=True,
+    help="commits to replay, anything `git rev-list` accepts, e.g. HEAD~50..HEAD",
+)
+@click.option(
+    "--prompt-variant",
+    "variant_dirs",
+    multiple=True,
+    type=click.Path(exists=True, file_okay=False, dir_okay=True),
+    help="config directory with a prompt to compare against the current one, repeatable",
+)
+@click.option(
+    "--model",
+    "model_names",
+    multiple=True,
+    help="model to generate with, repeatable. Defaults to the configured model and routes",
+)
+@click.option(
+    "--limit",
+    type=int,
+    default=20,
+    show_default=True,
+    help="most recent commits to replay",
+)
+@click.option(
+    "--concurrency",
+    type=int,
+    default=4,
+    show_default=True,
+    help="generations in flight at once",
+)
+@click.option(
+    "--output",
+    type=click.Path(writable=True, dir_okay=False),
+    help="write every generated message as JSON lines",
+)
+def evaluate(revision_range, variant_dirs, model_names, limit, concurrency, output):
+    """
+    Replay historical commits against prompt variants and models.
+
+    Generates a message for every commit in the range with the current prompt and each variant, then
+    reports latency percentiles, token usage and similarity to the messages that were committed.
+    """
+    configure_prompts()
+    base = get_runtime_config()
+
+    shas = run_command(
+        ["git", "rev-list", "--no-merges", f"--max-count={limit}", revision_range],
+        check=True,
+    ).stdout.split()
+
+    if not shas:
+        click.echo("No commits found in range")
+        return
+
+    variants = [
+        Variant("current", base),
+        *(load_variant(variant_dir, base) for variant_dir in variant_dirs),
+    ]
+
+    results = asyncio.run(
+        run_eval(shas, variants, list(model_names) or [None], concurrency)
+    )
+
+    if output:
+        Path(output).write_text(
+            "".join(json.dumps(asdict(result)) + "\n" for result in results)
+        )
+
+    click.echo(format_summary(summarize_results(results)))
+
+
+@main.command()
+@click.argument("sha")
+@click.argument("message")
+def debug_prompt(sha, message):
+    """
+    Generate a ChatGPT-ready block for iterating on the prompt.
+
+    SHA is the commit to debug, or a debug bundle written with
+    AIAUTOCOMMIT_DEBUG_BUNDLE, which has the exact diff and prompt the model
+    saw. MESSAGE describes what was wrong with the generated commit message
+    (e.g. "the subject line was too vague"). The output includes the diff,
+    the generated commit message, and the full system prompt — paste it into
+    ChatGPT to get improvement suggestions.
+    """
+    configure_prompts()
+
+    if is_debug_bundle_path(sha):
+        bundle = load_debug_bundle(sha)
+        diff_output = bundle.get("diff", "")
+        commit_message = bundle.get("response") or bundle.get("message", "")
+        prompt = bundle.get("prompt", COMMIT_PROMPT)
+    else:
+        diff_cmd = [*safe_git_cmd(), "show", *GIT_SAFE_DIFF_FLAGS, sha, "--pretty="]
+        diff_output = run_command(diff_cmd).stdout
+
+        commit_msg_cmd = ["git", "log", "--format=%B", "-n", "1", sha]
+        commit_message = run_command(commit_msg_cmd).stdout
+        prompt = COMMIT_PROMPT
+
+    # remove the fixed commit suffix
+    commit_message = commit_message.replace(COMMIT_SUFFIX, "").strip()
+
+    click.echo(f"""
+Your job is to help me improve a prompt that is being sent to an LLM in order to write a get commit message.
+
+{message}
+
+Explain why and suggest a improved prompt (without examples) in a markdown block. Keep your response concise.
+
+Here is the diff:
+
+```
+{diff_output}
+```
+
+Here was the commit message that was generated:
+
+```
+{commit_message}
+```
+
+It was written using the following LLM prompt:
+
+---
+
+{prompt}
+""")
@@ -0,0 +1,197 @@
+"""
+The model call shared by the CLI and the async API.
+
+`complete` and `complete_async` pick a route for the diff, queue for the provider's rate limits, run the
+pooled agent with retries and fall back to a placeholder message when the model is unavailable. A
+misconfiguration is raised as `UserError`, for each caller to report in its own way.
+"""
+
+from dataclasses import asdict, dataclass
+
+from pydantic_ai import CancellationToken
+from pydantic_ai.exceptions import (
+    ModelAPIError,
+    ModelHTTPError,
+    RunCancelled,
+    UnexpectedModelBehavior,
+)
+
+from .artifacts import is_debug_bundle_enabled, record_debug_artifacts
+from .config import AutoCommitConfig
+from .deadline import get_deadline
+from .diff import estimate_tokens
+from .log import is_debug_enabled, log
+from .metrics import increment
+from .model import get_agent, get_pool_stats
+from .offline import get_offline_fallback_message
+from .profiles import get_profile_name
+from .ratelimit import async_rate_limit, rate_limit
+from .retry import retry_transient_errors
+from .routing import Route, select_route
+from .structured import STRUCTURED_INSTRUCTIONS, get_output_text, get_run_options
+
+FALLBACK_MESSAGE = (
+    "# aiautocommit: AI model unavailable. Falling back to manual message."
+)
+
+# failures that end in a fallback message rather than an error
+MODEL_ERRORS = (RunCancelled, ModelAPIError, UnexpectedModelBehavior)
+
+
+@dataclass(frozen=True)
+class ModelRun:
+    """Everything needed to call the model for one diff, see `prepare_run`."""
+
+    route: Route
+    profile: str
+    instructions: str
+    user_prompt: str
+    run_options: dict
+    # estimated input tokens, taken from the provider's rate limit bucket
+    tokens: int
+
+
+def prepare_run(prompt: str, diff: str, config: AutoCommitConfig) -> ModelRun:
+    route = select_route(
+        diff, config.model_name, config.prompt_cutoff, list(config.routes)
+    )
+    profile = get_profile_name(config.profile)
+    get_deadline().labels.update(
+        route=route.name, model=route.model_name, profile=profile
+    )
+    log.debug(f"Using route {route.name} with model {route.model_name}")
+
+    if route.prompt_cutoff is not None and len(diff) > route.prompt_cutoff:
+        log.info(
+            f"Prompt length ({len(diff)}) exceeds the maximum allowed length, truncating."
+        )
+
+    run_options = {}
+    if config.structured_output:
+        prompt += STRUCTURED_INSTRUCTIONS
+        run_options = get_run_options(config.max_output_tokens)
+
+    user_prompt = diff[: route.prompt_cutoff]
+    record_debug_artifacts(
+        model=route.model_name, route=route.name, prompt=prompt, diff=user_prompt
+    )
+
+    return ModelRun(
+        route=route,
+        profile=profile,
+        instructions=prompt,
+        user_prompt=user_prompt,
+        run_options=run_options,
+        tokens=estimate_tokens(prompt) + estimate_tokens(user_prompt),
+    )
+
+
+def get_fallback_message(error: Exception, run: ModelRun, diff: str) -> str:
+    """The placeholder message for a failed model call. A run cancelled by the deadline raises instead."""
+    if isinstance(error, RunCancelled):
+        raise get_deadline().exceeded("ai_generation") from None
+
+    if isinstance(error, ModelHTTPError):
+        log.warning(
+            f"AI model is currently unavailable (HTTP {error.status_code}). "
+            "Falling back to manual commit message."
+        )
+        reason = "model_unavailable"
+    elif isinstance(error, ModelAPIError):
+        log.warning(f"AI API error: {error}. Falling back to manual commit message.")
+        reason = "model_unavailable"
+    else:
+        # a structured answer cut off by the output token cap
+        log.warning(
+            f"Invalid model output: {error}. Falling back to manual commit message."
+        )
+        reason = "invalid_output"
+
+    increment("fallback", reason=reason, route=run.route.name)
+    return get_offline_fallback_message(FALLBACK_MESSAGE, diff)
+
+
+def get_completion_text(run: ModelRun, result) -> str:
+    """The stripped message from an agent result, recording token usage."""
+    if is_debug_enabled():
+        log.debug("Model pool", **get_pool_stats())
+
+    completion = get_output_text(result.output)
+
+    usage = result.usage()
+    for kind, tokens in (
+        ("input", usage.input_tokens),
+        ("output", usage.output_tokens),
+    ):
+        increment(
+            "tokens",
+            tokens or 0,
+            kind=kind,
+            model=run.route.model_name,
+            route=run.route.name,
+            profile=run.profile,
+        )
+
+    if is_debug_bundle_enabled():
+        record_debug_artifacts(response=completion, usage=asdict(usage))
+
+    if completion is None:
+        return ""
+    return completion.strip()
+
+
+def complete(prompt: str, diff: str, config: AutoCommitConfig) -> str:
+    """Generate a message for `diff`, blocking until the model answers or the deadline expires."""
+    run = prepare_run(prompt, diff, config)
+    deadline = get_deadline()
+    cancellation_token = CancellationToken()
+
+    try:
+        # Agents are pooled per model, so the prompt is passed with each run
+        agent = get_agent(run.route.model_name, run.route.model_settings, run.profile)
+
+        # queue first if other processes used up the provider's rate limit
+        with (
+            rate_limit(run.route.model_name, run.tokens, config.rate_limits),
+            deadline.stage("ai_generation"),
+            deadline.cancel_on_expiry(cancellation_token.cancel),
+        ):
+            # rate limits and overloaded servers usually clear within a second
+            result = retry_transient_errors(agent.run_sync)(
+                run.user_prompt,
+                instructions=run.instructions,
+                cancellation_token=cancellation_token,
+                **run.run_options,
+            )
+    except MODEL_ERRORS as e:
+        return get_fallback_message(e, run, diff)
+
+    return get_completion_text(run, result)
+
+
+async def complete_async(prompt: str, diff: str, config: AutoCommitConfig) -> str:
+    """`complete` for an event loop, other generations keep running while this one waits."""
+    run = prepare_run(prompt, diff, config)
+    deadline = get_deadline()
+    cancellation_token = CancellationToken()
+
+    try:
+        agent = get_agent(run.route.model_name, run.route.model_settings, run.profile)
+
+        async with async_rate_limit(
+            run.route.model_name, run.tokens, config.rate_limits
+        ):
+            with (
+                deadline.stage("ai_generation"),
+                deadline.cancel_on_expiry(cancellation_token.cancel),
+            ):
+                result = await retry_transient_errors(agent.run)(
+                    run.user_prompt,
+                    instructions=run.instructions,
+                    cancellation_token=cancellation_token,
+                    **run.run_options,
+                )
+    except MODEL_ERRORS as e:
+        return get_fallback_message(e, run, diff)
+
+    return get_completion_text(run, result)
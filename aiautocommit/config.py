@@ -0,0 +1,162 @@
+import re
+import tomllib
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from .env import DEFAULT_MODEL_NAME
+from .ranking import DEFAULT_WEIGHTS, Scorer, score_section
+from .ratelimit import RateLimit, parse_rate_limits
+from .reducers import Reducer, resolve_reducer
+from .routing import validate_routes
+from .structured import DEFAULT_MAX_OUTPUT_TOKENS
+from .utils import load_callable
+
+COMMIT_PROMPT_FILE = "commit_prompt.txt"
+EXCLUSIONS_FILE = "excluded_files.txt"
+COMMIT_SUFFIX_FILE = "commit_suffix.txt"
+CONFIG_FILE = "config.toml"
+EXAMPLES_DIR = "examples"
+
+PACKAGE_CONFIG_DIR = Path(__file__).parent / "prompt"
+
+
+def read_commit_prompt(config_dir: Path) -> str | None:
+    commit_file = config_dir / COMMIT_PROMPT_FILE
+    return commit_file.read_text().strip() if commit_file.exists() else None
+
+
+def read_examples(config_dir: Path) -> list[Path] | None:
+    """Example files in filename order, or None if there is no examples directory."""
+    examples_dir = config_dir / EXAMPLES_DIR
+    if not examples_dir.exists():
+        return None
+
+    pattern = re.compile(r"example_\d\.md$")
+    return sorted(
+        [
+            file
+            for file in examples_dir.iterdir()
+            if file.is_file() and pattern.match(file.name)
+        ],
+        key=lambda f: f.name,
+    )
+
+
+def format_examples(example_files: list[Path]) -> str:
+    if not example_files:
+        return ""
+
+    return "\n\n## Examples\n" + "".join(
+        "\n\n" + file.read_text().strip() + "\n\n" for file in example_files
+    )
+
+
+def read_exclusions(config_dir: Path) -> list[str] | None:
+    exclusions_file = config_dir / EXCLUSIONS_FILE
+    if not exclusions_file.exists():
+        return None
+
+    return [
+        line.strip()
+        for line in exclusions_file.read_text().splitlines()
+        if line.strip()
+    ]
+
+
+def read_commit_suffix(config_dir: Path) -> str | None:
+    commit_suffix_file = config_dir / COMMIT_SUFFIX_FILE
+    if not commit_suffix_file.exists():
+        return None
+
+    # GitHub requires two blank lines before trailers for some features to work correctly
+    # See: https://github.com/orgs/community/discussions/143092
+    # Note: This may require `git commit --cleanup=verbatim` to prevent git from collapsing the blank lines.
+    return "\n\n\n" + commit_suffix_file.read_text().strip()
+
+
+def read_config_file(config_dir: Path) -> dict | None:
+    config_file = config_dir / CONFIG_FILE
+    return tomllib.loads(config_file.read_text()) if config_file.exists() else None
+
+
+@dataclass(frozen=True)
+class AutoCommitConfig:
+    """
+    Everything a generation needs, passed explicitly instead of read from module globals.
+
+    The CLI builds one from its environment variables and config directories; API users construct one
+    directly or with `from_config_dir`.
+    """
+
+    model_name: str = DEFAULT_MODEL_NAME
+    prompt: str = ""
+    suffix: str = ""
+    excluded_files: tuple[str, ...] = ()
+    # characters, not tokens. None sends the whole diff.
+    prompt_cutoff: int | None = 10_000
+    diff_mode: str = "full"
+    diff_context: int = 1
+    diff_algorithm: str = "histogram"
+    diff_order: str = "relevance"
+    # checked before the built-in reducers
+    reducers: tuple[tuple[str, Reducer], ...] = ()
+    ranking_weights: dict[str, float] = field(
+        default_factory=lambda: dict(DEFAULT_WEIGHTS)
+    )
+    ranking_scorer: Scorer = score_section
+    # `[[routes]]` tables, see `routing.select_route`
+    routes: tuple[dict, ...] = ()
+    # `[rate_limits.<provider>]` tables, shared by every process on the machine
+    rate_limits: dict[str, RateLimit] = field(default_factory=dict)
+    include_pr_context: bool = False
+    # send a cached model summary of the PR description instead of the description itself
+    summarize_pr_context: bool = False
+    # latency profile, see `profiles`. None uses AIAUTOCOMMIT_PROFILE.
+    profile: str | None = None
+    # have the model fill in a `structured.CommitMessage` under a max_tokens cap and render it locally
+    structured_output: bool = False
+    max_output_tokens: int = DEFAULT_MAX_OUTPUT_TOKENS
+    # structured settings from config.toml
+    settings: dict = field(default_factory=dict)
+
+    @classmethod
+    def from_config_dir(
+        cls, config_dir: str | Path | None = None, **overrides
+    ) -> "AutoCommitConfig":
+        """
+        Load prompt, examples, exclusions, suffix and config.toml from a config directory.
+
+        Without a directory the stock config shipped with the package is used. Keyword arguments override
+        any loaded value.
+        """
+        config_dir = Path(config_dir) if config_dir else PACKAGE_CONFIG_DIR
+
+        settings = read_config_file(config_dir) or {}
+        ranking = settings.get("ranking", {})
+
+        values = {
+            "prompt": (read_commit_prompt(config_dir) or "")
+            + format_examples(read_examples(config_dir) or []),
+            "suffix": read_commit_suffix(config_dir) or "",
+            "excluded_files": tuple(read_exclusions(config_dir) or ()),
+            "reducers": tuple(
+                (entry["pattern"], resolve_reducer(entry["reducer"], config_dir))
+                for entry in settings.get("reducers", [])
+            ),
+            "ranking_weights": {**DEFAULT_WEIGHTS, **ranking.get("weights", {})},
+            "ranking_scorer": (
+                load_callable(ranking["scorer"], config_dir)
+                if "scorer" in ranking
+                else score_section
+            ),
+            "routes": tuple(validate_routes(settings.get("routes", []))),
+            "rate_limits": parse_rate_limits(settings.get("rate_limits", {})),
+            "profile": settings.get("profile"),
+            "structured_output": settings.get("structured_output", False),
+            "max_output_tokens": settings.get(
+                "max_output_tokens", DEFAULT_MAX_OUTPUT_TOKENS
+            ),
+            "settings": settings,
+        }
+
+        return cls(**{**values, **overrides})
@@ -0,0 +1,149 @@
+"""
+End-to-end latency budget for one invocation.
+
+The commit hook blocks `git commit`, so `AIAUTOCOMMIT_DEADLINE_MS` bounds the whole pipeline. Every stage runs
+inside `Deadline.stage`, which records how long it took. Work that supports a timeout takes it from
+`Deadline.timeout`: subprocesses are killed, the internet check stops retrying and the model run is cancelled
+when the budget runs out. The caller then falls back to a `#` template.
+"""
+
+import threading
+import time
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from .log import log
+
+
+class DeadlineExceeded(BaseException):
+    """
+    Raised when the budget runs out.
+
+    Like `asyncio.CancelledError` this is a BaseException, so the `except Exception` blocks that treat
+    optional lookups as best effort don't swallow it.
+    """
+
+    def __init__(self, stage: str):
+        self.stage = stage
+        super().__init__(f"deadline exceeded during {stage}")
+
+
+class Deadline:
+    def __init__(self, budget_ms: int | None = None):
+        self.budget = budget_ms / 1000 if budget_ms else None
+        self.started = time.monotonic()
+        # seconds spent per stage, nested stages count toward their parent as well
+        self.stages: dict[str, float] = {}
+        self.current_stage: str | None = None
+        # the stage running when the budget ran out
+        self.exhausted_by: str | None = None
+        # facts about the run reported next to the timings, e.g. the model route
+        self.labels: dict[str, str] = {}
+
+    def remaining(self) -> float | None:
+        """Seconds left, None without a budget."""
+        if self.budget is None:
+            return None
+
+        return self.budget - (time.monotonic() - self.started)
+
+    def expired(self) -> bool:
+        remaining = self.remaining()
+        return remaining is not None and remaining <= 0
+
+    def timeout(self, timeout: float | None = None) -> float | None:
+        """The smaller of `timeout` and the time remaining. Raises if there is no time left."""
+        remaining = self.remaining()
+        if remaining is None:
+            return timeout
+
+        if remaining <= 0:
+            raise self.exceeded()
+
+        return remaining if timeout is None else min(timeout, remaining)
+
+    def exceeded(self, stage: str | None = None) -> DeadlineExceeded:
+        stage = stage or self.current_stage or "unknown"
+        self.exhausted_by = self.exhausted_by or stage
+        return DeadlineExceeded(self.exhausted_by)
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """
+        Time a stage. Raises `DeadlineExceeded` if the budget is spent before the stage starts or when it ends.
+        """
+        if self.expired():
+            raise self.exceeded(name)
+
+        parent_stage = self.current_stage
+        self.current_stage = name
+        started = time.monotonic()
+
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0) + time.monotonic() - started
+            self.current_stage = parent_stage
+
+        if self.expired():
+            raise self.exceeded(name)
+
+    @contextmanager
+    def cancel_on_expiry(self, cancel: Callable[[], None]) -> Iterator[None]:
+        """Call `cancel` from a timer thread if the budget runs out before the block finishes."""
+        remaining = self.remaining()
+        if remaining is None:
+            yield
+            return
+
+        timer = threading.Timer(max(remaining, 0), cancel)
+        timer.daemon = True
+        timer.start()
+
+        try:
+            yield
+        finally:
+            timer.cancel()
+
+    def report(self) -> dict:
+        return {
+            "budget_ms": round(self.budget * 1000) if self.budget else None,
+            "elapsed_ms": round((time.monotonic() - self.started) * 1000),
+            "exhausted_by": self.exhausted_by,
+            "labels": self.labels,
+            "stages_ms": {
+                name: round(seconds * 1000) for name, seconds in self.stages.items()
+            },
+        }
+
+
+CURRENT_DEADLINE: ContextVar[Deadline | None] = ContextVar("deadline", default=None)
+
+
+def get_deadline() -> Deadline:
+    """The deadline of the current invocation, an unlimited one outside of `deadline_scope`."""
+    return CURRENT_DEADLINE.get() or Deadline()
+
+
+@contextmanager
+def deadline_scope(budget_ms: int | None) -> Iterator[Deadline]:
+    deadline = Deadline(budget_ms)
+    token = CURRENT_DEADLINE.set(deadline)
+
+    try:
+        yield deadline
+    finally:
+        CURRENT_DEADLINE.reset(token)
+
+        if deadline.exhausted_by:
+            log.warning("Deadline exceeded", **deadline.report())
+        else:
+            log.debug("Stage timings", **deadline.report())
+
+
+def get_deadline_fallback_message(error: DeadlineExceeded) -> str:
+    return (
+        f"# aiautocommit: deadline exceeded during {error.stage}. "
+        "Please enter a commit message manually."
+    )
@@ -0,0 +1,184 @@
+import re
+
+# headers which repeat information already present in the `diff --git` line or which the model can't use
+_REDUNDANT_HEADER_PREFIXES = ("index ", "--- ", "+++ ")
+
+# files named in the note above a collapsed hunk, the rest are only counted
+MAX_DUPLICATE_PATHS = 5
+
+
+def split_diff_sections(diff_str: str) -> list[list[str]]:
+    """Split a git diff into one list of lines per file, each starting with its `diff --git` line."""
+    sections: list[list[str]] = []
+    current_section: list[str] = []
+
+    for line in diff_str.splitlines():
+        if line.startswith("diff --git"):
+            if current_section:
+                sections.append(current_section)
+            current_section = [line]
+        else:
+            current_section.append(line)
+    if current_section:
+        sections.append(current_section)
+
+    return sections
+
+
+def join_diff_sections(sections: list[list[str]]) -> str:
+    return "\n".join("\n".join(section) for section in sections)
+
+
+def get_section_path(section: list[str]) -> str:
+    """Return the post-image path of a diff section."""
+    match = re.match(r"^diff --git a/.* b/(.*)$", section[0])
+    return match.group(1) if match else section[0]
+
+
+def get_diff_size(section: list[str]) -> int:
+    """Calculate the number of changed lines in a diff section."""
+    try:
+        i = next(j for j, line in enumerate(section) if line.startswith("@@"))
+        return sum(
+            1 for line in section[i:] if line.startswith("+") or line.startswith("-")
+        )
+    except StopIteration:
+        return 0
+
+
+def sort_git_diff(diff_str: str) -> str:
+    """Sort git diff string by number of changed lines, smallest first."""
+    if not diff_str:
+        return diff_str
+
+    sections = split_diff_sections(diff_str)
+    sorted_sections: list[list[str]] = sorted(sections, key=get_diff_size)
+    return join_diff_sections(sorted_sections)
+
+
+def compact_section(section: list[str]) -> list[str]:
+    header_end = next(
+        (i for i, line in enumerate(section) if line.startswith("@@")), len(section)
+    )
+    headers, hunks = section[1:header_end], section[header_end:]
+
+    # `--irreversible-delete` already drops the body, the file name is all that's left to say
+    if any(line.startswith("deleted file mode") for line in headers):
+        return [section[0], "deleted file"]
+
+    compacted = [section[0]]
+    old_mode = None
+
+    for line in headers:
+        if line.startswith(_REDUNDANT_HEADER_PREFIXES):
+            continue
+
+        if line.startswith("new file mode"):
+            compacted.append("new file")
+        elif line.startswith("old mode "):
+            old_mode = line.removeprefix("old mode ")
+        elif line.startswith("new mode "):
+            compacted.append(f"mode {old_mode} => {line.removeprefix('new mode ')}")
+        else:
+            # similarity and rename/copy lines, binary file notices
+            compacted.append(line)
+
+    return compacted + hunks
+
+
+def compact_diff(diff_str: str) -> str:
+    """
+    Strip a diff down to what the model needs to describe it.
+
+    Deleted files are reduced to their header, `index` and `---`/`+++` headers are dropped and mode headers
+    are collapsed. Expects a diff produced with `compact_git_diff_flags`.
+    """
+    if not diff_str:
+        return diff_str
+
+    return join_diff_sections(
+        [compact_section(section) for section in split_diff_sections(diff_str)]
+    )
+
+
+def split_hunks(section: list[str]) -> tuple[list[str], list[list[str]]]:
+    """Split a diff section into its header lines and one list of lines per `@@` hunk."""
+    header: list[str] = []
+    hunks: list[list[str]] = []
+
+    for line in section:
+        if line.startswith("@@"):
+            hunks.append([line])
+        elif hunks:
+            hunks[-1].append(line)
+        else:
+            header.append(line)
+
+    return header, hunks
+
+
+def get_hunk_fingerprint(hunk: list[str]) -> str:
+    """
+    The changed lines of a hunk, without trailing whitespace.
+
+    Line numbers and context differ between files that received the same edit, so they are left out.
+    """
+    return "\n".join(line.rstrip() for line in hunk[1:] if line.startswith(("+", "-")))
+
+
+def format_duplicate_note(paths: list[str]) -> str:
+    listed = ", ".join(paths[:MAX_DUPLICATE_PATHS])
+    if len(paths) > MAX_DUPLICATE_PATHS:
+        listed += ", …"
+    return f"identical change applied in {len(paths)} files ({listed})"
+
+
+def dedupe_hunks(diff_str: str) -> str:
+    """
+    Collapse a hunk repeated across files into one copy, noting every file it applies to.
+
+    Codemods, import renames and license header updates repeat the same edit in hundreds of files. The first
+    file keeps the hunk under a note listing the others. The others keep their header, so renames and mode
+    changes still show, with a note pointing at the first file in place of the hunk. Runs in time linear to
+    the diff size.
+    """
+    if not diff_str:
+        return diff_str
+
+    sections = [split_hunks(section) for section in split_diff_sections(diff_str)]
+
+    paths_by_fingerprint: dict[str, list[str]] = {}
+    for header, hunks in sections:
+        path = get_section_path(header)
+        for fingerprint in dict.fromkeys(map(get_hunk_fingerprint, hunks)):
+            paths_by_fingerprint.setdefault(fingerprint, []).append(path)
+
+    if all(len(paths) < 2 for paths in paths_by_fingerprint.values()):
+        return diff_str
+
+    deduped: list[list[str]] = []
+    emitted: set[str] = set()
+
+    for header, hunks in sections:
+        kept: list[str] = []
+
+        for hunk in hunks:
+            fingerprint = get_hunk_fingerprint(hunk)
+            paths = paths_by_fingerprint[fingerprint]
+
+            if len(paths) < 2 or not fingerprint:
+                kept += hunk
+            elif fingerprint not in emitted:
+                emitted.add(fingerprint)
+                kept += [format_duplicate_note(paths), *hunk]
+            else:
+                kept.append(f"identical change as {paths[0]}")
+
+        deduped.append(header + kept)
+
+    return join_diff_sections(deduped)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token estimate, ~4 characters per token for code and English."""
+    return len(text) // 4
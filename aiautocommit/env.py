@@ -0,0 +1,59 @@
+"""
+Defaults and environment variable mapping shared by the CLI and the Python API.
+
+Importing this module has no side effects. The CLI calls `update_env_variables` when it starts, API users can
+call it themselves.
+"""
+
+import os
+
+DEFAULT_MODEL_NAME = "google:gemini-3.7-flash"
+
+
+def map_ai_key(ai_key: str, model_name: str):
+    """
+    Maps the universal AIAUTOCOMMIT_AI_KEY to the provider-specific environment variable name.
+
+    This allows a single configuration variable to work across different providers (OpenAI,
+    Anthropic, Gemini, etc.) by detecting the provider from the model name.
+
+    Specific keys (e.g. OPENAI_API_KEY) already present in the environment take precedence.
+    """
+    provider = model_name.split(":")[0]
+
+    # Map the universal key to the provider-specific environment variable name
+    # https://ai.pydantic.dev/models/overview/
+    mapping = {
+        "openai": "OPENAI_API_KEY",
+        "anthropic": "ANTHROPIC_API_KEY",
+        "google": "GOOGLE_API_KEY",
+        "gemini": "GOOGLE_API_KEY",
+        "azure": "AZURE_OPENAI_API_KEY",
+        "groq": "GROQ_API_KEY",
+        "mistral": "MISTRAL_API_KEY",
+        "cohere": "CO_API_KEY",
+    }
+
+    if target_key := mapping.get(provider):
+        # Only set if not already present (specific keys take precedence)
+        if target_key not in os.environ:
+            os.environ[target_key] = ai_key
+
+
+def update_env_variables():
+    """
+    Allow keys specific to AIAUTOCOMMIT to be set globally so project-specific keys can be used for AI calls.
+    """
+    prefix = "AIAUTOCOMMIT_"
+    # Create a list copy of keys to avoid "dictionary changed size during iteration" errors
+    # as we update os.environ within the loop.
+    for key in list(os.environ.keys()):
+        if key.startswith(prefix):
+            base_key = key[len(prefix) :]
+            # AIAUTOCOMMIT_ prefixed variables take precedence over existing variables
+            os.environ[base_key] = os.environ[key]
+
+    # Handle universal AIAUTOCOMMIT_AI_KEY mapping
+    if ai_key := os.environ.get("AIAUTOCOMMIT_AI_KEY"):
+        model_name = os.environ.get("AIAUTOCOMMIT_MODEL", DEFAULT_MODEL_NAME)
+        map_ai_key(ai_key, model_name)
@@ -0,0 +1,284 @@
+"""
+Replay historical commits against prompt variants and models.
+
+Every (variant, model, commit) combination is generated concurrently and compared with the message that was
+actually committed. The summary reports latency percentiles, token usage and how close the generated messages
+are to the originals, so a prompt change can be judged on cost and speed as well as on quality.
+"""
+
+import asyncio
+import difflib
+import math
+import re
+import statistics
+import time
+from collections import defaultdict
+from dataclasses import dataclass, replace
+from pathlib import Path
+
+from pydantic_ai.exceptions import ModelAPIError, UnexpectedModelBehavior, UserError
+
+from .api import build_prompt, get_commit_diff
+from .config import COMMIT_PROMPT_FILE, AutoCommitConfig
+from .diff import estimate_tokens
+from .model import get_agent
+from .ratelimit import async_rate_limit
+from .routing import select_route
+from .structured import STRUCTURED_INSTRUCTIONS, get_output_text, get_run_options
+from .utils import run_command
+
+CONVENTIONAL_TYPE_PATTERN = re.compile(r"^(\w+)(?:\([^)]*\))?!?:")
+
+# keep in sync with the columns printed by `format_summary`
+SUMMARY_COLUMNS = (
+    "variant",
+    "model",
+    "runs",
+    "errors",
+    "p50_ms",
+    "p90_ms",
+    "p99_ms",
+    "input_tokens",
+    "output_tokens",
+    "similarity",
+    "subject_similarity",
+    "type_match",
+)
+
+
+@dataclass(frozen=True)
+class Variant:
+    name: str
+    config: AutoCommitConfig
+
+
+@dataclass(frozen=True)
+class EvalResult:
+    variant: str
+    model: str
+    sha: str
+    original: str
+    message: str = ""
+    latency: float | None = None
+    input_tokens: int = 0
+    output_tokens: int = 0
+    error: str | None = None
+
+
+def load_variant(config_dir: str | Path, base: AutoCommitConfig) -> Variant:
+    """
+    A prompt variant from a config directory, inheriting the base config's environment settings.
+
+    Without a `commit_prompt.txt` the base prompt is used, so a variant can change just the examples or
+    exclusions.
+    """
+    config_dir = Path(config_dir)
+    config = AutoCommitConfig.from_config_dir(
+        config_dir,
+        model_name=base.model_name,
+        prompt_cutoff=base.prompt_cutoff,
+        diff_mode=base.diff_mode,
+        diff_context=base.diff_context,
+        diff_algorithm=base.diff_algorithm,
+        diff_order=base.diff_order,
+    )
+
+    if not (config_dir / COMMIT_PROMPT_FILE).exists():
+        config = replace(config, prompt=base.prompt + config.prompt)
+
+    # a variant's config.toml can switch the output mode or latency profile to compare it with the base
+    config = replace(
+        config,
+        **{
+            name: config.settings.get(name, getattr(base, name))
+            for name in ("structured_output", "max_output_tokens", "profile")
+        },
+    )
+
+    return Variant(config_dir.name, config)
+
+
+def get_commit_message(sha: str) -> str:
+    return run_command(["git", "log", "--format=%B", "-n", "1", sha], check=True).stdout
+
+
+def normalize_message(message: str, suffix: str = "") -> str:
+    if suffix.strip():
+        message = message.replace(suffix.strip(), "")
+    return message.strip()
+
+
+def get_similarity(first: str, second: str) -> float:
+    return difflib.SequenceMatcher(None, first.lower(), second.lower()).ratio()
+
+
+def get_commit_type(message: str) -> str | None:
+    match = CONVENTIONAL_TYPE_PATTERN.match(message)
+    return match.group(1) if match else None
+
+
+def get_subject(message: str) -> str:
+    return message.splitlines()[0] if message else ""
+
+
+def percentile(values: list[float], share: float) -> float:
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, math.ceil(share * len(ordered)) - 1))
+    return ordered[index]
+
+
+async def evaluate_commit(
+    variant: Variant,
+    model_name: str | None,
+    sha: str,
+    original: str,
+    semaphore: asyncio.Semaphore,
+) -> EvalResult:
+    config = variant.config
+
+    async with semaphore:
+        diff = await asyncio.to_thread(get_commit_diff, config, sha)
+
+        # an explicit model replaces the variant's routes, otherwise the route picks the model like a commit would
+        route = select_route(
+            diff,
+            model_name or config.model_name,
+            config.prompt_cutoff,
+            [] if model_name else list(config.routes),
+        )
+        result = EvalResult(
+            variant=variant.name,
+            model=route.model_name,
+            sha=sha,
+            original=normalize_message(original, config.suffix),
+        )
+
+        prompt = build_prompt(config.prompt, None, None)
+        user_prompt = diff[: route.prompt_cutoff]
+
+        run_options = {}
+        if config.structured_output:
+            prompt += STRUCTURED_INSTRUCTIONS
+            run_options = get_run_options(config.max_output_tokens)
+
+        try:
+            agent = get_agent(route.model_name, route.model_settings, config.profile)
+
+            # latency excludes the time queued for the provider's rate limit
+            async with async_rate_limit(
+                route.model_name,
+                estimate_tokens(prompt) + estimate_tokens(user_prompt),
+                config.rate_limits,
+            ):
+                started = time.perf_counter()
+                run = await agent.run(user_prompt, instructions=prompt, **run_options)
+                latency = time.perf_counter() - started
+        except (ModelAPIError, UnexpectedModelBehavior, UserError) as e:
+            return replace(result, error=str(e))
+
+    usage = run.usage()
+    return replace(
+        result,
+        message=(get_output_text(run.output) or "").strip(),
+        latency=latency,
+        input_tokens=usage.input_tokens or 0,
+        output_tokens=usage.output_tokens or 0,
+    )
+
+
+async def run_eval(
+    shas: list[str],
+    variants: list[Variant],
+    model_names: list[str | None],
+    concurrency: int = 4,
+) -> list[EvalResult]:
+    originals = await asyncio.gather(
+        *(asyncio.to_thread(get_commit_message, sha) for sha in shas)
+    )
+    semaphore = asyncio.Semaphore(concurrency)
+
+    return await asyncio.gather(
+        *(
+            evaluate_commit(variant, model_name, sha, original, semaphore)
+            for variant in variants
+            for model_name in model_names
+            for sha, original in zip(shas, originals, strict=True)
+        )
+    )
+
+
+def summarize_results(results: list[EvalResult]) -> list[dict]:
+    """One row per variant and model, in `SUMMARY_COLUMNS` order."""
+    groups: dict[tuple[str, str], list[EvalResult]] = defaultdict(list)
+    for result in results:
+        groups[(result.variant, result.model)].append(result)
+
+    rows = []
+    for (variant, model), group in groups.items():
+        succeeded = [result for result in group if result.error is None]
+        latencies = [result.latency * 1000 for result in succeeded if result.latency]
+
+        row = {
+            "variant": variant,
+            "model": model,
+            "runs": len(group),
+            "errors": len(group) - len(succeeded),
+            "p50_ms": None,
+            "p90_ms": None,
+            "p99_ms": None,
+            "input_tokens": sum(result.input_tokens for result in succeeded),
+            "output_tokens": sum(result.output_tokens for result in succeeded),
+            "similarity": None,
+            "subject_similarity": None,
+            "type_match": None,
+        }
+
+        if latencies:
+            row |= {
+                "p50_ms": round(percentile(latencies, 0.5)),
+                "p90_ms": round(percentile(latencies, 0.9)),
+                "p99_ms": round(percentile(latencies, 0.99)),
+            }
+
+        if succeeded:
+            row |= {
+                "similarity": statistics.mean(
+                    get_similarity(result.message, result.original)
+                    for result in succeeded
+                ),
+                "subject_similarity": statistics.mean(
+                    get_similarity(
+                        get_subject(result.message), get_subject(result.original)
+                    )
+                    for result in succeeded
+                ),
+                "type_match": statistics.mean(
+                    get_commit_type(result.message) == get_commit_type(result.original)
+                    for result in succeeded
+                ),
+            }
+
+        rows.append(row)
+
+    return rows
+
+
+def format_value(value) -> str:
+    if value is None:
+        return "-"
+    if isinstance(value, float):
+        return f"{value:.2f}"
+    return str(value)
+
+
+def format_summary(rows: list[dict]) -> str:
+    table = [list(SUMMARY_COLUMNS)] + [
+        [format_value(row[column]) for column in SUMMARY_COLUMNS] for row in rows
+    ]
+    widths = [max(len(line[i]) for line in table) for i in range(len(SUMMARY_COLUMNS))]
+
+    return "\n".join(
+        "  ".join(cell.ljust(width) for cell, width in zip(line, widths, strict=True))
+        for line in table
+    )
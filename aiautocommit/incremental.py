@@ -0,0 +1,125 @@
+import json
+import os
+import re
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+from .log import log
+from .repo import get_repo_context, get_worktree_cache_dir
+from .utils import get_staged_tree_id, write_file_atomic
+
+LAST_GENERATION_FILE = "last_generation.json"
+
+# characters, not tokens. A delta larger than this is sent as a full generation instead.
+INCREMENTAL_MAX_DELTA = int(
+    os.environ.get("AIAUTOCOMMIT_INCREMENTAL_MAX_DELTA", "2000")
+)
+
+UPDATE_INSTRUCTIONS = """\
+The commit message below was generated for an earlier version of the staged changes. More changes have since
+been staged, shown in the diff below. Update the commit message so it also covers the new changes, keeping
+everything that is still accurate. Follow the same formatting rules and return only the updated commit message."""
+
+
+@dataclass(frozen=True)
+class StagedSnapshot:
+    head: str
+    tree: str
+
+
+@dataclass(frozen=True)
+class LastGeneration:
+    head: str
+    tree: str
+    paths: list[str]
+    message: str
+
+
+def get_staged_snapshot(tree: str | None = None) -> StagedSnapshot | None:
+    """HEAD and the staged tree, or `tree` when the caller already wrote the index to one."""
+    tree = tree or get_staged_tree_id()
+    if not tree:
+        return None
+
+    head = get_repo_context().head_commit
+    if not head:
+        # no commits yet
+        return None
+
+    return StagedSnapshot(head=head, tree=tree)
+
+
+def get_diff_paths(diff: str) -> list[str]:
+    return re.findall(r"^diff --git a/.* b/(.*)$", diff, flags=re.MULTILINE)
+
+
+def get_last_generation_file() -> Path | None:
+    cache_dir = get_worktree_cache_dir()
+    if not cache_dir:
+        return None
+
+    return cache_dir / LAST_GENERATION_FILE
+
+
+def load_last_generation() -> LastGeneration | None:
+    last_generation_file = get_last_generation_file()
+    if not last_generation_file or not last_generation_file.exists():
+        return None
+
+    try:
+        return LastGeneration(**json.loads(last_generation_file.read_text()))
+    except (TypeError, ValueError):
+        log.debug("Ignoring unreadable last generation state")
+        return None
+
+
+def record_generation(snapshot: StagedSnapshot, diff: str, message: str) -> None:
+    """Remember the message and the staged snapshot it describes for the next incremental update."""
+    last_generation_file = get_last_generation_file()
+    if not last_generation_file:
+        return
+
+    last_generation = LastGeneration(
+        head=snapshot.head,
+        tree=snapshot.tree,
+        paths=get_diff_paths(diff),
+        message=message,
+    )
+    write_file_atomic(last_generation_file, json.dumps(asdict(last_generation)))
+
+
+def get_incremental_base(snapshot: StagedSnapshot, diff: str) -> LastGeneration | None:
+    """
+    Return the previous generation if the current staged set is a superset of its snapshot.
+
+    The previous snapshot must sit on the same HEAD, be a different tree, and every file it touched must still
+    be staged. Whether the delta is small enough is decided by the caller once the delta diff is known.
+    """
+    if INCREMENTAL_MAX_DELTA <= 0:
+        return None
+
+    last_generation = load_last_generation()
+    if not last_generation:
+        return None
+
+    if last_generation.head != snapshot.head or last_generation.tree == snapshot.tree:
+        return None
+
+    if not set(last_generation.paths) <= set(get_diff_paths(diff)):
+        return None
+
+    return last_generation
+
+
+def is_small_delta(delta: str, diff: str) -> bool:
+    return (
+        bool(delta) and len(delta) <= INCREMENTAL_MAX_DELTA and len(delta) < len(diff)
+    )
+
+
+def build_update_input(previous_message: str, delta: str) -> str:
+    return (
+        f"{UPDATE_INSTRUCTIONS}\n\n"
+        f"<previous_commit_message>\n{previous_message}\n</previous_commit_message>\n\n"
+        f"<additional_diff>\n{delta}\n</additional_diff>\n"
+    )
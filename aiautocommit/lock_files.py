@@ -0,0 +1,48 @@
+from pathlib import Path
+
+LOCK_FILE_MESSAGES = {
+    "uv.lock": "chore(deps): update uv.lock",
+    "poetry.lock": "chore(deps): update poetry.lock",
+    "Pipfile.lock": "chore(deps): update Pipfile.lock",
+    "package-lock.json": "chore(deps): update package-lock.json",
+    "yarn.lock": "chore(deps): update yarn.lock",
+    "pnpm-lock.yaml": "chore(deps): update pnpm-lock.yaml",
+    "bun.lockb": "chore(deps): update bun.lockb",
+    "bun.lock": "chore(deps): update bun.lock",
+    "Gemfile.lock": "chore(deps): update Gemfile.lock",
+    "composer.lock": "chore(deps): update composer.lock",
+    "mix.lock": "chore(deps): update mix.lock",
+    "mise.lock": "chore(deps): update mise.lock",
+    "Cargo.lock": "chore(deps): update Cargo.lock",
+    "go.sum": "chore(deps): update go.sum",
+    ".terraform.lock.hcl": "chore(deps): update .terraform.lock.hcl",
+}
+
+
+def get_lock_file_message(staged_files: list[str]) -> str | None:
+    """
+    Return a standard commit message if every staged file is a lock file, without the commit suffix.
+    """
+    messages = []
+
+    for file_path in staged_files:
+        filename = Path(file_path).name
+
+        if filename in LOCK_FILE_MESSAGES:
+            messages.append(LOCK_FILE_MESSAGES[filename])
+        elif filename.startswith("mise") and filename.endswith("lock"):
+            messages.append(f"chore(deps): update {filename}")
+        else:
+            # If any file is not a recognized lock file, we can't use a static message
+            return None
+
+    if not messages:
+        return None
+
+    # If we are here, all staged files are recognized lock files
+    unique_messages = set(messages)
+
+    if len(unique_messages) == 1:
+        return unique_messages.pop()
+
+    return "chore(deps): update lock files"
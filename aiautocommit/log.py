@@ -20,3 +20,12 @@ def setup_logging():
 
 
 log = setup_logging()
+
+
+def is_debug_enabled() -> bool:
+    """
+    Guard for debug payloads that are costly to build.
+
+    Debug calls are no-ops below the configured level, but their arguments are still evaluated.
+    """
+    return log.is_enabled_for(logging.DEBUG)
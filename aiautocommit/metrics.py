@@ -0,0 +1,255 @@
+"""
+Optional run metrics for fleets of developer machines and CI agents.
+
+Timings from `log_execution_time` (`overall_execution`, `ai_generation`, one timer per git subcommand), fast-path
+and fallback counts and token usage are collected in memory during a run and emitted once it ends:
+
+* `AIAUTOCOMMIT_METRICS_TEXTFILE=/var/lib/node_exporter/textfile/aiautocommit.prom` accumulates them in a
+  Prometheus node-exporter textfile, as counters and duration summaries shared by every run on the machine.
+* `AIAUTOCOMMIT_STATSD=host:port` sends them to StatsD over UDP.
+
+Recording is a dict update and neither sink waits on anything: StatsD packets go out on a non-blocking socket
+and the textfile is rewritten from a background thread, which the process waits for at exit only as long as
+the deadline allows.
+"""
+
+import atexit
+import functools
+import os
+import re
+import socket
+import threading
+from collections import Counter
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+
+from .deadline import Deadline
+from .log import log
+
+METRICS_TEXTFILE = os.environ.get("AIAUTOCOMMIT_METRICS_TEXTFILE") or None
+STATSD_ADDRESS = os.environ.get("AIAUTOCOMMIT_STATSD") or None
+
+METRIC_PREFIX = "aiautocommit"
+DURATION_METRIC = "duration_seconds"
+
+TEXTFILE_LINE_PATTERN = re.compile(r"^(\w+)\{(.*)\} (\S+)$")
+TEXTFILE_LABEL_PATTERN = re.compile(r'(\w+)="((?:[^"\\]|\\.)*)"')
+ESCAPED_CHARACTER_PATTERN = re.compile(r"\\(.)")
+STATSD_UNSAFE_PATTERN = re.compile(r"[^\w-]")
+
+# keeps StatsD packets under a typical MTU
+MAX_STATSD_PACKET = 1400
+
+# the least time the textfile write gets at exit, even after a run that used up its deadline
+MIN_TEXTFILE_WAIT = 0.5
+
+# a counter is a metric name and its sorted labels
+CounterKey = tuple[str, tuple[tuple[str, str], ...]]
+
+
+class Metrics:
+    def __init__(self):
+        # seconds per timer, a timer can run several times, e.g. git diff
+        self.timings: list[tuple[str, float, tuple[tuple[str, str], ...]]] = []
+        self.counters: Counter[CounterKey] = Counter()
+        # seconds the process waits for the textfile write at exit, None waits for as long as it takes
+        self.write_timeout: float | None = None
+
+    def timing(self, name: str, seconds: float, **labels: str) -> None:
+        self.timings.append((name, seconds, tuple(sorted(labels.items()))))
+
+    def increment(self, name: str, value: float = 1, **labels: str) -> None:
+        self.counters[(name, tuple(sorted(labels.items())))] += value
+
+    def get_totals(self) -> Counter[CounterKey]:
+        """Counters plus the sum and count of every timer, as Prometheus series."""
+        totals = Counter(
+            {
+                (f"{name}_total", labels): value
+                for (name, labels), value in self.counters.items()
+            }
+        )
+
+        for name, seconds, timer_labels in self.timings:
+            labels = tuple(sorted((("timer", name), *timer_labels)))
+            totals[(f"{DURATION_METRIC}_sum", labels)] += seconds
+            totals[(f"{DURATION_METRIC}_count", labels)] += 1
+
+        return totals
+
+    def to_statsd(self) -> list[str]:
+        lines = [
+            f"{get_statsd_path(name, labels)}:{seconds * 1000:.1f}|ms"
+            for name, seconds, labels in self.timings
+        ]
+
+        for (name, labels), value in self.counters.items():
+            lines.append(f"{get_statsd_path(name, labels)}:{value:g}|c")
+
+        return lines
+
+
+def get_statsd_path(name: str, labels: tuple[tuple[str, str], ...]) -> str:
+    """StatsD has no labels, so their values are appended to the name: `aiautocommit.tokens.input.gpt-4o`."""
+    return ".".join(
+        [METRIC_PREFIX, name]
+        + [STATSD_UNSAFE_PATTERN.sub("_", label) for _, label in labels]
+    )
+
+
+def parse_textfile(content: str) -> Counter[CounterKey]:
+    totals: Counter[CounterKey] = Counter()
+
+    for line in content.splitlines():
+        if not (match := TEXTFILE_LINE_PATTERN.match(line)):
+            continue
+
+        name, labels, value = match.groups()
+        labels = tuple(
+            sorted(
+                (key, ESCAPED_CHARACTER_PATTERN.sub(r"\1", value))
+                for key, value in TEXTFILE_LABEL_PATTERN.findall(labels)
+            )
+        )
+        totals[(name.removeprefix(f"{METRIC_PREFIX}_"), labels)] += float(value)
+
+    return totals
+
+
+def escape_label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"')
+
+
+def format_textfile(totals: Counter[CounterKey]) -> str:
+    lines = []
+    typed: set[str] = set()
+
+    for (name, labels), value in sorted(totals.items()):
+        family = name.removesuffix("_sum").removesuffix("_count")
+        if family not in typed:
+            typed.add(family)
+            kind = "summary" if family == DURATION_METRIC else "counter"
+            lines.append(f"# TYPE {METRIC_PREFIX}_{family} {kind}")
+
+        formatted_labels = ",".join(
+            f'{key}="{escape_label_value(value)}"' for key, value in labels
+        )
+        lines.append(f"{METRIC_PREFIX}_{name}{{{formatted_labels}}} {value:g}")
+
+    return "\n".join(lines) + "\n"
+
+
+def write_textfile(metrics: Metrics, path: Path) -> None:
+    """Add a run's metrics to the totals in `path`, which other runs may update at the same time."""
+    # imported here since utils reports command timings through this module
+    from .utils import file_lock, write_file_atomic
+
+    try:
+        with file_lock(
+            path.with_name(f".{path.name}.lock"), timeout=metrics.write_timeout
+        ) as locked:
+            # rewriting the totals without the lock could drop another run's update
+            if not locked:
+                log.warning(f"Timed out waiting to write metrics to {path}")
+                return
+
+            totals = parse_textfile(path.read_text()) if path.exists() else Counter()
+            totals.update(metrics.get_totals())
+
+            # the exporter must never read a half written file
+            write_file_atomic(path, format_textfile(totals))
+    except OSError as e:
+        log.warning(f"Could not write metrics to {path}: {e}")
+
+
+@functools.cache
+def resolve_statsd_address(address: str) -> tuple[str, int]:
+    """The IP and port for `host:port`, looked up once per process since the DNS lookup blocks."""
+    host, _, port = address.rpartition(":")
+    *_, sockaddr = socket.getaddrinfo(
+        host or "127.0.0.1", int(port), socket.AF_INET, socket.SOCK_DGRAM
+    )[0]
+    return sockaddr
+
+
+def send_statsd(metrics: Metrics, address: str) -> None:
+    packets: list[str] = []
+    for line in metrics.to_statsd():
+        if packets and len(packets[-1]) + len(line) < MAX_STATSD_PACKET:
+            packets[-1] += "\n" + line
+        else:
+            packets.append(line)
+
+    try:
+        sockaddr = resolve_statsd_address(address)
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+            sock.setblocking(False)
+            for packet in packets:
+                sock.sendto(packet.encode(), sockaddr)
+    except (OSError, ValueError) as e:
+        log.debug(f"Could not send metrics to {address}: {e}")
+
+
+CURRENT_METRICS: ContextVar[Metrics | None] = ContextVar("metrics", default=None)
+
+
+def record_timing(name: str, seconds: float) -> None:
+    """Add a timing to the current run's metrics, a no-op unless metrics are enabled."""
+    if metrics := CURRENT_METRICS.get():
+        metrics.timing(name, seconds)
+
+
+def increment(name: str, value: float = 1, **labels: str) -> None:
+    if metrics := CURRENT_METRICS.get():
+        metrics.increment(name, value, **labels)
+
+
+def record_deadline(deadline: Deadline) -> None:
+    """
+    Add a run's deadline to its metrics: the time per stage, and the stage that used up the budget.
+
+    What is left of the budget also bounds the textfile write, so `git commit` doesn't wait on it at exit.
+    """
+    if not (metrics := CURRENT_METRICS.get()):
+        return
+
+    for stage, seconds in deadline.stages.items():
+        metrics.timing("deadline_stage", seconds, stage=stage)
+
+    if deadline.exhausted_by:
+        metrics.increment("deadline_exceeded", stage=deadline.exhausted_by)
+
+    if (remaining := deadline.remaining()) is not None:
+        metrics.write_timeout = max(remaining, MIN_TEXTFILE_WAIT)
+
+
+@contextmanager
+def metrics_scope() -> Iterator[Metrics | None]:
+    """Collect metrics for the duration of a run and emit them to the configured sinks afterwards."""
+    if not METRICS_TEXTFILE and not STATSD_ADDRESS:
+        yield None
+        return
+
+    metrics = Metrics()
+    token = CURRENT_METRICS.set(metrics)
+
+    try:
+        yield metrics
+    finally:
+        CURRENT_METRICS.reset(token)
+
+        if STATSD_ADDRESS:
+            send_statsd(metrics, STATSD_ADDRESS)
+
+        if METRICS_TEXTFILE:
+            thread = threading.Thread(
+                target=write_textfile,
+                args=(metrics, Path(METRICS_TEXTFILE).expanduser()),
+                name="aiautocommit-metrics",
+                daemon=True,
+            )
+            thread.start()
+            # the interpreter doesn't wait for daemon threads, so wait here for as long as the deadline allows
+            atexit.register(thread.join, metrics.write_timeout)
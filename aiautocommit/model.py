@@ -0,0 +1,175 @@
+"""
+Reusable agents, models and providers.
+
+Resolving a model and building its provider (and with it the HTTP client) on every generation repeats a TLS
+handshake per call. The pool keeps one provider per provider name, one model per model name and one agent per
+model name and settings, so repeated generations in the same process reuse keep-alive connections. The system
+prompt is passed per run, which lets one agent serve every prompt.
+
+HTTP connections belong to the event loop that opened them, so each loop gets its own pool.
+"""
+
+import asyncio
+import weakref
+from collections import Counter
+
+from pydantic_ai import Agent, ModelSettings
+from pydantic_ai.models import Model, infer_model
+from pydantic_ai.providers import Provider, infer_provider
+
+from . import replay
+from .log import log
+from .profiles import get_profile_name, get_profile_settings
+from .replay import ReplayAgent
+
+
+def get_model_settings(
+    model: Model,
+    model_settings: ModelSettings | None = None,
+    profile: str | None = None,
+) -> ModelSettings | None:
+    """
+    Settings for a commit message generation, None to use the provider defaults.
+
+    The latency profile's settings for the model's provider, overridden by explicit ones such as a route's.
+    """
+    settings = {
+        **(get_profile_settings(model, profile) or {}),
+        **(model_settings or {}),
+    }
+    return ModelSettings(**settings) if settings else None
+
+
+def get_settings_key(model_settings: ModelSettings | None) -> tuple | None:
+    if model_settings is None:
+        return None
+
+    return tuple(sorted((key, repr(value)) for key, value in model_settings.items()))
+
+
+def build_provider(provider_name: str) -> Provider:
+    """
+    Provider whose SDK client makes a single attempt per request.
+
+    The OpenAI and Anthropic SDKs retry twice by default, sleeping for `Retry-After` on their own. On top of
+    `retry.retry_transient_errors` that is up to 9 requests per generation, with waits that ignore the deadline
+    and never show up in the retry metrics. Their clients read `max_retries` on every request, so it's turned
+    off on the client the provider built. Other SDKs, such as google-genai, don't retry unless configured to.
+    """
+    provider = infer_provider(provider_name)
+
+    client = getattr(provider, "client", None)
+    if isinstance(getattr(client, "max_retries", None), int):
+        client.max_retries = 0
+
+    return provider
+
+
+# process-wide counts by kind (agent, model, provider), kept after a loop and its pool are gone
+POOL_HITS: Counter[str] = Counter()
+POOL_MISSES: Counter[str] = Counter()
+
+
+class ModelPool:
+    def __init__(self):
+        self.providers: dict[str, Provider] = {}
+        self.models: dict[str, Model] = {}
+        self.agents: dict[tuple, Agent] = {}
+
+    def get_provider(self, provider_name: str) -> Provider:
+        if provider := self.providers.get(provider_name):
+            POOL_HITS["provider"] += 1
+            return provider
+
+        POOL_MISSES["provider"] += 1
+        provider = self.providers[provider_name] = build_provider(provider_name)
+        return provider
+
+    def get_model(self, model_name: str) -> Model:
+        if model := self.models.get(model_name):
+            POOL_HITS["model"] += 1
+            return model
+
+        POOL_MISSES["model"] += 1
+        model = self.models[model_name] = infer_model(
+            model_name, provider_factory=self.get_provider
+        )
+        return model
+
+    def get_agent(
+        self,
+        model_name: str,
+        model_settings: ModelSettings | None = None,
+        profile: str | None = None,
+    ) -> Agent:
+        """
+        Agent for a model name, settings and latency profile, created on first use.
+
+        Explicit settings are merged over the profile's, see `get_model_settings`.
+        """
+        profile = get_profile_name(profile)
+        key = (model_name, profile, get_settings_key(model_settings))
+        if agent := self.agents.get(key):
+            POOL_HITS["agent"] += 1
+            return agent
+
+        POOL_MISSES["agent"] += 1
+        model = self.get_model(model_name)
+        model_settings = get_model_settings(model, model_settings, profile)
+
+        agent = self.agents[key] = Agent(model, model_settings=model_settings)
+        log.debug(f"Created agent for {model_name} with settings {model_settings}")
+        return agent
+
+
+# used outside of a running event loop, e.g. by `Agent.run_sync`, which always drives the same loop per thread
+SYNC_POOL = ModelPool()
+LOOP_POOLS: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, ModelPool] = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def get_pool() -> ModelPool:
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return SYNC_POOL
+
+    if loop not in LOOP_POOLS:
+        LOOP_POOLS[loop] = ModelPool()
+
+    return LOOP_POOLS[loop]
+
+
+def get_agent(
+    model_name: str,
+    model_settings: ModelSettings | None = None,
+    profile: str | None = None,
+) -> Agent | ReplayAgent:
+    """Pooled agent for a model, `profile` defaults to `AIAUTOCOMMIT_PROFILE`."""
+    if replay.REPLAY_MODE:
+        return ReplayAgent(
+            model_name,
+            model_settings,
+            lambda: get_pool().get_agent(model_name, model_settings, profile),
+            get_profile_name(profile),
+        )
+
+    return get_pool().get_agent(model_name, model_settings, profile)
+
+
+def get_pool_stats() -> dict[str, dict[str, int]]:
+    """Pool hit and miss counts across every event loop."""
+    return {
+        kind: {"hits": POOL_HITS[kind], "misses": POOL_MISSES[kind]}
+        for kind in ("agent", "model", "provider")
+    }
+
+
+def reset_pools() -> None:
+    global SYNC_POOL
+
+    SYNC_POOL = ModelPool()
+    LOOP_POOLS.clear()
+    POOL_HITS.clear()
+    POOL_MISSES.clear()
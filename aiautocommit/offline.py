@@ -0,0 +1,264 @@
+"""
+Commit message drafts built from the staged diff alone, without a model.
+
+Used with `commit --offline`, and as a starting point for the user when there is no internet connection, the
+model is unavailable or the deadline runs out. The type comes from the kind of files changed, the scope from
+their common directory and the subject from the symbols added or removed.
+"""
+
+import re
+from collections import Counter
+from dataclasses import dataclass
+from pathlib import PurePosixPath
+
+from .diff import get_section_path, split_diff_sections
+from .ranking import classify_path, matches_any
+from .reducers import get_changed_lines, is_new_or_deleted
+
+CI_PATTERNS = [
+    ".github/workflows/*",
+    ".github/actions/*",
+    ".gitlab-ci.yml",
+    ".circleci/*",
+    ".travis.yml",
+    ".buildkite/*",
+    "Jenkinsfile",
+    "azure-pipelines.yml",
+    "bitbucket-pipelines.yml",
+]
+BUILD_PATTERNS = [
+    "Dockerfile",
+    "*.dockerfile",
+    "Makefile",
+    "Justfile",
+    "pyproject.toml",
+    "setup.py",
+    "setup.cfg",
+    "package.json",
+    "Cargo.toml",
+    "go.mod",
+    "Gemfile",
+    "*.gemspec",
+    "CMakeLists.txt",
+    "pom.xml",
+    "build.gradle*",
+]
+
+# commit type for changes that touch no source files, keyed by the kind with the most changed lines
+KIND_TYPES = {
+    "ci": "ci",
+    "build": "build",
+    "test": "test",
+    "docs": "docs",
+    "config": "chore",
+    "generated": "chore",
+}
+
+# directories too generic to be a useful scope
+GENERIC_SCOPES = {
+    "src",
+    "lib",
+    "app",
+    "pkg",
+    "internal",
+    "tests",
+    "test",
+    "docs",
+    "spec",
+}
+
+# definitions of functions, classes and methods in common languages
+SYMBOL_PATTERN = re.compile(
+    r"^\s*(?:export\s+)?(?:default\s+)?(?:pub(?:\(\w+\))?\s+)?(?:async\s+)?"
+    r"(?:def|class|function|func(?:\s*\([^)]*\))?|fn|module|interface|struct|enum|trait)\s+(\w+)"
+)
+
+MAX_SUBJECT_LENGTH = 50
+MAX_SUBJECT_NAMES = 2
+MAX_BODY_FILES = 5
+
+OFFLINE_DRAFT_NOTE = "# aiautocommit: offline draft generated without the model, review it before committing."
+
+
+@dataclass
+class FileChange:
+    path: str
+    kind: str
+    added: int
+    removed: int
+    is_new: bool
+    is_deleted: bool
+    added_symbols: list[str]
+    removed_symbols: list[str]
+
+    @property
+    def churn(self) -> int:
+        return self.added + self.removed
+
+
+def get_symbols(lines: list[str]) -> list[str]:
+    symbols = []
+    for line in lines:
+        if (match := SYMBOL_PATTERN.match(line)) and match.group(1) not in symbols:
+            symbols.append(match.group(1))
+    return symbols
+
+
+def classify_change_path(path: str) -> str:
+    """Like `ranking.classify_path`, with CI and build files split out of config."""
+    if matches_any(path, CI_PATTERNS):
+        return "ci"
+    if matches_any(path, BUILD_PATTERNS):
+        return "build"
+    return classify_path(path)
+
+
+def parse_file_change(section: list[str]) -> FileChange:
+    path = get_section_path(section)
+    added_lines, removed_lines = get_changed_lines(section)
+    is_new, is_deleted = is_new_or_deleted(section)
+    added_symbols, removed_symbols = (
+        get_symbols(added_lines),
+        get_symbols(removed_lines),
+    )
+
+    return FileChange(
+        path=path,
+        kind=classify_change_path(path),
+        added=len(added_lines),
+        removed=len(removed_lines),
+        is_new=is_new,
+        is_deleted=is_deleted,
+        # a definition on both sides was edited in place, not added or removed
+        added_symbols=[s for s in added_symbols if s not in removed_symbols],
+        removed_symbols=[s for s in removed_symbols if s not in added_symbols],
+    )
+
+
+def infer_type(changes: list[FileChange]) -> str:
+    sources = [change for change in changes if change.kind == "source"]
+
+    if sources:
+        if any(change.is_new or change.added_symbols for change in sources):
+            return "feat"
+        if all(change.is_deleted or not change.added for change in sources):
+            return "refactor"
+        return "fix"
+
+    churn_by_kind: Counter[str] = Counter()
+    for change in changes:
+        churn_by_kind[change.kind] += change.churn or 1
+
+    return KIND_TYPES[churn_by_kind.most_common(1)[0][0]]
+
+
+def infer_scope(changes: list[FileChange]) -> str | None:
+    """The innermost directory shared by every file, unless it is too generic to say anything."""
+    directories = [PurePosixPath(change.path).parent.parts for change in changes]
+    common: list[str] = []
+
+    for parts in zip(*directories, strict=False):
+        if len(set(parts)) > 1:
+            break
+        common.append(parts[0])
+
+    scope = next(
+        (
+            part.lstrip(".")
+            for part in reversed(common)
+            if part.lstrip(".") and part not in GENERIC_SCOPES
+        ),
+        None,
+    )
+    return scope.lower() if scope else None
+
+
+def join_names(names: list[str], total: int | None = None) -> str:
+    total = total if total is not None else len(names)
+    shown = names[:MAX_SUBJECT_NAMES]
+
+    if total > len(shown):
+        return f"{', '.join(shown)} and {total - len(shown)} more"
+    if len(shown) == 2:
+        return f"{shown[0]} and {shown[1]}"
+    return shown[0]
+
+
+def write_subject(changes: list[FileChange]) -> str:
+    added_symbols = [s for change in changes for s in change.added_symbols]
+    removed_symbols = [s for change in changes for s in change.removed_symbols]
+
+    if added_symbols:
+        return f"add {join_names(added_symbols)}"
+    if removed_symbols:
+        return f"remove {join_names(removed_symbols)}"
+
+    new_files = [change for change in changes if change.is_new]
+    deleted_files = [change for change in changes if change.is_deleted]
+
+    if new_files and len(new_files) == len(changes):
+        verb, files = "add", new_files
+    elif deleted_files and len(deleted_files) == len(changes):
+        verb, files = "remove", deleted_files
+    else:
+        verb, files = "update", changes
+
+    names = [PurePosixPath(change.path).name for change in files]
+    return f"{verb} {join_names(names, len(files))}"
+
+
+def write_body(changes: list[FileChange]) -> str:
+    lines = [
+        f"- {change.path} (+{change.added} -{change.removed})"
+        for change in changes[:MAX_BODY_FILES]
+    ]
+
+    if len(changes) > MAX_BODY_FILES:
+        lines.append(f"- and {len(changes) - MAX_BODY_FILES} more files")
+
+    return "\n".join(lines)
+
+
+def generate_offline_message(diff: str) -> str:
+    """Return a conventional commit draft for a staged diff, empty if the diff has no file sections."""
+    changes = [
+        parse_file_change(section)
+        for section in split_diff_sections(diff)
+        if section[0].startswith("diff --git")
+    ]
+    if not changes:
+        return ""
+
+    # most changed first, which is what the subject and body describe
+    changes.sort(key=lambda change: change.churn, reverse=True)
+
+    # generated files and lock files are rarely the point of a change
+    relevant = [change for change in changes if change.kind != "generated"] or changes
+
+    commit_type = infer_type(relevant)
+    scope = infer_scope(relevant)
+    prefix = f"{commit_type}({scope})" if scope else commit_type
+
+    subject = write_subject(relevant)
+    if len(subject) > MAX_SUBJECT_LENGTH:
+        subject = subject[: MAX_SUBJECT_LENGTH - 3].rstrip() + "..."
+
+    message = f"{prefix}: {subject}"
+
+    if len(changes) > 1:
+        message += f"\n\n{write_body(changes)}"
+
+    return message
+
+
+def get_offline_fallback_message(reason: str, diff: str | None) -> str:
+    """
+    A `#` comment explaining why the model wasn't used, followed by an offline draft when there is a diff.
+
+    The leading `#` keeps the draft from being committed without review.
+    """
+    draft = generate_offline_message(diff) if diff else ""
+    if not draft:
+        return reason
+
+    return f"{reason}\n{OFFLINE_DRAFT_NOTE}\n{draft}"
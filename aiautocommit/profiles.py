@@ -0,0 +1,129 @@
+"""
+Latency profiles: named presets of provider-specific model settings.
+
+Reasoning models think before they answer, and with provider defaults that hidden reasoning can add seconds to a
+commit message. `AIAUTOCOMMIT_PROFILE=fast|balanced|quality` picks a row of `PROFILES` for the model's provider:
+thinking effort, output token cap, temperature and request timeout. A provider row replaces the `*` row rather
+than extending it, since the settings one provider accepts can be rejected by another (OpenAI reasoning models
+refuse a temperature, for instance).
+
+`balanced`, the default, keeps the provider defaults except for Gemini's cheapest thinking level. `[profiles]`
+tables in `config.toml` change rows or add profiles:
+
+    [profiles.fast.anthropic]
+    max_tokens = 200
+"""
+
+import importlib
+import os
+
+from pydantic_ai import ModelSettings
+from pydantic_ai.exceptions import UserError
+from pydantic_ai.models import Model
+
+DEFAULT_PROFILE = "balanced"
+
+PROFILE = os.environ.get("AIAUTOCOMMIT_PROFILE", "").lower() or DEFAULT_PROFILE
+
+# row names for model classes, in the order they are checked. Missing provider packages are skipped.
+PROVIDER_MODEL_CLASSES = {
+    "google": ("pydantic_ai.models.google", "GoogleModel"),
+    "openai": ("pydantic_ai.models.openai", "OpenAIChatModel"),
+    "openai_responses": ("pydantic_ai.models.openai", "OpenAIResponsesModel"),
+    "anthropic": ("pydantic_ai.models.anthropic", "AnthropicModel"),
+}
+
+# the `openai` row covers both OpenAI APIs
+PROVIDER_ALIASES = {"openai_responses": "openai"}
+
+BUILTIN_PROFILES: dict[str, dict[str, dict]] = {
+    "fast": {
+        "*": {"thinking": False, "max_tokens": 400, "temperature": 0.2, "timeout": 15},
+        # Gemini 3.7+ rejects thinking_level=minimal, low is the cheapest level accepted across current models
+        "google": {
+            "thinking": "low",
+            "max_tokens": 400,
+            "temperature": 0.2,
+            "timeout": 15,
+        },
+        "openai": {"thinking": False, "max_tokens": 400, "timeout": 15},
+    },
+    "balanced": {
+        # https://ai.pydantic.dev/models/google/#configure-thinking
+        "google": {"thinking": "low"},
+    },
+    "quality": {
+        "*": {"thinking": "medium", "timeout": 60},
+    },
+}
+
+# set from the `[profiles]` tables of config.toml
+PROFILES: dict[str, dict[str, dict]] = {
+    name: {provider: dict(settings) for provider, settings in rows.items()}
+    for name, rows in BUILTIN_PROFILES.items()
+}
+
+
+# row names a profile can have, `*` applies to providers without a row of their own
+PROVIDER_ROWS = {
+    "*",
+    *(PROVIDER_ALIASES.get(name, name) for name in PROVIDER_MODEL_CLASSES),
+}
+
+
+def configure_profiles(tables: dict[str, dict[str, dict]]) -> None:
+    """Merge `[profiles.<name>.<provider>]` tables into the built-in profiles."""
+    for name, rows in tables.items():
+        if not isinstance(rows, dict):
+            raise UserError(f"[profiles.{name}] must be a table of provider rows")
+
+        # a misspelled provider would otherwise be ignored without a word
+        if unknown_rows := set(rows) - PROVIDER_ROWS:
+            raise UserError(
+                f"Unknown providers in [profiles.{name}]: {', '.join(sorted(unknown_rows))}, "
+                f"expected one of {', '.join(sorted(PROVIDER_ROWS))}"
+            )
+
+        profile = PROFILES.setdefault(name.lower(), {})
+        for provider, settings in rows.items():
+            if not isinstance(settings, dict):
+                raise UserError(
+                    f"[profiles.{name}.{provider}] must be a table of model settings"
+                )
+
+            profile[provider] = {**profile.get(provider, {}), **settings}
+
+
+def get_profile_name(profile: str | None = None) -> str:
+    name = (profile or PROFILE).lower()
+    if name not in PROFILES:
+        raise UserError(
+            f"Unknown profile {name!r}, expected one of {', '.join(sorted(PROFILES))}"
+        )
+
+    return name
+
+
+def get_model_provider(model: Model) -> str | None:
+    for provider, (module_name, class_name) in PROVIDER_MODEL_CLASSES.items():
+        try:
+            model_class = getattr(importlib.import_module(module_name), class_name)
+        except ImportError:
+            continue
+
+        if isinstance(model, model_class):
+            return PROVIDER_ALIASES.get(provider, provider)
+
+    return None
+
+
+def get_profile_settings(
+    model: Model, profile: str | None = None
+) -> ModelSettings | None:
+    """The profile's settings for the model's provider, None to use the provider defaults."""
+    rows = PROFILES[get_profile_name(profile)]
+
+    provider = get_model_provider(model)
+    settings = rows[provider] if provider in rows else rows.get("*")
+
+    return ModelSettings(**settings) if settings else None
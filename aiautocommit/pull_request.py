@@ -1,66 +1,194 @@
+import hashlib
 import json
 import os
 import re
 import shutil
-import time
-from pathlib import Path
+import sqlite3
+from collections.abc import Callable
 
+from pydantic_ai import CancellationToken
+from pydantic_ai.exceptions import ModelAPIError, RunCancelled, UserError
+
+from .deadline import get_deadline
+from .diff import estimate_tokens
 from .log import log
-from .utils import is_default_branch, run_command
+from .repo import RepoContext, get_cache_dir, get_repo_context, is_default_branch
+from .store import Store, open_store
+from .utils import file_lock, run_command
 
 # Cache durations in seconds
 PR_CONTENT_CACHE_TTL = 7200  # 2 hours
 NEGATIVE_CACHE_TTL = 3600  # 1 hour
 
+# the longest a hook waits for another process to finish fetching PR context
+MAX_FETCH_LOCK_WAIT = 10.0
+
+# the PR body is sent with every commit on the branch, so it's trimmed to this many tokens
+PR_CONTEXT_MAX_TOKENS = int(os.environ.get("AIAUTOCOMMIT_PR_CONTEXT_MAX_TOKENS", 1000))
+# longer code blocks, usually logs or stack traces, are dropped from the PR body
+MAX_CODE_BLOCK_LINES = 10
+
+HTML_COMMENT_PATTERN = re.compile(r"<!--.*?-->", re.DOTALL)
+IMAGE_PATTERNS = (
+    re.compile(r"!\[[^\]]*\]\([^)]*\)"),
+    re.compile(r"<img\b[^>]*>", re.IGNORECASE),
+    # pasted screenshots and videos are uploaded as bare links on their own line
+    re.compile(r"^\s*https://github\.com/user-attachments/\S+\s*$", re.MULTILINE),
+)
+CHECKLIST_PATTERN = re.compile(r"^\s*[-*] \[[ xX]\] .*$", re.MULTILINE)
+CODE_BLOCK_PATTERN = re.compile(r"^(```|~~~).*?^\1[ \t]*$", re.DOTALL | re.MULTILINE)
+BLANK_LINES_PATTERN = re.compile(r"\n\s*\n(\s*\n)+")
+TITLE_PATTERN = re.compile(r"<pull_request_title>.*?</pull_request_title>", re.DOTALL)
+
+PR_SUMMARY_PROMPT = """\
+Summarize this pull request description for someone writing commit messages for it.
+Write at most five short bullet points covering the motivation and the intended change.
+Leave out checklists, testing instructions and anything about the review process.
+Output only the bullet points."""
+
+
+def is_pr_summary_enabled() -> bool:
+    return os.environ.get("AIAUTOCOMMIT_PR_SUMMARY", "false").lower() in (
+        "1",
+        "true",
+        "t",
+    )
+
+
+def replace_long_code_block(match: re.Match) -> str:
+    lines = match.group(0).count("\n") - 1
+    if lines <= MAX_CODE_BLOCK_LINES:
+        return match.group(0)
+
+    return f"[{lines} line code block omitted]"
+
+
+def compress_pr_body(body: str, max_tokens: int | None = None) -> str:
+    """
+    Strip a PR body down to the prose that explains the change.
+
+    HTML comments, images, checklists and long code blocks are dropped, and what's left is cut to
+    `max_tokens` at a line boundary.
+    """
+    if max_tokens is None:
+        max_tokens = PR_CONTEXT_MAX_TOKENS
+
+    body = HTML_COMMENT_PATTERN.sub("", body.replace("\r\n", "\n"))
+    for pattern in IMAGE_PATTERNS:
+        body = pattern.sub("", body)
+    body = CHECKLIST_PATTERN.sub("", body)
+    body = CODE_BLOCK_PATTERN.sub(replace_long_code_block, body)
+    body = BLANK_LINES_PATTERN.sub("\n\n", body).strip()
+
+    if estimate_tokens(body) <= max_tokens:
+        return body
+
+    truncated = body[: max_tokens * 4].rsplit("\n", 1)[0]
+    return f"{truncated}\n[PR description truncated]"
+
+
+def format_pr_context(number: str, title: str, body: str) -> str:
+    return (
+        f"<pull_request_title>PR #{number}: {title}</pull_request_title>\n"
+        f"<pull_request_description>\n{compress_pr_body(body)}\n</pull_request_description>\n"
+    )
+
+
+def summarize_pr_context(context: str, model_name: str) -> str | None:
+    from .model import get_agent
+
+    deadline = get_deadline()
+    cancellation_token = CancellationToken()
 
-def get_git_dir() -> Path | None:
     try:
-        return Path(
-            run_command(["git", "rev-parse", "--git-dir"], check=True).stdout.strip()
-        )
-    except Exception:
+        with deadline.cancel_on_expiry(cancellation_token.cancel):
+            result = get_agent(model_name).run_sync(
+                context,
+                instructions=PR_SUMMARY_PROMPT,
+                cancellation_token=cancellation_token,
+            )
+    except (ModelAPIError, UserError, RunCancelled) as e:
+        log.debug(f"Could not summarize PR description, using it as is: {e}")
         return None
 
+    if not result.output or not result.output.strip():
+        return None
+
+    title = match.group(0) if (match := TITLE_PATTERN.search(context)) else ""
+    return f"{title}\n<pull_request_summary>\n{result.output.strip()}\n</pull_request_summary>\n"
+
+
+def call_store(method: Callable, *args):
+    """
+    Run a store method, returning None when the database is locked or broken.
+
+    Hooks in several worktrees share the store, and a cache that can't be used right now is treated as empty
+    instead of failing the commit.
+    """
+    try:
+        return method(*args)
+    except sqlite3.Error as e:
+        log.warning(f"PR context cache unavailable, continuing without it: {e}")
+        return None
+
+
+def get_pr_summary(store: Store, number: str, context: str, model_name: str) -> str:
+    """
+    A short summary of the PR context, stored with it until the context changes.
+
+    Falls back to the context itself when the summary can't be generated.
+    """
+    context_sha256 = hashlib.sha256(context.encode()).hexdigest()
+
+    summary = call_store(store.get_pull_request_summary, number, context_sha256)
+    if summary is not None:
+        log.debug(f"Hit PR summary cache for PR #{number}")
+        return summary
+
+    summary = summarize_pr_context(context, model_name)
+    if summary is None:
+        return context
+
+    call_store(store.put_pull_request_summary, number, context_sha256, summary)
+    return summary
+
 
 def get_pr_number_from_git_config(branch: str) -> str | None:
     """Check git config for a stored PR number."""
-    try:
-        result = run_command(
-            ["git", "config", "--get", f"branch.{branch}.pr-number"],
-            check=True,
-        )
-        if result.stdout.strip():
-            return result.stdout.strip()
-    except Exception:
-        pass
+    branch_config = get_repo_context().branch_config(branch)
+
+    if pr_number := branch_config.get("pr-number"):
+        return pr_number
 
     # Check upstream tracking ref for a PR number
-    try:
-        result = run_command(
-            ["git", "config", "--get", f"branch.{branch}.merge"],
-            check=True,
-        )
-        ref = result.stdout.strip()
-        # GitHub uses refs/pull/123/head or similar
-        match = re.search(r"refs/pull/(\d+)/head", ref)
-        if match:
-            return match.group(1)
-    except Exception:
-        pass
+    # GitHub uses refs/pull/123/head or similar
+    match = re.search(r"refs/pull/(\d+)/head", branch_config.get("merge", ""))
+    if match:
+        return match.group(1)
 
     return None
 
 
-def get_pull_request_context(branch: str) -> str | None:
-    """
-    Fetch the pull request context for the given branch.
-    Requires AIAUTOCOMMIT_INCLUDE_PR_CONTEXT environment variable to be truthy.
-    """
-    if os.environ.get("AIAUTOCOMMIT_INCLUDE_PR_CONTEXT", "false").lower() not in (
+def is_pr_context_enabled() -> bool:
+    return os.environ.get("AIAUTOCOMMIT_INCLUDE_PR_CONTEXT", "false").lower() in (
         "1",
         "true",
         "t",
-    ):
+    )
+
+
+def get_pull_request_context(
+    branch: str, enabled: bool | None = None, summary_model: str | None = None
+) -> str | None:
+    """
+    Fetch the pull request context for the given branch.
+    Unless `enabled` is passed, requires AIAUTOCOMMIT_INCLUDE_PR_CONTEXT environment variable to be truthy.
+    With a `summary_model`, a summary of the context written by that model is returned instead.
+    """
+    if enabled is None:
+        enabled = is_pr_context_enabled()
+
+    if not enabled:
         return None
 
     if not branch:
@@ -70,50 +198,83 @@ def get_pull_request_context(branch: str) -> str | None:
         log.debug(f"On default branch '{branch}', skipping PR context fetch")
         return None
 
-    git_dir = get_git_dir()
-    if not git_dir:
-        return None
+    with open_store() as store:
+        if not store:
+            return None
+
+        context, number = fetch_pull_request_context(store, branch)
 
-    cache_dir = git_dir / "aiautocommit"
-    cache_dir.mkdir(parents=True, exist_ok=True)
+        if context and number and summary_model:
+            return get_pr_summary(store, number, context, summary_model)
 
+    return context
+
+
+def read_cached_context(
+    store: Store, branch: str, pr_number: str | None
+) -> tuple[str | None, str | None] | None:
+    """The cached PR context and number, (None, None) for a cached miss and None when nothing is cached."""
+    # To prevent slow `gh` calls on branches without PRs, misses are cached too
+    if not pr_number and call_store(store.is_pull_request_missing, branch):
+        log.debug(f"Hit negative cache for branch {branch}, skipping PR fetch")
+        return None, None
+
+    if pr_number and (context := call_store(store.get_pull_request, pr_number)):
+        log.debug(f"Hit PR cache for PR #{pr_number}")
+        return context, pr_number
+
+    return None
+
+
+def fetch_pull_request_context(
+    store: Store, branch: str
+) -> tuple[str | None, str | None]:
+    """
+    The PR context and number, from the store or GitHub.
+
+    The store lives in the common git dir, so linked worktrees share it. Fetches run under one lock per
+    repository: hooks in other worktrees wait for the fetch in flight and then read its result instead of
+    calling `gh` again. A hook that can't get the lock in time fetches without it.
+    """
     pr_number = get_pr_number_from_git_config(branch)
     if pr_number:
         log.debug(f"Found PR #{pr_number} in git config for branch {branch}")
 
-    # Check for negative cache
-    # To prevent slow `gh` calls on branches without PRs
-    # We create a not_found marker
-    safe_branch = re.sub(r"[^a-zA-Z0-9_.-]", "_", branch)
-    not_found_cache = cache_dir / f"not_found_{safe_branch}_pull_request.md"
+    if (cached := read_cached_context(store, branch, pr_number)) is not None:
+        return cached
 
-    if not pr_number and not_found_cache.exists():
-        # Check if the cache is still valid
-        if time.time() - not_found_cache.stat().st_mtime < NEGATIVE_CACHE_TTL:
-            log.debug(f"Hit negative cache for branch {branch}, skipping PR fetch")
-            return None
-        else:
-            # Stale negative cache, remove it
-            not_found_cache.unlink(missing_ok=True)
+    lock_file = get_cache_dir() / "pull_request.lock"
+    timeout = get_deadline().timeout(MAX_FETCH_LOCK_WAIT)
 
-    # If we have a PR number, check the cache
-    if pr_number:
-        cache_file = cache_dir / f"{pr_number}_pull_request.md"
-        if cache_file.exists():
-            # Check if the cache is still valid
-            if time.time() - cache_file.stat().st_mtime < PR_CONTENT_CACHE_TTL:
-                log.debug(f"Hit PR cache for PR #{pr_number}")
-                return cache_file.read_text(encoding="utf-8")
-            else:
-                # Stale cache, we'll fetch a fresh copy
-                cache_file.unlink(missing_ok=True)
+    with file_lock(lock_file, timeout=timeout) as locked:
+        if not locked:
+            log.warning(
+                f"Timed out waiting for another process to fetch PR context, fetching {branch} without the lock"
+            )
+
+        # another process may have fetched it, and stored the PR number, while we waited
+        if not pr_number:
+            pr_number = (
+                RepoContext(get_repo_context().path)
+                .branch_config(branch)
+                .get("pr-number")
+            )
+
+        if (cached := read_cached_context(store, branch, pr_number)) is not None:
+            return cached
+
+        return query_pull_request_context(store, branch, pr_number)
 
+
+def query_pull_request_context(
+    store: Store, branch: str, pr_number: str | None
+) -> tuple[str | None, str | None]:
     # Fallback: Query GitHub API via gh
     if not shutil.which("gh"):
         log.error(
             "GitHub CLI (gh) is not installed or not in PATH, but AIAUTOCOMMIT_INCLUDE_PR_CONTEXT is enabled."
         )
-        return None
+        return None, None
 
     try:
         # Use branch name if we don't have a PR number
@@ -138,18 +299,15 @@ def get_pull_request_context(branch: str) -> str | None:
                     check=False,
                 )
 
-            md_content = f"<pull_request_title>PR #{number}: {title}</pull_request_title>\n<pull_request_description>\n{body}\n</pull_request_description>\n"
-
-            # Cache the PR description
-            cache_file = cache_dir / f"{number}_pull_request.md"
-            cache_file.write_text(md_content, encoding="utf-8")
+            md_content = format_pr_context(number, title, body)
+            call_store(store.put_pull_request, number, md_content, PR_CONTENT_CACHE_TTL)
 
-            return md_content
+            return md_content, number
         else:
-            # PR not found or error, create negative cache
-            not_found_cache.write_text("<!-- error: not_found -->\n", encoding="utf-8")
-            return None
+            # PR not found or error, cache the miss
+            call_store(store.put_pull_request_missing, branch, NEGATIVE_CACHE_TTL)
+            return None, None
 
     except Exception as e:
         log.debug(f"Failed to fetch PR info: {e}")
-        return None
+        return None, None
@@ -0,0 +1,213 @@
+import fnmatch
+import math
+from collections.abc import Callable
+from pathlib import Path, PurePosixPath
+
+from .diff import (
+    get_diff_size,
+    get_section_path,
+    join_diff_sections,
+    split_diff_sections,
+)
+from .utils import load_callable
+
+# scores a file section, higher is sent earlier
+Scorer = Callable[[str, list[str], dict[str, float]], float]
+
+GENERATED_PATTERNS = [
+    "*.min.js",
+    "*.min.css",
+    "*.map",
+    "*_pb2.py",
+    "*_pb2.pyi",
+    "*.pb.go",
+    "*.generated.*",
+    "*.snap",
+    "dist/*",
+    "build/*",
+    "vendor/*",
+    "node_modules/*",
+    "*/__snapshots__/*",
+    "*.lock",
+    "*lock.json",
+    "*lock.yaml",
+]
+TEST_PATTERNS = [
+    "test_*.py",
+    "*_test.py",
+    "*_test.go",
+    "*.test.*",
+    "*.spec.*",
+    "tests/*",
+    "test/*",
+    "spec/*",
+    "*/tests/*",
+    "*/test/*",
+    "*/spec/*",
+    "*/__tests__/*",
+]
+DOCS_PATTERNS = ["*.md", "*.rst", "*.txt", "docs/*", "*/docs/*"]
+CONFIG_PATTERNS = [
+    "*.toml",
+    "*.yml",
+    "*.yaml",
+    "*.json",
+    "*.ini",
+    "*.cfg",
+    ".*",
+    "*/.*",
+    "Dockerfile",
+    "Justfile",
+    "Makefile",
+]
+
+SOURCE_EXTENSIONS = {
+    ".py",
+    ".rb",
+    ".js",
+    ".jsx",
+    ".ts",
+    ".tsx",
+    ".go",
+    ".rs",
+    ".java",
+    ".kt",
+    ".swift",
+    ".c",
+    ".h",
+    ".cc",
+    ".cpp",
+    ".cs",
+    ".php",
+    ".ex",
+    ".exs",
+    ".sql",
+    ".sh",
+    ".vue",
+    ".svelte",
+}
+
+# override any of these with a `[ranking.weights]` table in config.toml
+DEFAULT_WEIGHTS: dict[str, float] = {
+    "source": 3.0,
+    "config": 1.5,
+    "test": 1.0,
+    "docs": 1.0,
+    "generated": -3.0,
+    # bonus for a recognized programming language
+    "language": 0.5,
+    # per directory level, shallow files tend to be entry points
+    "depth": -0.1,
+    # multiplied by log(1 + changed lines)
+    "churn": 0.5,
+    "new_file": 1.0,
+}
+
+
+def matches_any(path: str, patterns: list[str]) -> bool:
+    name = PurePosixPath(path).name
+    return any(
+        fnmatch.fnmatch(path, pattern) or fnmatch.fnmatch(name, pattern)
+        for pattern in patterns
+    )
+
+
+def classify_path(path: str) -> str:
+    """Classify a path as generated, test, docs, config or source."""
+    if matches_any(path, GENERATED_PATTERNS):
+        return "generated"
+    if matches_any(path, TEST_PATTERNS):
+        return "test"
+    if matches_any(path, DOCS_PATTERNS):
+        return "docs"
+    if PurePosixPath(path).suffix in SOURCE_EXTENSIONS:
+        return "source"
+    if matches_any(path, CONFIG_PATTERNS):
+        return "config"
+    return "source"
+
+
+def score_section(path: str, section: list[str], weights: dict[str, float]) -> float:
+    score = weights[classify_path(path)]
+
+    if PurePosixPath(path).suffix in SOURCE_EXTENSIONS:
+        score += weights["language"]
+
+    score += weights["depth"] * min(len(PurePosixPath(path).parts) - 1, 5)
+    score += weights["churn"] * math.log1p(get_diff_size(section))
+
+    if any(line.startswith(("new file", "--- /dev/null")) for line in section):
+        score += weights["new_file"]
+
+    return score
+
+
+# set from the `[ranking]` table of config.toml
+WEIGHTS: dict[str, float] = dict(DEFAULT_WEIGHTS)
+SCORER: Scorer = score_section
+
+
+def configure_ranking(settings: dict, config_dir: Path | None = None) -> None:
+    """
+    Apply `[ranking]` settings: `weights` overrides individual default weights and `scorer` replaces
+    `score_section` with a `package.module:function` or `file.py:function`.
+    """
+    global WEIGHTS, SCORER
+
+    WEIGHTS = {**DEFAULT_WEIGHTS, **settings.get("weights", {})}
+    SCORER = (
+        load_callable(settings["scorer"], config_dir)
+        if "scorer" in settings
+        else score_section
+    )
+
+
+def rank_git_diff(
+    diff_str: str,
+    weights: dict[str, float] | None = None,
+    scorer: Scorer | None = None,
+) -> str:
+    """
+    Order file sections so the most informative come first and survive prompt truncation.
+
+    Ties keep the smaller section first, matching `sort_git_diff`.
+    """
+    if not diff_str:
+        return diff_str
+
+    weights = weights or WEIGHTS
+    scorer = scorer or SCORER
+    sections = split_diff_sections(diff_str)
+
+    ranked_sections = sorted(
+        sections,
+        key=lambda section: (
+            -scorer(get_section_path(section), section, weights),
+            get_diff_size(section),
+        ),
+    )
+    return join_diff_sections(ranked_sections)
+
+
+def measure_source_retention(diff_str: str, cutoff: int) -> tuple[int, int]:
+    """
+    Count changed source lines that fit within the first `cutoff` characters, and the total.
+
+    Used to compare orderings: the higher the share kept, the more of the core change the model sees.
+    """
+    kept = 0
+    total = 0
+    offset = 0
+
+    for section in split_diff_sections(diff_str):
+        section_text = "\n".join(section)
+        size = get_diff_size(section)
+
+        if classify_path(get_section_path(section)) == "source":
+            total += size
+            if offset + len(section_text) <= cutoff:
+                kept += size
+
+        offset += len(section_text) + 1
+
+    return kept, total
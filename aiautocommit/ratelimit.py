@@ -0,0 +1,268 @@
+"""
+Machine-wide rate limits for model providers.
+
+Bot workflows and shared build hosts run many `aiautocommit` processes at once, and together they exceed the
+provider's quota long before any single process does. A provider configured under `[rate_limits.<provider>]`
+in config.toml gets a token bucket for requests and tokens per minute plus a cap on concurrent calls. Both
+live in lock files under the user cache directory, so every process on the machine shares them. A caller over
+the limit queues for up to `MAX_QUEUE_WAIT` seconds, or until the deadline, and then calls the provider anyway
+rather than failing.
+"""
+
+import asyncio
+import json
+import os
+import time
+from collections.abc import AsyncIterator, Iterator
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import IO
+
+from pydantic_ai.exceptions import UserError
+
+from .deadline import get_deadline
+from .log import log
+from .metrics import record_timing
+from .utils import HAS_FILE_LOCKS, file_lock, try_lock, write_file_atomic
+
+RATE_LIMIT_DIR = (
+    Path(os.environ.get("XDG_CACHE_HOME", "~/.cache")).expanduser()
+    / "aiautocommit"
+    / "rate_limits"
+)
+
+# the longest a caller queues before calling the provider regardless
+MAX_QUEUE_WAIT = 30.0
+# how often a caller waiting for a concurrency slot checks again
+SLOT_POLL_INTERVAL = 0.05
+
+RATE_LIMIT_KEYS = {"requests_per_minute", "tokens_per_minute", "max_concurrency"}
+
+
+@dataclass(frozen=True)
+class RateLimit:
+    requests_per_minute: float | None = None
+    tokens_per_minute: float | None = None
+    max_concurrency: int | None = None
+
+
+def parse_rate_limits(settings: dict[str, dict]) -> dict[str, RateLimit]:
+    limits = {}
+
+    for provider, limit in settings.items():
+        if not isinstance(limit, dict):
+            raise UserError(f"[rate_limits.{provider}] must be a table")
+
+        if unknown_keys := set(limit) - RATE_LIMIT_KEYS:
+            raise UserError(
+                f"Unknown keys in [rate_limits.{provider}]: {', '.join(sorted(unknown_keys))}"
+            )
+
+        for key, value in limit.items():
+            expected = int if key == "max_concurrency" else (int, float)
+            if isinstance(value, bool) or not isinstance(value, expected) or value <= 0:
+                kind = "integer" if key == "max_concurrency" else "number"
+                raise UserError(
+                    f"{key} in [rate_limits.{provider}] must be a positive {kind}, got {value!r}"
+                )
+
+        limits[provider] = RateLimit(**limit)
+
+    return limits
+
+
+# set from the `[rate_limits.<provider>]` tables of config.toml
+RATE_LIMITS: dict[str, RateLimit] = {}
+
+
+def configure_rate_limits(settings: dict[str, dict]) -> None:
+    global RATE_LIMITS
+
+    RATE_LIMITS = parse_rate_limits(settings)
+
+
+def get_provider_name(model_name: str) -> str:
+    """`openai` for `openai:gpt-4o`, the whole name for models without a provider prefix."""
+    return model_name.split(":", 1)[0]
+
+
+def take_from_bucket(path: Path, limit: RateLimit, tokens: int) -> float:
+    """
+    Take one request and `tokens` tokens from the bucket at `path`.
+
+    Returns 0 when they were taken, otherwise the seconds until the bucket holds enough. Buckets hold one
+    minute of capacity and refill continuously.
+    """
+    # the bucket is replaced on every write, so the lock lives in a file of its own
+    with file_lock(path.with_name(f"{path.name}.lock")):
+        try:
+            state = json.loads(path.read_text())
+        except (FileNotFoundError, json.JSONDecodeError):
+            # a missing or unreadable bucket starts full, rather than failing every call until it's deleted
+            state = {}
+
+        now = time.time()
+        elapsed = max(0.0, now - state.get("updated", now))
+
+        wait = 0.0
+        levels = {}
+        for name, per_minute, needed in (
+            ("requests", limit.requests_per_minute, 1),
+            ("tokens", limit.tokens_per_minute, tokens),
+        ):
+            if not per_minute:
+                continue
+
+            level = min(
+                per_minute, state.get(name, per_minute) + elapsed * per_minute / 60
+            )
+            # a request larger than the whole bucket only has to wait for a full one
+            needed = min(needed, per_minute)
+            levels[name] = (level, needed)
+
+            if level < needed:
+                wait = max(wait, (needed - level) * 60 / per_minute)
+
+        state = {"updated": now} | {
+            name: level if wait else level - needed
+            for name, (level, needed) in levels.items()
+        }
+
+        write_file_atomic(path, json.dumps(state))
+
+    return wait
+
+
+def try_acquire_slot(directory: Path, max_concurrency: int) -> IO[str] | None:
+    """An open, locked slot file, or None when every slot is taken. Closing the file frees the slot."""
+    directory.mkdir(parents=True, exist_ok=True)
+
+    for index in range(max_concurrency):
+        f = (directory / f"slot-{index}.lock").open("a")
+        if try_lock(f):
+            return f
+        f.close()
+
+    return None
+
+
+class RateLimiter:
+    """
+    One caller's place in a provider's queue.
+
+    `poll` tries to take a concurrency slot and then capacity from the bucket, and returns how long to sleep
+    before trying again. The slot is held until `release`, and is freed by the OS if the process dies.
+    """
+
+    def __init__(self, provider: str, limit: RateLimit, tokens: int):
+        self.provider = provider
+        self.limit = limit
+        self.tokens = tokens
+        self.slot: IO[str] | None = None
+        self.directory = RATE_LIMIT_DIR / provider
+
+    def poll(self) -> float:
+        if self.limit.max_concurrency and self.slot is None:
+            self.slot = try_acquire_slot(
+                self.directory / "slots", self.limit.max_concurrency
+            )
+            if self.slot is None:
+                return SLOT_POLL_INTERVAL
+
+        if self.limit.requests_per_minute or self.limit.tokens_per_minute:
+            return take_from_bucket(
+                self.directory / "bucket.json", self.limit, self.tokens
+            )
+
+        return 0.0
+
+    def get_queue_timeout(self) -> float:
+        return get_deadline().timeout(MAX_QUEUE_WAIT)
+
+    def give_up(self, waited: float) -> None:
+        log.warning(
+            f"Still rate limited for {self.provider} after {waited:.1f}s, calling the provider anyway"
+        )
+
+    def release(self) -> None:
+        if self.slot is not None:
+            self.slot.close()
+            self.slot = None
+
+
+def get_rate_limiter(
+    model_name: str, tokens: int, limits: dict[str, RateLimit] | None = None
+) -> RateLimiter | None:
+    if not HAS_FILE_LOCKS:
+        return None
+
+    provider = get_provider_name(model_name)
+    limit = (RATE_LIMITS if limits is None else limits).get(provider)
+    if limit is None:
+        return None
+
+    return RateLimiter(provider, limit, tokens)
+
+
+@contextmanager
+def rate_limit(
+    model_name: str, tokens: int, limits: dict[str, RateLimit] | None = None
+) -> Iterator[None]:
+    """
+    Wait for the provider's rate limits, then hold a concurrency slot for the block.
+
+    Without limits for the provider this does nothing.
+    """
+    limiter = get_rate_limiter(model_name, tokens, limits)
+    if limiter is None:
+        yield
+        return
+
+    # the time spent queueing is reported with the other stage timings and in the run metrics
+    try:
+        with get_deadline().stage("rate_limit"):
+            started = time.monotonic()
+            timeout = limiter.get_queue_timeout()
+
+            while wait := limiter.poll():
+                waited = time.monotonic() - started
+                if waited + wait > timeout:
+                    limiter.give_up(waited)
+                    break
+                time.sleep(wait)
+
+            record_timing("rate_limit_wait", time.monotonic() - started)
+
+        yield
+    finally:
+        limiter.release()
+
+
+@asynccontextmanager
+async def async_rate_limit(
+    model_name: str, tokens: int, limits: dict[str, RateLimit] | None = None
+) -> AsyncIterator[None]:
+    limiter = get_rate_limiter(model_name, tokens, limits)
+    if limiter is None:
+        yield
+        return
+
+    try:
+        with get_deadline().stage("rate_limit"):
+            started = time.monotonic()
+            timeout = limiter.get_queue_timeout()
+
+            # the bucket lock is only held for a read and a write, so polling runs on the loop
+            while wait := limiter.poll():
+                waited = time.monotonic() - started
+                if waited + wait > timeout:
+                    limiter.give_up(waited)
+                    break
+                await asyncio.sleep(wait)
+
+            record_timing("rate_limit_wait", time.monotonic() - started)
+
+        yield
+    finally:
+        limiter.release()
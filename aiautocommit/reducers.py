@@ -0,0 +1,326 @@
+"""
+Per-file-type diff reducers.
+
+A reducer turns one file's diff section into a short semantic summary. Reducers are keyed by a path glob
+(`*.ipynb`) or a git attribute (`attr:linguist-generated`, or `attr:-diff` for an unset one), and the first match
+wins. A reducer is called with
+the file path and the section lines and returns the lines to keep after the `diff --git` header, or None to
+leave the section untouched.
+"""
+
+import difflib
+import fnmatch
+import json
+import re
+from collections.abc import Callable
+from contextvars import ContextVar
+from pathlib import Path
+
+from .diff import get_section_path, join_diff_sections, split_diff_sections
+from .log import log
+from .repo import get_repo_context
+from .utils import load_callable, run_command
+
+Reducer = Callable[[str, list[str]], list[str] | None]
+
+ATTRIBUTE_PREFIX = "attr:"
+# `-diff` in .gitattributes unsets an attribute, `attr:-diff` matches that
+UNSET_ATTRIBUTE_PREFIX = "attr:-"
+
+# JSON diffs smaller than this are readable as-is
+JSON_MIN_CHANGED_LINES = 100
+MAX_JSON_PATHS = 30
+
+
+def get_changed_lines(section: list[str]) -> tuple[list[str], list[str]]:
+    added, removed = [], []
+    in_hunks = False
+
+    for line in section:
+        if line.startswith("@@"):
+            in_hunks = True
+        elif not in_hunks:
+            continue
+        elif line.startswith("+"):
+            added.append(line[1:])
+        elif line.startswith("-"):
+            removed.append(line[1:])
+
+    return added, removed
+
+
+def format_size_change(section: list[str]) -> str:
+    added, removed = get_changed_lines(section)
+    delta = sum(len(line) + 1 for line in added) - sum(
+        len(line) + 1 for line in removed
+    )
+    return f"{'+' if delta >= 0 else '-'}{abs(delta) / 1024:.1f} KB"
+
+
+def get_old_path(section: list[str]) -> str:
+    match = re.match(r"^diff --git a/(.*) b/", section[0])
+    old_path = match.group(1) if match else get_section_path(section)
+
+    for line in section:
+        if line.startswith(("rename from ", "copy from ")):
+            return line.split(" from ", 1)[1]
+
+    return old_path
+
+
+# revisions `read_blobs` compares, HEAD and the index (an empty revision) for staged changes. Evaluating
+# historical commits sets a commit and its parent instead.
+BLOB_REVISIONS: ContextVar[tuple[str, str]] = ContextVar(
+    "blob_revisions", default=("HEAD", "")
+)
+
+
+def read_blob(revision_path: str) -> str | None:
+    result = run_command(["git", "show", revision_path])
+    return result.stdout if result.returncode == 0 else None
+
+
+def is_new_or_deleted(section: list[str]) -> tuple[bool, bool]:
+    return (
+        any(line.startswith(("new file", "--- /dev/null")) for line in section),
+        any(line.startswith(("deleted file", "+++ /dev/null")) for line in section),
+    )
+
+
+def read_blobs(path: str, section: list[str]) -> tuple[str | None, str | None]:
+    """Return the old and new contents of a file, empty for the side where it doesn't exist."""
+    before_revision, after_revision = BLOB_REVISIONS.get()
+    is_new, is_deleted = is_new_or_deleted(section)
+    before = "" if is_new else read_blob(f"{before_revision}:{get_old_path(section)}")
+    after = "" if is_deleted else read_blob(f"{after_revision}:{path}")
+    return before, after
+
+
+def reduce_minified(path: str, section: list[str]) -> list[str]:
+    return [f"minified bundle regenerated ({format_size_change(section)})"]
+
+
+def reduce_svg(path: str, section: list[str]) -> list[str]:
+    return [f"SVG image updated ({format_size_change(section)})"]
+
+
+def format_line_counts(section: list[str]) -> str:
+    added, removed = get_changed_lines(section)
+    return f"+{len(added)} -{len(removed)} lines"
+
+
+def reduce_summary(path: str, section: list[str]) -> list[str]:
+    return [f"file changed ({format_line_counts(section)}, diff omitted)"]
+
+
+def reduce_generated(path: str, section: list[str]) -> list[str]:
+    return [f"generated file changed ({format_line_counts(section)}, diff omitted)"]
+
+
+def reduce_vendored(path: str, section: list[str]) -> list[str]:
+    return [f"vendored file changed ({format_line_counts(section)}, diff omitted)"]
+
+
+def reduce_no_diff(path: str, section: list[str]) -> list[str]:
+    # git shows these as binary, so there are no lines to count
+    return ["file changed (diff disabled in .gitattributes)"]
+
+
+def get_notebook_sources(content: str) -> list[str]:
+    if not content:
+        return []
+
+    lines = []
+    for i, cell in enumerate(json.loads(content).get("cells", [])):
+        source = cell.get("source", [])
+        if isinstance(source, list):
+            source = "".join(source)
+
+        lines.append(f"# [{cell.get('cell_type', 'code')} cell {i + 1}]")
+        lines.extend(source.splitlines())
+
+    return lines
+
+
+def reduce_notebook(path: str, section: list[str]) -> list[str] | None:
+    before, after = read_blobs(path, section)
+    if before is None or after is None:
+        return None
+
+    try:
+        before_sources = get_notebook_sources(before)
+        after_sources = get_notebook_sources(after)
+    except (ValueError, AttributeError):
+        return None
+
+    source_diff = list(
+        difflib.unified_diff(before_sources, after_sources, n=1, lineterm="")
+    )[2:]
+
+    if not source_diff:
+        return ["notebook outputs or metadata changed, cell sources unchanged"]
+
+    return ["notebook cell source changes (outputs omitted)", *source_diff]
+
+
+def flatten_json(value, prefix: str = "$") -> dict[str, object]:
+    if isinstance(value, dict):
+        flattened = {}
+        for key, child in value.items():
+            flattened.update(flatten_json(child, f"{prefix}.{key}"))
+        return flattened or {prefix: {}}
+
+    if isinstance(value, list):
+        flattened = {}
+        for index, child in enumerate(value):
+            flattened.update(flatten_json(child, f"{prefix}[{index}]"))
+        return flattened or {prefix: []}
+
+    return {prefix: value}
+
+
+def reduce_json(path: str, section: list[str]) -> list[str] | None:
+    added, removed = get_changed_lines(section)
+    if len(added) + len(removed) < JSON_MIN_CHANGED_LINES:
+        return None
+
+    before, after = read_blobs(path, section)
+    if before is None or after is None:
+        return None
+
+    try:
+        before_paths = flatten_json(json.loads(before)) if before else {}
+        after_paths = flatten_json(json.loads(after)) if after else {}
+    except ValueError:
+        return None
+
+    changes = [f"+ {key}" for key in after_paths.keys() - before_paths.keys()]
+    changes += [f"- {key}" for key in before_paths.keys() - after_paths.keys()]
+    changes += [
+        f"~ {key}"
+        for key in after_paths.keys() & before_paths.keys()
+        if after_paths[key] != before_paths[key]
+    ]
+    changes.sort(key=lambda change: change[2:])
+
+    summary = [f"JSON key paths changed: {len(changes)}"]
+    summary += changes[:MAX_JSON_PATHS]
+    if len(changes) > MAX_JSON_PATHS:
+        summary.append(f"... and {len(changes) - MAX_JSON_PATHS} more")
+
+    return summary
+
+
+BUILTIN_REDUCERS: dict[str, Reducer] = {
+    "notebook": reduce_notebook,
+    "minified": reduce_minified,
+    "svg": reduce_svg,
+    "json": reduce_json,
+    "summary": reduce_summary,
+    "generated": reduce_generated,
+    "vendored": reduce_vendored,
+}
+
+DEFAULT_REDUCERS: list[tuple[str, Reducer]] = [
+    # files .gitattributes marks as not worth reading, before any reducer that would summarize their content
+    ("attr:aiautocommit-ignore", reduce_summary),
+    ("attr:linguist-generated", reduce_generated),
+    ("attr:linguist-vendored", reduce_vendored),
+    ("attr:-diff", reduce_no_diff),
+    ("*.ipynb", reduce_notebook),
+    ("*.min.js", reduce_minified),
+    ("*.min.css", reduce_minified),
+    ("*.js.map", reduce_minified),
+    ("*.css.map", reduce_minified),
+    ("*.svg", reduce_svg),
+    ("*.json", reduce_json),
+]
+
+# reducers from the `[[reducers]]` table of config.toml, checked before the defaults
+USER_REDUCERS: list[tuple[str, Reducer]] = []
+
+
+def resolve_reducer(spec: str, config_dir: Path | None = None) -> Reducer:
+    """Resolve a reducer by built-in name, `package.module:function`, or `file.py:function`."""
+    if spec in BUILTIN_REDUCERS:
+        return BUILTIN_REDUCERS[spec]
+
+    return load_callable(spec, config_dir)
+
+
+def configure_reducers(entries: list[dict], config_dir: Path | None = None) -> None:
+    USER_REDUCERS[:] = [
+        (entry["pattern"], resolve_reducer(entry["reducer"], config_dir))
+        for entry in entries
+    ]
+
+
+def get_registered_reducers(
+    user_reducers: list[tuple[str, Reducer]] | None = None,
+) -> list[tuple[str, Reducer]]:
+    if user_reducers is None:
+        user_reducers = USER_REDUCERS
+
+    return [*user_reducers, *DEFAULT_REDUCERS]
+
+
+def find_reducer(
+    path: str,
+    attributes: dict[str, str],
+    reducers: list[tuple[str, Reducer]],
+) -> Reducer | None:
+    for pattern, reducer in reducers:
+        if pattern.startswith(UNSET_ATTRIBUTE_PREFIX):
+            value = attributes.get(pattern.removeprefix(UNSET_ATTRIBUTE_PREFIX))
+            if value in ("unset", "false"):
+                return reducer
+        elif pattern.startswith(ATTRIBUTE_PREFIX):
+            value = attributes.get(pattern.removeprefix(ATTRIBUTE_PREFIX))
+            if value and value not in ("unset", "unspecified", "false"):
+                return reducer
+        elif fnmatch.fnmatch(path, pattern) or fnmatch.fnmatch(
+            Path(path).name, pattern
+        ):
+            return reducer
+
+    return None
+
+
+def reduce_diff(
+    diff_str: str, user_reducers: list[tuple[str, Reducer]] | None = None
+) -> str:
+    """
+    Replace the diff of every file with a matching reducer by that reducer's summary.
+
+    `user_reducers` defaults to the reducers configured from config.toml.
+    """
+    if not diff_str:
+        return diff_str
+
+    reducers = get_registered_reducers(user_reducers)
+    sections = split_diff_sections(diff_str)
+    paths = [get_section_path(section) for section in sections]
+
+    # one `git check-attr` process for every path and attribute
+    attribute_names = sorted(
+        {
+            pattern.removeprefix(ATTRIBUTE_PREFIX).removeprefix("-")
+            for pattern, _ in reducers
+            if pattern.startswith(ATTRIBUTE_PREFIX)
+        }
+    )
+    path_attributes = get_repo_context().check_attributes(paths, attribute_names)
+
+    reduced_sections = []
+    for path, section in zip(paths, sections, strict=True):
+        reducer = find_reducer(path, path_attributes.get(path, {}), reducers)
+        summary = reducer(path, section) if reducer else None
+
+        if summary is None:
+            reduced_sections.append(section)
+            continue
+
+        log.debug(f"Reduced diff of {path} with {reducer.__name__}")
+        reduced_sections.append([section[0], *summary])
+
+    return join_diff_sections(reduced_sections)
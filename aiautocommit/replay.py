@@ -0,0 +1,217 @@
+"""
+Record and replay model interactions.
+
+`AIAUTOCOMMIT_REPLAY=record` stores every model call in a cassette directory, keyed by a fingerprint of the
+model, its settings and hashes of the prompt and diff. Each cassette holds the response, token usage and the
+measured latency. `AIAUTOCOMMIT_REPLAY=replay` answers from those cassettes without a provider, API key or
+network connection, and waits out the recorded latency so benchmarks stay representative. Set
+`AIAUTOCOMMIT_REPLAY_LATENCY=false` to answer instantly instead.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import time
+from collections.abc import Callable
+from dataclasses import asdict, dataclass
+from datetime import UTC, datetime
+from pathlib import Path
+
+from pydantic import BaseModel
+from pydantic_ai import Agent, CancellationToken, ModelSettings
+from pydantic_ai.exceptions import RunCancelled, UserError
+from pydantic_ai.usage import RunUsage
+
+from .log import log
+from .profiles import DEFAULT_PROFILE
+from .utils import write_file_atomic
+
+REPLAY_MODE = os.environ.get("AIAUTOCOMMIT_REPLAY", "").lower() or None
+REPLAY_DIR = Path(os.environ.get("AIAUTOCOMMIT_REPLAY_DIR", "cassettes"))
+REPLAY_LATENCY = os.environ.get("AIAUTOCOMMIT_REPLAY_LATENCY", "true").lower() not in (
+    "false",
+    "0",
+    "no",
+)
+
+REPLAY_MODES = ("record", "replay")
+
+# how often a replayed wait checks whether it was cancelled
+CANCELLATION_POLL_INTERVAL = 0.01
+
+
+def sha256(text: str) -> str:
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def get_fingerprint(
+    model_name: str,
+    model_settings: ModelSettings | None,
+    instructions: str | None,
+    user_prompt: str,
+) -> dict[str, str]:
+    return {
+        "model": model_name,
+        "settings": json.dumps(model_settings, sort_keys=True, default=str),
+        "prompt_sha256": sha256(instructions or ""),
+        "diff_sha256": sha256(user_prompt),
+    }
+
+
+def get_cassette_path(fingerprint: dict[str, str]) -> Path:
+    key = sha256(json.dumps(fingerprint, sort_keys=True))
+    return REPLAY_DIR / f"{key[:24]}.json"
+
+
+@dataclass(frozen=True)
+class ReplayedRun:
+    """The parts of a pydantic-ai run result that callers use."""
+
+    output: str | BaseModel | None
+    recorded_usage: dict
+
+    def usage(self) -> RunUsage:
+        return RunUsage(**self.recorded_usage)
+
+
+def write_cassette(path: Path, cassette: dict) -> None:
+    # a concurrent replay never reads half a cassette
+    write_file_atomic(path, json.dumps(cassette, indent=2))
+
+
+def load_cassette(fingerprint: dict[str, str]) -> dict:
+    path = get_cassette_path(fingerprint)
+    if not path.exists():
+        raise UserError(
+            f"No recorded model response in {REPLAY_DIR} for {fingerprint['model']} and this diff. "
+            "Record one with AIAUTOCOMMIT_REPLAY=record."
+        )
+
+    log.debug("Replaying model response", cassette=str(path))
+    return json.loads(path.read_text())
+
+
+class ReplayAgent:
+    """
+    Stands in for a pooled agent while recording or replaying.
+
+    The real agent is only built when recording, so replays need no provider or API key.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        model_settings: ModelSettings | None,
+        get_real_agent: Callable[[], Agent],
+        profile: str = DEFAULT_PROFILE,
+    ):
+        if REPLAY_MODE not in REPLAY_MODES:
+            raise UserError(
+                f"AIAUTOCOMMIT_REPLAY must be one of {', '.join(REPLAY_MODES)}, got {REPLAY_MODE!r}"
+            )
+
+        self.model_name = model_name
+        self.model_settings = model_settings
+        self.get_real_agent = get_real_agent
+        self.profile = profile
+
+    def get_fingerprint(
+        self, user_prompt: str, instructions: str | None, run_options: dict
+    ) -> dict:
+        model_settings = self.model_settings
+        if run_settings := run_options.get("model_settings"):
+            model_settings = {**(model_settings or {}), **run_settings}
+
+        fingerprint = get_fingerprint(
+            self.model_name, model_settings, instructions, user_prompt
+        )
+
+        # added only for structured runs and other profiles, so cassettes recorded before keep their paths
+        if output_type := run_options.get("output_type"):
+            fingerprint["output_type"] = output_type.__name__
+        if self.profile != DEFAULT_PROFILE:
+            fingerprint["profile"] = self.profile
+
+        return fingerprint
+
+    def record(self, fingerprint: dict, result, latency: float) -> None:
+        output = result.output
+        if isinstance(output, BaseModel):
+            output = output.model_dump()
+
+        write_cassette(
+            get_cassette_path(fingerprint),
+            {
+                **fingerprint,
+                "output": output,
+                "usage": asdict(result.usage()),
+                "latency_ms": round(latency * 1000),
+                "recorded_at": datetime.now(UTC).isoformat(),
+            },
+        )
+
+    def replay(
+        self, cassette: dict, output_type: type[BaseModel] | None
+    ) -> ReplayedRun:
+        output = cassette["output"]
+        if output_type is not None:
+            output = output_type.model_validate(output)
+
+        return ReplayedRun(output, cassette["usage"])
+
+    def run_sync(
+        self,
+        user_prompt: str,
+        *,
+        instructions: str | None = None,
+        cancellation_token: CancellationToken | None = None,
+        **kwargs,
+    ):
+        fingerprint = self.get_fingerprint(user_prompt, instructions, kwargs)
+
+        if REPLAY_MODE == "replay":
+            cassette = load_cassette(fingerprint)
+            if REPLAY_LATENCY:
+                wait_until = time.monotonic() + cassette["latency_ms"] / 1000
+                while time.monotonic() < wait_until:
+                    if cancellation_token and cancellation_token.cancelled:
+                        raise RunCancelled("replay cancelled")
+                    time.sleep(CANCELLATION_POLL_INTERVAL)
+            return self.replay(cassette, kwargs.get("output_type"))
+
+        started = time.perf_counter()
+        result = self.get_real_agent().run_sync(
+            user_prompt,
+            instructions=instructions,
+            cancellation_token=cancellation_token,
+            **kwargs,
+        )
+        self.record(fingerprint, result, time.perf_counter() - started)
+        return result
+
+    async def run(
+        self,
+        user_prompt: str,
+        *,
+        instructions: str | None = None,
+        cancellation_token: CancellationToken | None = None,
+        **kwargs,
+    ):
+        fingerprint = self.get_fingerprint(user_prompt, instructions, kwargs)
+
+        if REPLAY_MODE == "replay":
+            cassette = load_cassette(fingerprint)
+            if REPLAY_LATENCY:
+                await asyncio.sleep(cassette["latency_ms"] / 1000)
+            return self.replay(cassette, kwargs.get("output_type"))
+
+        started = time.perf_counter()
+        result = await self.get_real_agent().run(
+            user_prompt,
+            instructions=instructions,
+            cancellation_token=cancellation_token,
+            **kwargs,
+        )
+        self.record(fingerprint, result, time.perf_counter() - started)
+        return result
@@ -0,0 +1,383 @@
+"""
+Repository state shared by everything that runs during one invocation.
+
+Answering "where is the git dir", "what branch is this" or "is a revert in progress" with a git process each time
+costs 5-20 ms per question, and one commit asks many of them. `RepoContext` answers from the files under the git
+dir and memoizes the results. It falls back to git where the on-disk layout can't be read directly: reftable ref
+storage, `include` directives in the config, or `GIT_DIR`-style environment overrides.
+"""
+
+import os
+import re
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import cached_property
+from pathlib import Path
+
+from .utils import REPO_PATH, check_attributes, run_command
+
+# when set, the repository isn't found by walking up from the working directory
+GIT_LOCATION_ENV_VARS = ("GIT_DIR", "GIT_COMMON_DIR", "GIT_WORK_TREE")
+
+# refs stored per worktree rather than in the common dir
+PER_WORKTREE_REF_PREFIXES = ("refs/bisect/", "refs/worktree/", "refs/rewritten/")
+
+MAX_SYMBOLIC_REF_DEPTH = 5
+
+CACHE_DIR_NAME = "aiautocommit"
+
+
+def parse_git_config(content: str) -> dict[tuple[str, str | None], dict[str, str]]:
+    """
+    Parse the sections of a git config file, keyed by (section, subsection).
+
+    Covers what `git config` writes itself: `[section "subsection"]` headers and `key = value` lines. Keys are
+    lowercased like git does, and the last value of a repeated key wins.
+    """
+    sections: dict[tuple[str, str | None], dict[str, str]] = {}
+    current: dict[str, str] = {}
+
+    for raw_line in content.splitlines():
+        line = raw_line.strip()
+        if not line or line.startswith(("#", ";")):
+            continue
+
+        if header := re.match(
+            r'^\[\s*([\w.-]+)(?:\s+"((?:[^"\\]|\\.)*)")?\s*\]$', line
+        ):
+            section, subsection = header.groups()
+            if subsection is not None:
+                subsection = re.sub(r"\\(.)", r"\1", subsection)
+            current = sections.setdefault((section.lower(), subsection), {})
+            continue
+
+        key, _, value = line.partition("=")
+        value = value.strip()
+        if len(value) >= 2 and value[0] == value[-1] == '"':
+            value = value[1:-1]
+        current[key.strip().lower()] = value
+
+    return sections
+
+
+class RepoContext:
+    """
+    Lazily resolved, memoized state of the repository containing `path`.
+
+    Revert and merge markers are checked on every access since they are cheap file checks that can change
+    between calls; everything else is resolved once.
+    """
+
+    def __init__(self, path: str | Path | None = None):
+        self.path = Path(path or REPO_PATH.get() or Path.cwd()).resolve()
+        # git attributes by path, from the index
+        self.attributes: dict[str, dict[str, str]] = {}
+
+    def git(self, *args: str) -> str | None:
+        result = run_command(["git", *args], cwd=self.path)
+        return result.stdout.strip() if result.returncode == 0 else None
+
+    @cached_property
+    def dot_git(self) -> Path | None:
+        """The worktree's `.git` directory or file, None when git has to be asked."""
+        if any(os.environ.get(name) for name in GIT_LOCATION_ENV_VARS):
+            return None
+
+        for directory in (self.path, *self.path.parents):
+            dot_git = directory / ".git"
+
+            if dot_git.is_dir() and (dot_git / "HEAD").is_file():
+                return dot_git
+
+            # linked worktrees and submodules point at their git dir with a `gitdir: <path>` file
+            if dot_git.is_file() and dot_git.read_text().startswith("gitdir: "):
+                return dot_git
+
+        return None
+
+    @cached_property
+    def git_dir(self) -> Path | None:
+        if self.dot_git and self.dot_git.is_dir():
+            return self.dot_git
+
+        if self.dot_git:
+            content = self.dot_git.read_text().strip()
+            return (self.dot_git.parent / content.removeprefix("gitdir: ")).resolve()
+
+        git_dir = self.git("rev-parse", "--absolute-git-dir")
+        return Path(git_dir) if git_dir else None
+
+    @cached_property
+    def common_dir(self) -> Path | None:
+        """The git dir shared by all worktrees, the git dir itself outside of linked worktrees."""
+        if not self.git_dir:
+            return None
+
+        commondir_file = self.git_dir / "commondir"
+        if commondir_file.is_file():
+            return (self.git_dir / commondir_file.read_text().strip()).resolve()
+
+        return self.git_dir
+
+    @cached_property
+    def has_file_refs(self) -> bool:
+        return bool(self.common_dir) and not (self.common_dir / "reftable").is_dir()
+
+    @cached_property
+    def packed_refs(self) -> dict[str, str]:
+        packed_refs_file = self.common_dir / "packed-refs" if self.common_dir else None
+        if not packed_refs_file or not packed_refs_file.is_file():
+            return {}
+
+        refs = {}
+        for line in packed_refs_file.read_text().splitlines():
+            if line.startswith(("#", "^")):
+                continue
+            sha, _, ref = line.partition(" ")
+            refs[ref] = sha
+
+        return refs
+
+    def read_ref_file(self, ref: str) -> str | None:
+        assert self.git_dir and self.common_dir
+
+        is_per_worktree = "/" not in ref or ref.startswith(PER_WORKTREE_REF_PREFIXES)
+        ref_file = (self.git_dir if is_per_worktree else self.common_dir) / ref
+
+        return ref_file.read_text().strip() if ref_file.is_file() else None
+
+    def resolve_ref(self, ref: str) -> str | None:
+        """Commit id a ref points to, following symbolic refs. Requires file-based refs."""
+        for _ in range(MAX_SYMBOLIC_REF_DEPTH):
+            content = self.read_ref_file(ref)
+
+            if content is None:
+                return self.packed_refs.get(ref)
+
+            if not content.startswith("ref: "):
+                return content
+
+            ref = content.removeprefix("ref: ")
+
+        return None
+
+    @cached_property
+    def head_ref(self) -> str | None:
+        """Full name of the checked out branch, None when detached."""
+        if not self.git_dir:
+            return None
+
+        if not self.has_file_refs:
+            return self.git("symbolic-ref", "-q", "HEAD")
+
+        head = self.read_ref_file("HEAD") or ""
+        return head.removeprefix("ref: ") if head.startswith("ref: ") else None
+
+    @cached_property
+    def head_commit(self) -> str | None:
+        """Commit id of HEAD, None when there are no commits yet."""
+        if not self.git_dir:
+            return None
+
+        if not self.has_file_refs:
+            return self.git("rev-parse", "--verify", "-q", "HEAD")
+
+        return self.resolve_ref("HEAD")
+
+    @cached_property
+    def branch(self) -> str | None:
+        """
+        Short name of the current branch, matching `git rev-parse --abbrev-ref HEAD`.
+
+        That is "HEAD" when detached and None before the first commit.
+        """
+        if not self.head_commit:
+            return None
+
+        if not self.head_ref:
+            return "HEAD"
+
+        return self.head_ref.removeprefix("refs/heads/")
+
+    @cached_property
+    def default_branch(self) -> str | None:
+        """The repo's default branch via the remote HEAD ref."""
+        if not self.git_dir:
+            return None
+
+        if self.has_file_refs:
+            remote_head = self.read_ref_file("refs/remotes/origin/HEAD") or ""
+            ref = (
+                remote_head.removeprefix("ref: refs/remotes/")
+                if remote_head.startswith("ref: ")
+                else None
+            )
+        else:
+            ref = self.git("symbolic-ref", "--short", "refs/remotes/origin/HEAD")
+
+        if not ref:
+            return None
+
+        # e.g. "origin/main", strip the remote prefix
+        return ref.split("/", 1)[-1] if "/" in ref else ref
+
+    @cached_property
+    def local_config(self) -> dict[tuple[str, str | None], dict[str, str]] | None:
+        """Sections of the repository config, None when it can't be read without git."""
+        if not self.common_dir:
+            return None
+
+        config_file = self.common_dir / "config"
+        if not config_file.is_file():
+            return {}
+
+        config = parse_git_config(config_file.read_text())
+
+        # included files and per-worktree config can override anything
+        if ("include", None) in config or any(
+            section == "includeif" for section, _ in config
+        ):
+            return None
+        if config.get(("extensions", None), {}).get("worktreeconfig") == "true":
+            return None
+
+        return config
+
+    def branch_config(self, branch: str) -> dict[str, str]:
+        """`branch.<name>.*` settings, e.g. `merge` and `pr-number`."""
+        if self.local_config is not None:
+            return self.local_config.get(("branch", branch), {})
+
+        output = self.git("config", "--get-regexp", f"^branch\\.{re.escape(branch)}\\.")
+        prefix = f"branch.{branch}."
+        return {
+            key.removeprefix(prefix): value
+            for key, _, value in (
+                line.partition(" ") for line in (output or "").splitlines()
+            )
+        }
+
+    @cached_property
+    def toplevel(self) -> Path | None:
+        """Root of the worktree, which paths in a diff are relative to."""
+        if self.dot_git:
+            return self.dot_git.parent
+
+        toplevel = self.git("rev-parse", "--show-toplevel")
+        return Path(toplevel) if toplevel else None
+
+    @cached_property
+    def head_subject(self) -> str | None:
+        """First line of the HEAD commit message."""
+        if not self.head_commit:
+            return None
+
+        message = self.git("log", "-1", "--pretty=%B")
+        return message.splitlines()[0].strip() if message else None
+
+    def check_attributes(
+        self, paths: list[str], attributes: list[str]
+    ) -> dict[str, dict[str, str]]:
+        """
+        `utils.check_attributes`, remembered for the invocation.
+
+        The staged diff is read with and without whitespace changes, the second lookup is answered from memory.
+        """
+        missing = [
+            path
+            for path in paths
+            if not all(name in self.attributes.get(path, {}) for name in attributes)
+        ]
+
+        for path, values in check_attributes(
+            missing, attributes, self.toplevel
+        ).items():
+            self.attributes.setdefault(path, {}).update(values)
+
+        return {path: self.attributes.get(path, {}) for path in paths}
+
+    @property
+    def is_reverting(self) -> bool:
+        return bool(self.git_dir) and (self.git_dir / "REVERT_HEAD").exists()
+
+    @property
+    def is_merging(self) -> bool:
+        return bool(self.git_dir) and (self.git_dir / "MERGE_MSG").exists()
+
+
+# the context of the current invocation, see `repo_context`
+CURRENT_REPO_CONTEXT: ContextVar[RepoContext | None] = ContextVar(
+    "repo_context", default=None
+)
+
+
+def get_repo_context() -> RepoContext:
+    """
+    The invocation's context when it covers the current repository path, otherwise a fresh, unshared one.
+    """
+    context = CURRENT_REPO_CONTEXT.get()
+    path = Path(REPO_PATH.get() or Path.cwd()).resolve()
+
+    if context and context.path == path:
+        return context
+
+    return RepoContext(path)
+
+
+@contextmanager
+def repo_context(path: str | Path | None = None) -> Iterator[RepoContext]:
+    """Share one `RepoContext` between every call site for the duration of an invocation."""
+    token = CURRENT_REPO_CONTEXT.set(RepoContext(path))
+    try:
+        yield CURRENT_REPO_CONTEXT.get()
+    finally:
+        CURRENT_REPO_CONTEXT.reset(token)
+
+
+def get_git_dir() -> Path | None:
+    return get_repo_context().git_dir
+
+
+def get_cache_dir() -> Path | None:
+    """
+    Directory inside the common git dir where aiautocommit keeps its caches.
+
+    Linked worktrees share it, so an entry fetched in one worktree serves all of them. Entries are written with
+    `utils.write_file_atomic` since hooks in several worktrees can run at once.
+    """
+    common_dir = get_repo_context().common_dir
+    if not common_dir:
+        return None
+
+    return common_dir / CACHE_DIR_NAME
+
+
+def get_worktree_cache_dir() -> Path | None:
+    """Directory for state tied to one worktree's index and HEAD, like the last generated message."""
+    git_dir = get_git_dir()
+    if not git_dir:
+        return None
+
+    return git_dir / CACHE_DIR_NAME
+
+
+def get_current_branch() -> str | None:
+    """Get the name of the current git branch."""
+    return get_repo_context().branch
+
+
+def get_default_branch() -> str | None:
+    """Detect the repo's default branch via the remote HEAD ref."""
+    return get_repo_context().default_branch
+
+
+def is_default_branch(branch: str | None) -> bool:
+    if not branch:
+        return False
+
+    default = get_default_branch()
+    if default:
+        return branch == default
+
+    return branch in ("main", "master", "trunk", "develop")
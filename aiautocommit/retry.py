@@ -0,0 +1,176 @@
+"""
+Retries for transient model provider errors.
+
+Rate limits (429) and overloaded or failing servers (5xx) usually clear within a second, so a model call that
+fails with one is retried with jittered exponential backoff before falling back to a manual message. A
+`Retry-After` header, or a provider's rate limit reset headers, replaces the backoff delay. Retries stop after
+`MAX_ATTEMPTS` attempts or `MAX_RETRY_TIME` seconds, whichever comes first, and never run past the deadline.
+A server asking for a longer wait than the remaining time fails straight away.
+"""
+
+import asyncio
+import random
+import re
+from collections.abc import Callable, Generator
+from datetime import UTC, datetime
+
+import backoff
+from pydantic_ai.exceptions import ModelHTTPError
+
+from .deadline import get_deadline
+from .log import log
+from .metrics import increment, record_timing
+
+# request timeout, conflict, too early, rate limited, server errors, Anthropic's overloaded
+RETRYABLE_STATUS_CODES = {408, 409, 425, 429, 500, 502, 503, 504, 529}
+
+MAX_ATTEMPTS = 3
+MAX_RETRY_TIME = 10.0
+
+# the first retry waits up to BASE_DELAY, doubling up to MAX_DELAY
+BASE_DELAY = 0.5
+MAX_DELAY = 4.0
+
+# OpenAI style durations, e.g. `6m0s` or `250ms`
+DURATION_PATTERN = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+DURATION_UNITS = {"h": 3600, "m": 60, "s": 1, "ms": 0.001}
+
+# reset headers for exhausted rate limits, the matching `remaining` header says which one ran out
+RATE_LIMIT_RESET_HEADERS = (
+    "x-ratelimit-reset-requests",
+    "x-ratelimit-reset-tokens",
+    "anthropic-ratelimit-requests-reset",
+    "anthropic-ratelimit-tokens-reset",
+    "anthropic-ratelimit-input-tokens-reset",
+    "anthropic-ratelimit-output-tokens-reset",
+)
+
+
+def parse_duration(value: str) -> float | None:
+    parts = DURATION_PATTERN.findall(value)
+    if not parts or "".join(number + unit for number, unit in parts) != value:
+        return None
+
+    return sum(float(number) * DURATION_UNITS[unit] for number, unit in parts)
+
+
+def parse_reset(value: str) -> float | None:
+    """Seconds until a reset given as a duration or an RFC 3339 timestamp."""
+    if (seconds := parse_duration(value)) is not None:
+        return seconds
+
+    try:
+        reset_at = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+
+    if reset_at.tzinfo is None:
+        reset_at = reset_at.replace(tzinfo=UTC)
+
+    return max(0.0, (reset_at - datetime.now(UTC)).total_seconds())
+
+
+def get_retry_delay(error: ModelHTTPError) -> float | None:
+    """How long the provider asked us to wait, None when it didn't say."""
+    if error.retry_after is not None:
+        return error.retry_after
+
+    headers = error.headers or {}
+
+    if retry_after_ms := headers.get("retry-after-ms"):
+        try:
+            return float(retry_after_ms) / 1000
+        except ValueError:
+            pass
+
+    if error.status_code != 429:
+        return None
+
+    resets = [
+        parse_reset(headers[name])
+        for name in RATE_LIMIT_RESET_HEADERS
+        if name in headers
+        and headers.get(name.replace("reset", "remaining"), "0") == "0"
+    ]
+    resets = [reset for reset in resets if reset is not None]
+
+    return max(resets) if resets else None
+
+
+def is_quota_exhausted(error: ModelHTTPError) -> bool:
+    """A 429 for a spent balance or quota, which no retry fixes."""
+    return "insufficient_quota" in str(error.body)
+
+
+def should_give_up(error: ModelHTTPError) -> bool:
+    if error.status_code not in RETRYABLE_STATUS_CODES or is_quota_exhausted(error):
+        return True
+
+    delay = get_retry_delay(error)
+    if delay is None:
+        return False
+
+    remaining = get_deadline().remaining()
+    return delay > MAX_RETRY_TIME or (remaining is not None and delay >= remaining)
+
+
+def get_max_retry_time() -> float:
+    remaining = get_deadline().remaining()
+    if remaining is None:
+        return MAX_RETRY_TIME
+
+    return max(0.0, min(MAX_RETRY_TIME, remaining))
+
+
+def retry_wait() -> Generator[float, ModelHTTPError, None]:
+    """
+    backoff wait generator, sent the exception of each failed attempt.
+
+    Uses the provider's delay when it gives one, full jitter exponential backoff otherwise.
+    """
+    error = yield  # type: ignore[misc]
+    attempt = 0
+
+    while True:
+        delay = get_retry_delay(error)
+        if delay is None:
+            delay = random.uniform(0, min(MAX_DELAY, BASE_DELAY * 2**attempt))
+
+        attempt += 1
+        error = yield delay
+
+
+def record_retry(details: dict) -> None:
+    error: ModelHTTPError = details["exception"]
+    log.info(
+        f"Model returned HTTP {error.status_code}, retrying in {details['wait']:.1f}s "
+        f"(attempt {details['tries'] + 1} of {MAX_ATTEMPTS})"
+    )
+
+    get_deadline().labels["model_attempts"] = str(details["tries"] + 1)
+    increment("model_retries", status=str(error.status_code))
+    record_timing("retry_wait", details["wait"])
+
+
+def retry_transient_errors(func: Callable) -> Callable:
+    """Retry a sync or async model call on transient HTTP errors, see the module docstring."""
+
+    # a plain function for backoff to wrap, bound methods of test doubles have no `__name__`
+    if asyncio.iscoroutinefunction(func):
+
+        async def call(*args, **kwargs):
+            return await func(*args, **kwargs)
+    else:
+
+        def call(*args, **kwargs):
+            return func(*args, **kwargs)
+
+    return backoff.on_exception(
+        retry_wait,
+        ModelHTTPError,
+        max_tries=MAX_ATTEMPTS,
+        max_time=get_max_retry_time,
+        giveup=should_give_up,
+        jitter=None,
+        on_backoff=record_retry,
+    )(call)
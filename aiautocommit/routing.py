@@ -0,0 +1,181 @@
+"""
+Pick the model for a diff by its size and the kinds of files it touches.
+
+Routes come from `[[routes]]` tables in config.toml and are checked in order, the first match wins:
+
+    [[routes]]
+    name = "small"
+    max_lines = 30
+    model = "google:gemini-2.5-flash-lite"
+
+    [[routes]]
+    name = "large"
+    min_lines = 800
+    model = "google:gemini-2.5-pro"
+    thinking = "medium"
+    prompt_cutoff = 200000
+
+A diff matching no route uses `AIAUTOCOMMIT_MODEL` and `AIAUTOCOMMIT_PROMPT_CUTOFF`.
+"""
+
+from dataclasses import dataclass, field
+
+from pydantic_ai import ModelSettings
+from pydantic_ai.exceptions import UserError
+
+from .diff import get_diff_size, get_section_path, split_diff_sections
+from .ranking import classify_path
+
+DEFAULT_ROUTE_NAME = "default"
+
+# keys of a `[[routes]]` table which restrict the diffs it applies to
+MATCH_KEYS = ("min_lines", "max_lines", "min_files", "max_files", "kinds")
+
+
+@dataclass(frozen=True)
+class DiffStats:
+    lines: int
+    files: int
+    # `ranking.classify_path` kinds of the changed files
+    kinds: frozenset[str]
+
+
+@dataclass(frozen=True)
+class Route:
+    name: str
+    model_name: str
+    prompt_cutoff: int | None
+    # merged over the latency profile's settings, see `model.get_model_settings`
+    model_settings: ModelSettings | None = None
+    # the `[[routes]]` table this route came from, empty for the default
+    rule: dict = field(default_factory=dict)
+
+
+def get_diff_stats(diff_str: str) -> DiffStats:
+    # incremental updates put the previous message ahead of the diff
+    sections = [
+        section
+        for section in split_diff_sections(diff_str)
+        if section[0].startswith("diff --git")
+    ]
+    return DiffStats(
+        lines=sum(get_diff_size(section) for section in sections),
+        files=len(sections),
+        kinds=frozenset(
+            classify_path(get_section_path(section)) for section in sections
+        ),
+    )
+
+
+def matches_rule(rule: dict, stats: DiffStats) -> bool:
+    """Every given bound has to hold, and `kinds` has to cover every changed file."""
+    return (
+        stats.lines >= rule.get("min_lines", 0)
+        and stats.lines <= rule.get("max_lines", stats.lines)
+        and stats.files >= rule.get("min_files", 0)
+        and stats.files <= rule.get("max_files", stats.files)
+        and ("kinds" not in rule or stats.kinds <= set(rule["kinds"]))
+    )
+
+
+def parse_prompt_cutoff(value: int | str) -> int | None:
+    """`*` sends the whole diff, like `AIAUTOCOMMIT_PROMPT_CUTOFF=*`."""
+    return None if value == "*" else int(value)
+
+
+def build_route(
+    rule: dict, index: int, model_name: str, prompt_cutoff: int | None
+) -> Route:
+    model_settings = ModelSettings(**rule.get("settings", {}))
+    if "thinking" in rule:
+        model_settings["thinking"] = rule["thinking"]
+
+    return Route(
+        name=rule.get("name", f"route-{index}"),
+        model_name=rule.get("model", model_name),
+        prompt_cutoff=(
+            parse_prompt_cutoff(rule["prompt_cutoff"])
+            if "prompt_cutoff" in rule
+            else prompt_cutoff
+        ),
+        model_settings=model_settings or None,
+        rule=rule,
+    )
+
+
+# set from the `[[routes]]` tables of config.toml
+ROUTES: list[dict] = []
+
+
+def is_count(value) -> bool:
+    # TOML booleans are ints to Python
+    return isinstance(value, int) and not isinstance(value, bool) and value >= 0
+
+
+def validate_routes(rules: list[dict]) -> list[dict]:
+    """Reject typos and wrongly typed values up front, rather than failing on the first matching diff."""
+    for index, rule in enumerate(rules):
+        if not isinstance(rule, dict):
+            raise UserError("[[routes]] entries must be tables")
+
+        unknown_keys = set(rule) - {
+            *MATCH_KEYS,
+            "name",
+            "model",
+            "thinking",
+            "prompt_cutoff",
+            "settings",
+        }
+        if unknown_keys:
+            raise UserError(
+                f"Unknown keys in [[routes]]: {', '.join(sorted(unknown_keys))}"
+            )
+
+        name = rule.get("name", f"route-{index}")
+        for key, value in rule.items():
+            if key in ("min_lines", "max_lines", "min_files", "max_files"):
+                valid, expected = is_count(value), "a non-negative integer"
+            elif key == "kinds":
+                valid = isinstance(value, list) and all(
+                    isinstance(kind, str) for kind in value
+                )
+                expected = "a list of strings"
+            elif key == "prompt_cutoff":
+                valid, expected = is_count(value) or value == "*", 'an integer or "*"'
+            elif key == "settings":
+                valid, expected = isinstance(value, dict), "a table"
+            elif key in ("name", "model"):
+                valid, expected = isinstance(value, str), "a string"
+            else:
+                continue
+
+            if not valid:
+                raise UserError(
+                    f"{key} of route {name} must be {expected}, got {value!r}"
+                )
+
+    return rules
+
+
+def configure_routing(rules: list[dict]) -> None:
+    ROUTES[:] = validate_routes(rules)
+
+
+def select_route(
+    diff_str: str,
+    model_name: str,
+    prompt_cutoff: int | None,
+    rules: list[dict] | None = None,
+) -> Route:
+    """The first route matching the diff, or the default model and cutoff."""
+    if rules is None:
+        rules = ROUTES
+
+    if rules:
+        stats = get_diff_stats(diff_str)
+
+        for index, rule in enumerate(rules):
+            if matches_rule(rule, stats):
+                return build_route(rule, index, model_name, prompt_cutoff)
+
+    return Route(DEFAULT_ROUTE_NAME, model_name, prompt_cutoff)
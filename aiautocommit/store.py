@@ -0,0 +1,333 @@
+"""
+SQLite state store shared by every worktree and process of a repository.
+
+One WAL-mode database in the common git dir replaces loose cache files. Readers never block the writer and the
+writer never leaves a half written entry behind, so hooks running in several worktrees at once are safe. Every
+row records its size, when it expires and when it was last read:
+
+* expired rows are never returned and are deleted by `prune`
+* once the store holds more than `MAX_STORE_BYTES`, the least recently read rows are evicted
+
+`pull_requests` and `pull_request_misses` hold PR context and branches known to have no PR. `entries` is a
+namespaced key value table for other caches.
+"""
+
+import os
+import sqlite3
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+
+from .log import log
+from .repo import get_cache_dir
+
+STORE_FILE = "state.sqlite3"
+
+# bytes of cached text kept before the least recently used rows are evicted
+MAX_STORE_BYTES = int(os.environ.get("AIAUTOCOMMIT_STORE_MAX_BYTES", 5_000_000))
+
+# seconds a connection waits for another process's write to finish
+BUSY_TIMEOUT = 5.0
+
+SCHEMA_VERSION = 1
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pull_requests (
+    number TEXT PRIMARY KEY,
+    context TEXT NOT NULL,
+    summary TEXT,
+    summary_sha256 TEXT,
+    size INTEGER NOT NULL,
+    expires_at REAL,
+    accessed_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS pull_request_misses (
+    branch TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    expires_at REAL,
+    accessed_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS entries (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    expires_at REAL,
+    accessed_at REAL NOT NULL,
+    PRIMARY KEY (namespace, key)
+);
+"""
+
+# every table has `size`, `expires_at` and `accessed_at`, which is all eviction needs
+TABLES = ("pull_requests", "pull_request_misses", "entries")
+
+
+def get_expiry(ttl: float | None, now: float) -> float | None:
+    return now + ttl if ttl is not None else None
+
+
+class Store:
+    def __init__(self, connection: sqlite3.Connection):
+        self.connection = connection
+        # reads waiting to be recorded in `accessed_at`, see `touch`
+        self.touched: list[tuple[str, str, tuple]] = []
+
+        # WAL lets readers in other processes carry on while one of them writes
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+
+        if connection.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+            with connection:
+                connection.executescript(SCHEMA)
+                connection.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+
+    def touch(self, table: str, where: str, parameters: tuple) -> None:
+        """
+        Record a read for LRU eviction.
+
+        Writing on every read would make a cache hit wait for, or fail on, another process's write. Reads are
+        recorded in memory instead and written with the next eviction or when the store is closed.
+        """
+        self.touched.append((table, where, (time.time(), *parameters)))
+
+    def flush_touches(self) -> None:
+        touched, self.touched = self.touched, []
+        for table, where, parameters in touched:
+            self.connection.execute(
+                f"UPDATE {table} SET accessed_at = ? WHERE {where}", parameters
+            )
+
+    def close(self) -> None:
+        """Record pending reads if the database is free right now, and close the connection."""
+        try:
+            if self.touched:
+                self.connection.execute("PRAGMA busy_timeout = 0")
+                with self.connection:
+                    self.flush_touches()
+        except sqlite3.Error as e:
+            log.debug(f"Skipped recording cache reads: {e}")
+        finally:
+            self.connection.close()
+
+    def get_pull_request(self, number: str) -> str | None:
+        row = self.connection.execute(
+            "SELECT context FROM pull_requests WHERE number = ? "
+            "AND (expires_at IS NULL OR expires_at > ?)",
+            (number, time.time()),
+        ).fetchone()
+        if not row:
+            return None
+
+        self.touch("pull_requests", "number = ?", (number,))
+        return row[0]
+
+    def put_pull_request(
+        self, number: str, context: str, ttl: float | None = None
+    ) -> None:
+        """Insert or replace a PR's context. A changed context drops the summary written for the old one."""
+        now = time.time()
+        with self.connection:
+            self.connection.execute(
+                """
+                INSERT INTO pull_requests (number, context, size, expires_at, accessed_at)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (number) DO UPDATE SET
+                    summary = CASE WHEN context = excluded.context THEN summary END,
+                    summary_sha256 = CASE WHEN context = excluded.context THEN summary_sha256 END,
+                    size = excluded.size
+                        + CASE WHEN context = excluded.context THEN coalesce(length(summary), 0) ELSE 0 END,
+                    context = excluded.context,
+                    expires_at = excluded.expires_at,
+                    accessed_at = excluded.accessed_at
+                """,
+                (number, context, len(context), get_expiry(ttl, now), now),
+            )
+        self.evict()
+
+    def get_pull_request_summary(self, number: str, context_sha256: str) -> str | None:
+        row = self.connection.execute(
+            "SELECT summary FROM pull_requests WHERE number = ? AND summary_sha256 = ?",
+            (number, context_sha256),
+        ).fetchone()
+        return row[0] if row else None
+
+    def put_pull_request_summary(
+        self, number: str, context_sha256: str, summary: str
+    ) -> None:
+        with self.connection:
+            self.connection.execute(
+                "UPDATE pull_requests SET summary = ?, summary_sha256 = ?, "
+                "size = length(context) + length(?) WHERE number = ?",
+                (summary, context_sha256, summary, number),
+            )
+
+    def is_pull_request_missing(self, branch: str) -> bool:
+        """Whether a recent lookup found no PR for `branch`."""
+        row = self.connection.execute(
+            "SELECT 1 FROM pull_request_misses WHERE branch = ? "
+            "AND (expires_at IS NULL OR expires_at > ?)",
+            (branch, time.time()),
+        ).fetchone()
+        return row is not None
+
+    def put_pull_request_missing(self, branch: str, ttl: float | None = None) -> None:
+        now = time.time()
+        with self.connection:
+            self.connection.execute(
+                """
+                INSERT INTO pull_request_misses (branch, size, expires_at, accessed_at)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT (branch) DO UPDATE SET
+                    expires_at = excluded.expires_at,
+                    accessed_at = excluded.accessed_at
+                """,
+                (branch, len(branch), get_expiry(ttl, now), now),
+            )
+
+    def get(self, namespace: str, key: str) -> str | None:
+        row = self.connection.execute(
+            "SELECT value FROM entries WHERE namespace = ? AND key = ? "
+            "AND (expires_at IS NULL OR expires_at > ?)",
+            (namespace, key, time.time()),
+        ).fetchone()
+        if not row:
+            return None
+
+        self.touch("entries", "namespace = ? AND key = ?", (namespace, key))
+        return row[0]
+
+    def put(
+        self, namespace: str, key: str, value: str, ttl: float | None = None
+    ) -> None:
+        now = time.time()
+        with self.connection:
+            self.connection.execute(
+                """
+                INSERT INTO entries (namespace, key, value, size, expires_at, accessed_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT (namespace, key) DO UPDATE SET
+                    value = excluded.value,
+                    size = excluded.size,
+                    expires_at = excluded.expires_at,
+                    accessed_at = excluded.accessed_at
+                """,
+                (namespace, key, value, len(value), get_expiry(ttl, now), now),
+            )
+        self.evict()
+
+    def delete_expired(self) -> int:
+        deleted = 0
+        with self.connection:
+            for table in TABLES:
+                deleted += self.connection.execute(
+                    f"DELETE FROM {table} WHERE expires_at <= ?", (time.time(),)
+                ).rowcount
+
+        return deleted
+
+    def evict(self, max_bytes: int | None = None) -> int:
+        """Delete the least recently read rows, across all tables, until the rest fit in `max_bytes`."""
+        if max_bytes is None:
+            max_bytes = MAX_STORE_BYTES
+
+        union = " UNION ALL ".join(
+            f"SELECT '{table}' AS name, rowid, size, accessed_at FROM {table}"
+            for table in TABLES
+        )
+
+        with self.connection:
+            self.flush_touches()
+
+            total = self.connection.execute(
+                f"SELECT coalesce(sum(size), 0) FROM ({union})"
+            ).fetchone()[0]
+            if total <= max_bytes:
+                return 0
+
+            evicted = 0
+            for table, rowid, size, _ in self.connection.execute(
+                f"SELECT * FROM ({union}) ORDER BY accessed_at"
+            ).fetchall():
+                if total <= max_bytes:
+                    break
+
+                self.connection.execute(
+                    f"DELETE FROM {table} WHERE rowid = ?", (rowid,)
+                )
+                total -= size
+                evicted += 1
+
+        log.debug(f"Evicted {evicted} least recently used cache entries")
+        return evicted
+
+    def prune(self, max_bytes: int | None = None) -> tuple[int, int]:
+        """Delete expired rows, evict down to `max_bytes` and compact the file. Returns both counts."""
+        expired = self.delete_expired()
+        evicted = self.evict(max_bytes)
+        self.connection.execute("VACUUM")
+        return expired, evicted
+
+    def stats(self) -> dict[str, dict[str, int]]:
+        now = time.time()
+        return {
+            table: dict(
+                zip(
+                    ("rows", "bytes", "expired"),
+                    self.connection.execute(
+                        f"SELECT count(*), coalesce(sum(size), 0), "
+                        f"count(CASE WHEN expires_at <= ? THEN 1 END) FROM {table}",
+                        (now,),
+                    ).fetchone(),
+                    strict=True,
+                )
+            )
+            for table in TABLES
+        }
+
+
+def get_store_path() -> Path | None:
+    cache_dir = get_cache_dir()
+    return cache_dir / STORE_FILE if cache_dir else None
+
+
+@contextmanager
+def open_store(path: Path | None = None) -> Iterator[Store | None]:
+    """The repository's store, None outside a repository or when the database can't be opened."""
+    path = path or get_store_path()
+    if not path:
+        yield None
+        return
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    try:
+        connection = sqlite3.connect(path, timeout=BUSY_TIMEOUT)
+        store = Store(connection)
+    except sqlite3.Error as e:
+        log.warning(f"Could not open the state store at {path}: {e}")
+        yield None
+        return
+
+    try:
+        yield store
+    finally:
+        store.close()
+
+
+# PR caches written as loose files before the store existed, and the per-branch fetch locks that followed
+LEGACY_FILE_PATTERNS = (
+    "*_pull_request.md",
+    "*_pull_request_summary.md",
+    "not_found_*_pull_request.lock",
+    "pull_request_*.lock",
+)
+
+
+def remove_legacy_files(cache_dir: Path) -> int:
+    removed = 0
+    for pattern in LEGACY_FILE_PATTERNS:
+        for path in cache_dir.glob(pattern):
+            path.unlink(missing_ok=True)
+            removed += 1
+
+    return removed
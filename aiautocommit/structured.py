@@ -0,0 +1,125 @@
+"""
+Structured commit message output.
+
+Free text leaves the length of the answer to the model, and a model that rambles through a long body adds
+seconds of generation time. In structured mode the model fills in a `CommitMessage` (type, scope, subject,
+bullets, breaking flag) under a hard `max_tokens` cap. The message is rendered locally, and conventional commit
+rules are enforced here: what can be fixed mechanically (casing, trailing periods, bullet markers) is fixed,
+the rest is logged. Neither needs another model round trip.
+"""
+
+import re
+
+from pydantic import BaseModel, Field
+from pydantic_ai import ModelSettings
+
+from .log import log
+from .metrics import increment
+
+# enough for a subject and a handful of bullets, a truncated answer fails instead of running on
+DEFAULT_MAX_OUTPUT_TOKENS = 400
+
+# the commit prompt allows 50 characters after the prefix and scope
+MAX_SUBJECT_LENGTH = 50
+
+TYPE_PATTERN = re.compile(r"^[a-z]+$")
+SCOPE_UNSAFE_PATTERN = re.compile(r"[^\w./-]+")
+BULLET_MARKER_PATTERN = re.compile(r"^\s*(?:[-*•]|\d+[.)])\s+")
+
+STRUCTURED_INSTRUCTIONS = """
+
+## Structured Output
+
+Return the commit message as its parts instead of plain text: the conventional commit `type`, the optional
+`scope`, the `subject` without the prefix, the body as `bullets` (empty when the body should be omitted) and
+`breaking` for breaking changes. Do not add bullet markers, prefixes or trailing periods."""
+
+
+class CommitMessage(BaseModel):
+    type: str = Field(description="conventional commit type, e.g. feat, fix, docs")
+    scope: str | None = Field(
+        default=None, description="module the change is limited to, if any"
+    )
+    subject: str = Field(
+        description="imperative summary without the type and scope prefix"
+    )
+    bullets: list[str] = Field(
+        default_factory=list, description="body bullets, empty for no body"
+    )
+    breaking: bool = Field(default=False, description="true for a breaking change")
+
+
+def get_run_options(max_output_tokens: int) -> dict:
+    """Keyword arguments for `Agent.run` that switch a generation to structured output."""
+    return {
+        "output_type": CommitMessage,
+        "model_settings": ModelSettings(max_tokens=max_output_tokens),
+        # an answer cut off by the cap or failing validation falls back instead of asking the model again
+        "retries": {"output": 0},
+    }
+
+
+def normalize_commit_message(message: CommitMessage) -> tuple[CommitMessage, list[str]]:
+    """Fix what can be fixed mechanically, and list the rules the message still breaks."""
+    problems = []
+
+    commit_type = message.type.strip().lower()
+    if not TYPE_PATTERN.match(commit_type):
+        problems.append("type")
+
+    scope = SCOPE_UNSAFE_PATTERN.sub("-", (message.scope or "").strip().lower())
+    scope = scope.strip("-") or None
+
+    subject = " ".join(message.subject.split()).rstrip(".")
+    # keep acronyms like `API` as they are
+    if subject[:1].isupper() and not subject[1:2].isupper():
+        subject = subject[0].lower() + subject[1:]
+
+    if not subject:
+        problems.append("empty_subject")
+    elif len(subject) > MAX_SUBJECT_LENGTH:
+        problems.append("subject_length")
+
+    bullets = [
+        " ".join(BULLET_MARKER_PATTERN.sub("", bullet).split())
+        for bullet in message.bullets
+    ]
+
+    return (
+        CommitMessage(
+            type=commit_type,
+            scope=scope,
+            subject=subject,
+            bullets=[bullet for bullet in bullets if bullet],
+            breaking=message.breaking,
+        ),
+        problems,
+    )
+
+
+def render_commit_message(message: CommitMessage) -> str:
+    message, problems = normalize_commit_message(message)
+
+    for problem in problems:
+        increment("structured_violation", rule=problem)
+    if problems:
+        log.warning(f"Generated commit message breaks rules: {', '.join(problems)}")
+
+    header = message.type
+    if message.scope:
+        header += f"({message.scope})"
+    if message.breaking:
+        header += "!"
+    header += f": {message.subject}"
+
+    if not message.bullets:
+        return header
+
+    return header + "\n\n" + "\n".join(f"- {bullet}" for bullet in message.bullets)
+
+
+def get_output_text(output: CommitMessage | str | None) -> str | None:
+    if isinstance(output, CommitMessage):
+        return render_commit_message(output)
+
+    return output
@@ -0,0 +1,310 @@
+"""
+A compact style profile learned from the repository's history.
+
+The bundled few-shot examples cost thousands of prompt tokens on every commit. `aiautocommit learn-style` reads
+the last commits in `git log` instead and keeps one small record per commit: conventional commit type and scope,
+subject length and casing, body and bullet usage, trailers. The records are cached in the git dir and summarized
+into a few lines that replace the examples in the prompt. When HEAD moves, only the commits that landed since
+the last run are read. Linked worktrees sit on different HEADs, so each keeps its own copy, seeded from the main
+worktree's.
+"""
+
+import json
+import os
+import re
+import statistics
+import subprocess
+from collections import Counter
+from dataclasses import asdict, dataclass, field
+
+from .log import log
+from .repo import (
+    CACHE_DIR_NAME,
+    get_cache_dir,
+    get_repo_context,
+    get_worktree_cache_dir,
+)
+from .utils import run_command, write_file_atomic
+
+STYLE_PROFILE_FILE = "style_profile.json"
+
+DEFAULT_STYLE_COMMITS = int(os.environ.get("AIAUTOCOMMIT_STYLE_COMMITS", "200"))
+
+CONVENTIONAL_SUBJECT_PATTERN = re.compile(
+    r"^(?P<type>[a-z]+)(?:\((?P<scope>[^)]*)\))?(?P<breaking>!)?: (?P<description>.*)$"
+)
+TRAILER_PATTERN = re.compile(r"^([A-Za-z][\w-]*): \S")
+BULLET_PATTERN = re.compile(r"^\s*[-*] ")
+
+# `%x1f` separates the sha from the message, `%x1e` ends each commit
+LOG_FORMAT = "--format=%H%x1f%B%x1e"
+
+# a convention has to hold for this share of commits to be worth stating
+MAJORITY = 0.8
+MAX_LISTED = 5
+
+
+@dataclass
+class CommitStyle:
+    sha: str
+    subject_length: int
+    conventional_type: str | None = None
+    scope: str | None = None
+    breaking: bool = False
+    lowercase: bool = False
+    trailing_period: bool = False
+    has_body: bool = False
+    bullets: bool = False
+    body_width: int = 0
+    trailers: list[str] = field(default_factory=list)
+
+
+@dataclass
+class StyleProfile:
+    head: str
+    limit: int
+    # newest first
+    commits: list[CommitStyle]
+
+
+def analyze_commit(sha: str, message: str) -> CommitStyle:
+    subject, _, body = message.strip().partition("\n")
+    paragraphs = [
+        paragraph.strip() for paragraph in body.strip().split("\n\n") if paragraph
+    ]
+
+    trailers = []
+    if paragraphs and all(
+        TRAILER_PATTERN.match(line) for line in paragraphs[-1].splitlines()
+    ):
+        trailers = [
+            TRAILER_PATTERN.match(line).group(1)
+            for line in paragraphs.pop().splitlines()
+        ]
+
+    body_lines = "\n".join(paragraphs).splitlines()
+    style = CommitStyle(
+        sha=sha,
+        subject_length=len(subject),
+        has_body=bool(body_lines),
+        bullets=any(BULLET_PATTERN.match(line) for line in body_lines),
+        body_width=max((len(line) for line in body_lines), default=0),
+        trailers=sorted(set(trailers)),
+    )
+
+    description = subject
+    if match := CONVENTIONAL_SUBJECT_PATTERN.match(subject):
+        style.conventional_type = match["type"]
+        style.scope = match["scope"] or None
+        style.breaking = bool(match["breaking"])
+        description = match["description"]
+
+    style.lowercase = description[:1].islower()
+    style.trailing_period = description.endswith(".")
+
+    return style
+
+
+def read_commit_styles(limit: int, since: str | None = None) -> list[CommitStyle]:
+    """Analyze up to `limit` non-merge commits reachable from HEAD, only those after `since` when given."""
+    result = run_command(
+        [
+            "git",
+            "log",
+            "--no-merges",
+            f"--max-count={limit}",
+            LOG_FORMAT,
+            f"{since}..HEAD" if since else "HEAD",
+        ],
+        check=True,
+    )
+
+    styles = []
+    for record in result.stdout.split("\x1e"):
+        sha, _, message = record.strip().partition("\x1f")
+        if sha:
+            styles.append(analyze_commit(sha, message))
+
+    return styles
+
+
+def get_style_profile_file(shared: bool = False):
+    """
+    This worktree's profile, or with `shared` the main worktree's.
+
+    For the main worktree both are the same file.
+    """
+    cache_dir = get_cache_dir() if shared else get_worktree_cache_dir()
+    return cache_dir / STYLE_PROFILE_FILE if cache_dir else None
+
+
+def read_style_profile(profile_file) -> StyleProfile | None:
+    try:
+        data = json.loads(profile_file.read_text())
+        return StyleProfile(
+            head=data["head"],
+            limit=data["limit"],
+            commits=[CommitStyle(**commit) for commit in data["commits"]],
+        )
+    except (ValueError, KeyError, TypeError) as e:
+        log.warning(f"Ignoring unreadable style profile {profile_file}: {e}")
+        return None
+
+
+def load_style_profile() -> StyleProfile | None:
+    """This worktree's profile, falling back to the main worktree's for a new linked worktree."""
+    for profile_file in (get_style_profile_file(), get_style_profile_file(shared=True)):
+        if profile_file and profile_file.exists():
+            return read_style_profile(profile_file)
+
+    return None
+
+
+def clear_style_profiles() -> int:
+    """Delete the profile of every worktree, returning how many there were."""
+    profile_files = [get_style_profile_file(shared=True)]
+    if common_dir := get_repo_context().common_dir:
+        profile_files += common_dir.glob(
+            f"worktrees/*/{CACHE_DIR_NAME}/{STYLE_PROFILE_FILE}"
+        )
+
+    removed = 0
+    for profile_file in profile_files:
+        if profile_file and profile_file.exists():
+            profile_file.unlink()
+            removed += 1
+
+    return removed
+
+
+def save_style_profile(profile: StyleProfile) -> None:
+    """Cache the profile, outside a repository there is nowhere to keep it."""
+    if not (profile_file := get_style_profile_file()):
+        return
+
+    write_file_atomic(profile_file, json.dumps(asdict(profile)))
+
+
+def learn_style(limit: int = DEFAULT_STYLE_COMMITS) -> StyleProfile | None:
+    """Build or refresh the cached profile, reading only the commits since the last run when possible."""
+    head = get_repo_context().head_commit
+    if not head:
+        return None
+
+    profile = load_style_profile()
+    if profile and profile.limit == limit:
+        if profile.head == head:
+            return profile
+
+        try:
+            commits = read_commit_styles(limit, since=profile.head)
+        except subprocess.CalledProcessError as e:
+            # the previous head was rewritten away and garbage collected
+            log.debug(f"Rebuilding style profile: {e}")
+            commits = read_commit_styles(limit)
+        else:
+            seen = {commit.sha for commit in commits}
+            commits += [commit for commit in profile.commits if commit.sha not in seen]
+    else:
+        commits = read_commit_styles(limit)
+
+    profile = StyleProfile(head=head, limit=limit, commits=commits[:limit])
+    save_style_profile(profile)
+    return profile
+
+
+def share(count: int, total: int) -> str:
+    return f"{count / total:.0%}"
+
+
+def format_ranked(counts: Counter[str], total: int) -> str:
+    return ", ".join(
+        f"{name} ({share(count, total)})"
+        for name, count in counts.most_common(MAX_LISTED)
+    )
+
+
+def format_style_profile(profile: StyleProfile) -> str:
+    commits = profile.commits
+    total = len(commits)
+    if not total:
+        return ""
+
+    lines = []
+
+    types = Counter(c.conventional_type for c in commits if c.conventional_type)
+    if sum(types.values()) >= total / 2:
+        lines.append(f"Conventional commit types: {format_ranked(types, total)}")
+
+        scopes = Counter(c.scope for c in commits if c.scope)
+        if scopes:
+            lines.append(
+                f"Scopes appear in {share(sum(scopes.values()), total)} of subjects, most often: "
+                + ", ".join(scope for scope, _ in scopes.most_common(MAX_LISTED))
+            )
+        else:
+            lines.append("Subjects never use a scope")
+    else:
+        lines.append("Subjects do not use conventional commit prefixes")
+
+    lengths = sorted(c.subject_length for c in commits)
+    deciles = (
+        statistics.quantiles(lengths, n=10, method="inclusive")
+        if total > 1
+        else lengths * 9
+    )
+    subject = (
+        f"Subjects are {deciles[0]:.0f}-{deciles[-1]:.0f} characters "
+        f"(median {statistics.median(lengths):.0f})"
+    )
+
+    lowercase = sum(c.lowercase for c in commits)
+    if lowercase >= total * MAJORITY:
+        subject += ", start lowercase"
+    elif lowercase <= total * (1 - MAJORITY):
+        subject += ", start with a capital letter"
+
+    periods = sum(c.trailing_period for c in commits)
+    if periods <= total * (1 - MAJORITY):
+        subject += " and have no trailing period"
+    elif periods >= total * MAJORITY:
+        subject += " and end with a period"
+    lines.append(subject)
+
+    bodies = [c for c in commits if c.has_body]
+    if bodies:
+        body = f"{share(len(bodies), total)} of commits have a body"
+        if sum(c.bullets for c in bodies) >= len(bodies) / 2:
+            body += ', usually a "- " bullet list'
+        body += f", lines up to {max(c.body_width for c in bodies)} characters"
+        lines.append(body)
+    else:
+        lines.append("Commits have no body, only a subject")
+
+    if trailers := Counter(trailer for c in commits for trailer in c.trailers):
+        lines.append(f"Trailers: {format_ranked(trailers, total)}")
+
+    if breaking := sum(c.breaking for c in commits):
+        lines.append(f'Breaking changes are marked with "!" ({share(breaking, total)})')
+
+    return (
+        "## Repository Style\n\n"
+        f"Learned from the last {total} commits in this repository. Follow these conventions:\n\n"
+        + "\n".join(f"- {line}" for line in lines)
+        + "\n"
+    )
+
+
+def get_style_prompt() -> str | None:
+    """The profile for the prompt, refreshed with any new commits, None unless `learn-style` was run."""
+    profile = load_style_profile()
+    if not profile:
+        return None
+
+    if profile.head != get_repo_context().head_commit:
+        try:
+            profile = learn_style(profile.limit) or profile
+        except (subprocess.CalledProcessError, OSError) as e:
+            log.warning(f"Could not refresh style profile: {e}")
+
+    return format_style_profile(profile) or None
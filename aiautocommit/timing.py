@@ -3,6 +3,7 @@ from contextlib import ContextDecorator
 from time import perf_counter
 
 from .log import log
+from .metrics import record_timing
 
 
 class log_execution_time(ContextDecorator):
@@ -17,12 +18,14 @@ class log_execution_time(ContextDecorator):
         # Your code here...
     """
 
-    def __init__(self, msg: str):
+    def __init__(self, msg: str, metric: str | None = None):
         """
         :param msg: message to log, normally a function name
+        :param metric: timer name for the run metrics, defaults to `msg` when it is a plain name
         """
 
         self.msg = msg
+        self.metric = metric or (msg if msg.isidentifier() else None)
 
     def __enter__(self):
         self.time = perf_counter()
@@ -38,6 +41,9 @@ class log_execution_time(ContextDecorator):
             function_name=self.msg,
         )
 
+        if self.metric:
+            record_timing(self.metric, elapsed)
+
 
 def log_time(msg: str | None = None):
     """
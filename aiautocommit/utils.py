@@ -1,9 +1,31 @@
+import importlib.util
+import os
+import pkgutil
 import subprocess
+import tempfile
+import time
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
 from pathlib import Path
+from typing import IO
 
+from pydantic_ai.exceptions import UserError
+
+from .deadline import get_deadline
 from .log import log
 from .timing import log_execution_time
 
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows has no flock, concurrent writers may duplicate work there
+    fcntl = None
+
+# without flock there is nothing to coordinate processes with, so machine-wide limits are skipped
+HAS_FILE_LOCKS = fcntl is not None
+# how often a lock with a timeout is tried again
+LOCK_POLL_INTERVAL = 0.05
+
 # Git config overrides to ensure clean, parseable diff output regardless of
 # user's local git configuration.
 _GIT_SAFE_CONFIG = [
@@ -21,6 +43,10 @@ _GIT_SAFE_CONFIG = [
     "core.pager=",
 ]
 
+# repository that commands run in when no cwd is given. The async API sets this per task so concurrent
+# generations against different repositories don't depend on the process working directory.
+REPO_PATH: ContextVar[Path | None] = ContextVar("repo_path", default=None)
+
 # --no-ext-diff disables GIT_EXTERNAL_DIFF and diff.external config, which
 # would otherwise replace the output with an external tool's format.
 GIT_SAFE_DIFF_FLAGS = ["--no-ext-diff"]
@@ -36,6 +62,94 @@ def safe_git_diff_cmd() -> list[str]:
     return [*safe_git_cmd(), "diff", *GIT_SAFE_DIFF_FLAGS, "--staged"]
 
 
+def compact_git_diff_flags(context: int = 1, algorithm: str = "histogram") -> list[str]:
+    """
+    Flags for a smaller diff: rename/copy detection, no bodies for deleted files and less context.
+
+    Pair with `diff.compact_diff` to drop the remaining redundant headers.
+    """
+    return [
+        "--find-renames",
+        "--find-copies",
+        "--irreversible-delete",
+        f"--unified={context}",
+        f"--diff-algorithm={algorithm}",
+    ]
+
+
+def write_file_atomic(path: Path, content: str) -> None:
+    """Replace `path` in one step, so a concurrent reader sees the old or the new content, never half of it."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    fd, temp_path = tempfile.mkstemp(
+        dir=path.parent, prefix=f".{path.name}.", suffix=".tmp"
+    )
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(content)
+        os.replace(temp_path, path)
+    except BaseException:
+        Path(temp_path).unlink(missing_ok=True)
+        raise
+
+
+def try_lock(f: IO) -> bool:
+    """Take an exclusive lock on the open file `f` without waiting. Closing the file releases it."""
+    if not fcntl:
+        return True
+
+    try:
+        fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        return False
+    return True
+
+
+@contextmanager
+def file_lock(path: Path, timeout: float | None = None) -> Iterator[bool]:
+    """
+    Hold an exclusive lock on `path` while the block runs, shared by every process on the machine.
+
+    Without a `timeout` this waits for the lock indefinitely. With one it gives up after that many seconds and
+    runs the block without the lock, yielding False.
+    """
+    if not fcntl:
+        yield True
+        return
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("a") as f:
+        if timeout is None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        else:
+            give_up_at = time.monotonic() + timeout
+            while not try_lock(f):
+                if time.monotonic() >= give_up_at:
+                    yield False
+                    return
+                time.sleep(LOCK_POLL_INTERVAL)
+
+        try:
+            yield True
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def get_command_metric(args: list[str]) -> str:
+    """Timer name for a command, `git_diff` for `git -c core.pager=cat diff --staged`."""
+    if Path(args[0]).name != "git":
+        return "command"
+
+    arguments = iter(args[1:])
+    for argument in arguments:
+        if argument in ("-c", "-C"):
+            next(arguments, None)
+        elif not argument.startswith("-"):
+            return f"git_{argument.replace('-', '_')}"
+
+    return "git"
+
+
 def run_command(
     args: list[str],
     check: bool = False,
@@ -45,6 +159,7 @@ def run_command(
     env: dict[str, str] | None = None,
     cwd: str | Path | None = None,
     timing_label: str | None = None,
+    input: str | None = None,
 ) -> subprocess.CompletedProcess:
     """
     Run a shell command using subprocess.run with logging.
@@ -54,61 +169,107 @@ def run_command(
         check: If True, raise CalledProcessError if return code is non-zero
         capture_output: If True, capture stdout and stderr
         text: If True, decode stdout and stderr as text
-        timeout: Timeout in seconds
+        timeout: Timeout in seconds, capped by the time left before the deadline
         env: Environment variables
-        cwd: Current working directory
+        cwd: Current working directory, defaults to `REPO_PATH`
         timing_label: Optional label for the execution-time log
+        input: Text passed to the command's stdin
 
     Returns:
         CompletedProcess object
     """
-    with log_execution_time(timing_label or f"Running command: {args}"):
+    deadline = get_deadline()
+
+    with log_execution_time(
+        timing_label or f"Running command: {args}", get_command_metric(args)
+    ):
         try:
             return subprocess.run(
                 args,
                 check=check,
                 capture_output=capture_output,
                 text=text,
-                timeout=timeout,
+                timeout=deadline.timeout(timeout),
                 env=env,
-                cwd=cwd,
+                cwd=cwd or REPO_PATH.get(),
+                input=input,
             )
         except subprocess.CalledProcessError as e:
             log.debug(f"Command failed with exit code {e.returncode}")
             if e.stderr:
                 log.debug(f"Stderr: {e.stderr.strip()}")
             raise
+        except subprocess.TimeoutExpired:
+            if deadline.expired():
+                raise deadline.exceeded() from None
+            raise
+
 
+def load_callable(spec: str, config_dir: Path | None = None) -> Callable:
+    """
+    Load a user-supplied function from `package.module:function` or `file.py:function`.
+
+    Python files are resolved relative to the config directory. A spec that can't be loaded raises `UserError`.
+    """
+    file_name, _, function_name = spec.partition(":")
 
-def get_current_branch() -> str | None:
-    """Get the name of the current git branch."""
     try:
-        result = run_command(["git", "rev-parse", "--abbrev-ref", "HEAD"], check=True)
-        return result.stdout.strip()
+        if not file_name.endswith(".py"):
+            return pkgutil.resolve_name(spec)
+
+        file_path = Path(file_name)
+        if config_dir and not file_path.is_absolute():
+            file_path = config_dir / file_path
+
+        module_spec = importlib.util.spec_from_file_location(file_path.stem, file_path)
+        if not (module_spec and module_spec.loader):
+            raise ImportError(f"{file_path} is not a Python module")
+
+        module = importlib.util.module_from_spec(module_spec)
+        module_spec.loader.exec_module(module)
+        return getattr(module, function_name)
+    except (ImportError, AttributeError, OSError, ValueError) as e:
+        raise UserError(f"Cannot load {spec!r}: {e}") from e
+
+
+def get_staged_tree_id() -> str | None:
+    """
+    Return the tree id of the current index.
+
+    `git write-tree` hashes the index into a tree object, so identical staged content always yields the same id.
+    Returns None when the index cannot be written (e.g. unresolved merge conflicts).
+    """
+    try:
+        return run_command(["git", "write-tree"], check=True).stdout.strip() or None
     except Exception:
         return None
 
 
-def get_default_branch() -> str | None:
-    """Detect the repo's default branch via the remote HEAD ref."""
-    result = run_command(
-        ["git", "symbolic-ref", "--short", "refs/remotes/origin/HEAD"],
-        check=False,
-    )
-    if result.returncode != 0:
-        return None
+def check_attributes(
+    paths: list[str], attributes: list[str], toplevel: str | Path | None = None
+) -> dict[str, dict[str, str]]:
+    """
+    Look up git attributes for many paths with a single `git check-attr` process.
 
-    # Returns e.g. "origin/main" — strip the remote prefix
-    ref = result.stdout.strip()
-    return ref.split("/", 1)[-1] if "/" in ref else ref
+    Attributes are read from the index so they match what is staged. Values are git's raw info strings:
+    `set`, `unset`, `unspecified` or the assigned value. `check-attr` resolves paths against its working
+    directory while diff paths are relative to the worktree root, so it runs from `toplevel`.
+    """
+    if not paths or not attributes:
+        return {}
 
+    result = run_command(
+        ["git", "check-attr", "--stdin", "-z", "--cached", *attributes],
+        check=True,
+        input="\0".join(paths),
+        cwd=toplevel,
+    )
 
-def is_default_branch(branch: str | None) -> bool:
-    if not branch:
-        return False
+    fields = result.stdout.split("\0")
+    path_attributes: dict[str, dict[str, str]] = {}
 
-    default = get_default_branch()
-    if default:
-        return branch == default
+    for i in range(0, len(fields) - 2, 3):
+        path, attribute, value = fields[i : i + 3]
+        path_attributes.setdefault(path, {})[attribute] = value
 
-    return branch in ("main", "master", "trunk", "develop")
+    return path_attributes
@@ -0,0 +1,167 @@
+import time
+from collections.abc import Callable
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+
+from .log import log
+from .repo import get_worktree_cache_dir
+from .utils import get_staged_tree_id, write_file_atomic
+
+PRECOMPUTED_DIR_NAME = "precomputed"
+
+# only the most recent messages are useful, older trees are never committed
+MAX_PRECOMPUTED_MESSAGES = 20
+
+DEFAULT_DEBOUNCE = 2.0
+DEFAULT_MIN_INTERVAL = 10.0
+POLL_INTERVAL = 0.25
+
+
+def get_precomputed_dir() -> Path | None:
+    cache_dir = get_worktree_cache_dir()
+    if not cache_dir:
+        return None
+
+    return cache_dir / PRECOMPUTED_DIR_NAME
+
+
+def store_precomputed_message(tree_id: str, message: str) -> None:
+    precomputed_dir = get_precomputed_dir()
+    if not precomputed_dir:
+        return
+
+    write_file_atomic(precomputed_dir / f"{tree_id}.txt", message)
+
+    stale_files = sorted(
+        precomputed_dir.glob("*.txt"), key=lambda f: f.stat().st_mtime, reverse=True
+    )[MAX_PRECOMPUTED_MESSAGES:]
+    for stale_file in stale_files:
+        stale_file.unlink(missing_ok=True)
+
+
+def load_precomputed_message() -> str | None:
+    """
+    Return the message `aiautocommit watch` generated for the currently staged tree, if any.
+
+    When watch has never run the precomputed directory does not exist and `git write-tree` is skipped.
+    """
+    precomputed_dir = get_precomputed_dir()
+    if not precomputed_dir or not precomputed_dir.exists():
+        return None
+
+    tree_id = get_staged_tree_id()
+    if not tree_id:
+        return None
+
+    message_file = precomputed_dir / f"{tree_id}.txt"
+    if not message_file.exists():
+        return None
+
+    log.debug(f"Using precomputed message for tree {tree_id}")
+    return message_file.read_text(encoding="utf-8")
+
+
+def get_index_signature(index_path: Path) -> tuple[int, int] | None:
+    try:
+        stat = index_path.stat()
+    except FileNotFoundError:
+        return None
+
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+class IndexWatcher:
+    """
+    Watch `.git/index` and speculatively generate a commit message for each new staged tree.
+
+    A change to the index only triggers generation after `debounce` seconds without further changes, and two
+    generations never start less than `min_interval` seconds apart. Generations run on a single worker thread:
+    queued generations for superseded trees are cancelled before they start, and results for trees which are
+    no longer staged are discarded instead of stored.
+
+    `generate` is called with the tree id and describes that tree rather than the live index, which can change
+    again while the generation runs.
+    """
+
+    def __init__(
+        self,
+        index_path: Path,
+        generate: Callable[[str], str | None],
+        debounce: float = DEFAULT_DEBOUNCE,
+        min_interval: float = DEFAULT_MIN_INTERVAL,
+        tree_id_getter: Callable[[], str | None] = get_staged_tree_id,
+        store: Callable[[str, str], None] = store_precomputed_message,
+    ):
+        self.index_path = index_path
+        self.generate = generate
+        self.debounce = debounce
+        self.min_interval = min_interval
+        self.tree_id_getter = tree_id_getter
+        self.store = store
+
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.signature = get_index_signature(index_path)
+        self.changed_at: float | None = None
+        self.last_started_at: float | None = None
+        self.current_tree_id: str | None = None
+        self.pending: Future | None = None
+
+    def tick(self, now: float) -> None:
+        signature = get_index_signature(self.index_path)
+        if signature != self.signature:
+            self.signature = signature
+            self.changed_at = now
+            return
+
+        if self.changed_at is None or now - self.changed_at < self.debounce:
+            return
+
+        if (
+            self.last_started_at is not None
+            and now - self.last_started_at < self.min_interval
+        ):
+            return
+
+        self.changed_at = None
+
+        tree_id = self.tree_id_getter()
+        if not tree_id or tree_id == self.current_tree_id:
+            return
+
+        self.schedule(tree_id, now)
+
+    def schedule(self, tree_id: str, now: float) -> None:
+        if self.pending and self.pending.cancel():
+            log.debug(
+                f"Cancelled generation for superseded tree {self.current_tree_id}"
+            )
+
+        self.current_tree_id = tree_id
+        self.last_started_at = now
+        self.pending = self.executor.submit(self.generate_for_tree, tree_id)
+
+    def generate_for_tree(self, tree_id: str) -> None:
+        log.info(f"Generating commit message for staged tree {tree_id}")
+        message = self.generate(tree_id)
+
+        if tree_id != self.current_tree_id:
+            log.debug(f"Discarding message for superseded tree {tree_id}")
+            return
+
+        # comment-only messages are fallbacks, regenerate them at commit time instead
+        if not message or message.startswith("#"):
+            return
+
+        self.store(tree_id, message)
+        log.info(f"Stored precomputed message for tree {tree_id}")
+
+    def run(self) -> None:
+        # treat an already-staged tree as a fresh change so it's precomputed on startup
+        self.changed_at = time.monotonic()
+
+        try:
+            while True:
+                self.tick(time.monotonic())
+                time.sleep(POLL_INTERVAL)
+        finally:
+            self.executor.shutdown(wait=False, cancel_futures=True)
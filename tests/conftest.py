@@ -3,6 +3,8 @@ from unittest.mock import patch
 
 import pytest
 from click.testing import CliRunner
+
+from aiautocommit.model import reset_pools
 from tests.utils import GitTestMixin
 
 
@@ -23,9 +25,17 @@ def clean_env():
     os.environ.update(old_env)
 
 
+@pytest.fixture(autouse=True)
+def reset_model_pools():
+    """Pooled agents would otherwise leak mocks between tests."""
+    reset_pools()
+    yield
+    reset_pools()
+
+
 @pytest.fixture(autouse=True)
 def internet_connection_available():
-    with patch("aiautocommit.wait_for_internet_connection"):
+    with patch("aiautocommit.cli.wait_for_internet_connection"):
         yield
 
 
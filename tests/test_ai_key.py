@@ -1,7 +1,7 @@
 import os
 from unittest.mock import patch
 
-from aiautocommit import update_env_variables
+from aiautocommit.cli import update_env_variables
 
 
 def test_universal_ai_key_mapping():
@@ -0,0 +1,131 @@
+import asyncio
+import os
+import subprocess
+import sys
+from pathlib import Path
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from pydantic_ai.exceptions import ModelHTTPError
+
+from aiautocommit.api import AutoCommit, AutoCommitError
+from aiautocommit.completion import FALLBACK_MESSAGE
+from aiautocommit.config import AutoCommitConfig
+from aiautocommit.model import get_pool_stats
+
+from tests.utils import patch_agent
+
+
+def init_repo(path, files):
+    path.mkdir()
+    subprocess.check_call(["git", "init", "-q"], cwd=path)
+    for name, content in files.items():
+        (path / name).write_text(content)
+    subprocess.check_call(["git", "add", "."], cwd=path)
+    return path
+
+
+@pytest.fixture
+def mock_agent():
+    async def run(diff, **kwargs):
+        # yield so concurrent generations interleave
+        await asyncio.sleep(0)
+        return MagicMock(output=f"feat: {diff.splitlines()[0]}")
+
+    with patch_agent() as MockAgent:
+        MockAgent.return_value.run = AsyncMock(side_effect=run)
+        yield MockAgent
+
+
+def test_generate_concurrently_for_two_repos(tmp_path, mock_agent):
+    first = init_repo(tmp_path / "first", {"first.py": "print(1)\n"})
+    second = init_repo(tmp_path / "second", {"second.py": "print(2)\n"})
+    auto_commit = AutoCommit(AutoCommitConfig(prompt="prompt", suffix="\n\nsuffix"))
+
+    async def generate_both():
+        return await asyncio.gather(
+            auto_commit.generate(first), auto_commit.generate(second)
+        )
+
+    first_message, second_message = asyncio.run(generate_both())
+
+    assert "first.py" in first_message
+    assert "second.py" in second_message
+    assert first_message.endswith("\n\nsuffix")
+    run = mock_agent.return_value.run
+    assert run.call_args.kwargs["instructions"].startswith("prompt")
+
+    # both generations ran on the same event loop and shared one agent
+    assert mock_agent.call_count == 1
+    assert get_pool_stats()["agent"] == {"hits": 1, "misses": 1}
+
+
+def test_lock_files_skip_the_model(tmp_path, mock_agent):
+    repo = init_repo(tmp_path / "repo", {"uv.lock": "lock\n"})
+    config = AutoCommitConfig(excluded_files=("uv.lock",))
+
+    message = asyncio.run(AutoCommit(config).generate(repo))
+
+    assert message == "chore(deps): update uv.lock"
+    mock_agent.assert_not_called()
+
+
+def test_unavailable_model_falls_back_like_the_cli(tmp_path, mock_agent):
+    repo = init_repo(tmp_path / "repo", {"app.py": "print(1)\n"})
+    mock_agent.return_value.run.side_effect = ModelHTTPError(400, "openai:gpt-test")
+
+    message = asyncio.run(AutoCommit(AutoCommitConfig()).generate(repo))
+
+    assert message.startswith(FALLBACK_MESSAGE)
+
+
+def test_nothing_staged(tmp_path, mock_agent):
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    subprocess.check_call(["git", "init", "-q"], cwd=repo)
+
+    with pytest.raises(AutoCommitError):
+        asyncio.run(AutoCommit(AutoCommitConfig()).generate(repo))
+
+
+def test_config_from_config_dir(tmp_path):
+    config_dir = tmp_path / "config"
+    (config_dir / "examples").mkdir(parents=True)
+    (config_dir / "commit_prompt.txt").write_text("custom prompt\n")
+    (config_dir / "examples" / "example_1.md").write_text("feat: example\n")
+    (config_dir / "excluded_files.txt").write_text("uv.lock\n\npackage-lock.json\n")
+    (config_dir / "commit_suffix.txt").write_text("Generated-by: aiautocommit\n")
+    (config_dir / "config.toml").write_text("[ranking.weights]\ndocs = 5.0\n")
+
+    config = AutoCommitConfig.from_config_dir(config_dir, diff_order="size")
+
+    assert config.prompt.startswith("custom prompt\n\n## Examples")
+    assert "feat: example" in config.prompt
+    assert config.excluded_files == ("uv.lock", "package-lock.json")
+    assert config.suffix == "\n\n\nGenerated-by: aiautocommit"
+    assert config.ranking_weights["docs"] == 5.0
+    assert config.diff_order == "size"
+
+
+def test_default_config_uses_stock_prompt():
+    stock_prompt = (
+        Path(__file__).parent.parent / "aiautocommit" / "prompt" / "commit_prompt.txt"
+    ).read_text()
+
+    assert AutoCommit().config.prompt.startswith(stock_prompt.strip())
+
+
+def test_api_import_leaves_the_cli_unloaded():
+    # a fresh interpreter, the test session has already imported the CLI
+    script = (
+        "import os, sys\n"
+        "import aiautocommit.api\n"
+        "assert 'aiautocommit.cli' not in sys.modules\n"
+        "assert 'OPENAI_API_KEY' not in os.environ\n"
+    )
+
+    subprocess.run(
+        [sys.executable, "-c", script],
+        env={**os.environ, "AIAUTOCOMMIT_OPENAI_API_KEY": "test-key"},
+        check=True,
+    )
@@ -0,0 +1,84 @@
+import threading
+from pathlib import Path
+from unittest.mock import patch
+
+from pydantic_ai.usage import RunUsage
+
+from aiautocommit.artifacts import (
+    MAX_DEBUG_BUNDLES,
+    DebugBundle,
+    load_debug_bundle,
+)
+from aiautocommit.cli import main
+
+from tests.utils import patch_agent
+
+
+def wait_for_bundle_writes():
+    for thread in threading.enumerate():
+        if thread.name == "aiautocommit-debug-bundle":
+            thread.join()
+
+
+def commit_with_bundle(runner):
+    with (
+        patch("aiautocommit.artifacts.DEBUG_BUNDLE_ENABLED", True),
+        patch_agent() as mock_agent_class,
+    ):
+        result = mock_agent_class.return_value.run_sync.return_value
+        result.output = "feat: add app"
+        result.usage.return_value = RunUsage(input_tokens=120, output_tokens=8)
+
+        cli_result = runner.invoke(main, ["commit", "--print-message"])
+
+    wait_for_bundle_writes()
+    return cli_result
+
+
+def test_commit_writes_debug_bundle(runner, git_repo):
+    git_repo.create_file("app.py", "x = 1\n")
+    git_repo.git_add("app.py")
+
+    result = commit_with_bundle(runner)
+    assert result.exit_code == 0
+
+    [bundle_path] = Path(".git/aiautocommit/runs").glob("*.json.gz")
+    bundle = load_debug_bundle(bundle_path)
+
+    assert "+x = 1" in bundle["diff"]
+    assert "conventional commit" in bundle["prompt"]
+    assert bundle["response"] == "feat: add app"
+    assert bundle["message"].startswith("feat: add app")
+    assert bundle["usage"]["input_tokens"] == 120
+    assert bundle["route"] == "default"
+    assert "ai_generation" in bundle["timings"]["stages_ms"]
+
+
+def test_no_bundle_without_a_diff(runner, git_repo):
+    result = commit_with_bundle(runner)
+
+    assert result.exit_code == 1
+    assert not Path(".git/aiautocommit/runs").exists()
+
+
+def test_debug_prompt_loads_bundle(runner, git_repo):
+    git_repo.create_file("app.py", "x = 1\n")
+    git_repo.git_add("app.py")
+    commit_with_bundle(runner)
+    [bundle_path] = Path(".git/aiautocommit/runs").glob("*.json.gz")
+
+    result = runner.invoke(main, ["debug-prompt", str(bundle_path), "too vague"])
+
+    assert result.exit_code == 0
+    assert "too vague" in result.output
+    assert "+x = 1" in result.output
+    assert "feat: add app" in result.output
+
+
+def test_old_bundles_are_pruned(tmp_path):
+    for _ in range(MAX_DEBUG_BUNDLES + 2):
+        bundle = DebugBundle()
+        bundle.record(diff="diff")
+        bundle.write(tmp_path)
+
+    assert len(list(tmp_path.glob("*.json.gz"))) == MAX_DEBUG_BUNDLES
@@ -6,9 +6,9 @@ from unittest.mock import patch
 import pytest
 from click.testing import CliRunner
 
-from aiautocommit import check_lock_files, is_reversion, main, update_env_variables
+from aiautocommit.cli import check_lock_files, is_reversion, main, update_env_variables
 
-from tests.utils import GitTestMixin
+from tests.utils import GitTestMixin, patch_agent
 
 
 @pytest.fixture
@@ -140,7 +140,7 @@ def test_debug_prompt(runner, git_repo):
 
 
 def test_version_option(runner):
-    from aiautocommit import MODEL_NAME, get_cli_version, is_local_source_checkout
+    from aiautocommit.cli import MODEL_NAME, get_cli_version, is_local_source_checkout
 
     result = runner.invoke(main, ["--version"])
     assert result.exit_code == 0
@@ -154,7 +154,7 @@ def test_version_option(runner):
 
 
 def test_version_option_configured_model(runner):
-    with patch("aiautocommit.MODEL_NAME", "openai:gpt-4o"):
+    with patch("aiautocommit.cli.MODEL_NAME", "openai:gpt-4o"):
         result = runner.invoke(main, ["--version"])
 
     assert result.exit_code == 0
@@ -178,18 +178,18 @@ def test_configure_prompts_custom(runner, git_repo):
     config_dir.mkdir()
     (config_dir / "commit_prompt.txt").write_text("custom prompt")
 
-    from aiautocommit import configure_prompts
+    from aiautocommit.cli import configure_prompts
 
     configure_prompts(config_dir=str(config_dir))
-    from aiautocommit import COMMIT_PROMPT
+    from aiautocommit.cli import COMMIT_PROMPT
 
     assert COMMIT_PROMPT == "custom prompt"
 
 
 def test_complete_truncation():
-    from aiautocommit import PROMPT_CUTOFF, complete
+    from aiautocommit.cli import PROMPT_CUTOFF, complete
 
-    with patch("aiautocommit.Agent") as mock_agent_class:
+    with patch_agent() as mock_agent_class:
         mock_agent = mock_agent_class.return_value
         mock_agent.run_sync.return_value.output = "Commit message"
 
@@ -210,10 +210,10 @@ def test_configure_prompts_with_examples(runner, git_repo):
     (examples_dir / "example_1.md").write_text("example 1 content")
     (examples_dir / "example_2.md").write_text("example 2 content")
 
-    from aiautocommit import configure_prompts
+    from aiautocommit.cli import configure_prompts
 
     configure_prompts(config_dir=str(config_dir))
-    from aiautocommit import COMMIT_PROMPT
+    from aiautocommit.cli import COMMIT_PROMPT
 
     assert "base prompt" in COMMIT_PROMPT
     assert "example 1 content" in COMMIT_PROMPT
@@ -223,9 +223,9 @@ def test_configure_prompts_with_examples(runner, git_repo):
 def test_complete_503_graceful_fallback():
     from pydantic_ai.exceptions import ModelHTTPError
 
-    from aiautocommit import complete
+    from aiautocommit.cli import complete
 
-    with patch("aiautocommit.Agent") as mock_agent_class:
+    with patch_agent() as mock_agent_class:
         mock_agent = mock_agent_class.return_value
         # Simulate a 503 ModelHTTPError
         mock_agent.run_sync.side_effect = ModelHTTPError(
@@ -256,8 +256,8 @@ def test_complete_user_error_as_red_message(runner, git_repo):
     git_repo.cleanup_commit_editmsg()
 
     with (
-        patch("aiautocommit.wait_for_internet_connection"),
-        patch("aiautocommit.Agent") as mock_agent_class,
+        patch("aiautocommit.cli.wait_for_internet_connection"),
+        patch_agent() as mock_agent_class,
     ):
         mock_agent_class.side_effect = UserError(
             "Set the `GOOGLE_API_KEY` environment variable or pass it via "
@@ -273,18 +273,18 @@ def test_complete_user_error_as_red_message(runner, git_repo):
 def test_complete_user_error_raises_user_facing_error():
     from pydantic_ai.exceptions import UserError
 
-    from aiautocommit import UserFacingError, complete
+    from aiautocommit.cli import UserFacingError, complete
 
-    with patch("aiautocommit.Agent") as mock_agent_class:
+    with patch_agent() as mock_agent_class:
         mock_agent_class.side_effect = UserError("missing API key")
         with pytest.raises(UserFacingError, match="missing API key"):
             complete("prompt", "diff")
 
 
 def test_git_commit():
-    from aiautocommit import git_commit
+    from aiautocommit.cli import git_commit
 
-    with patch("aiautocommit.run_command") as mock_run:
+    with patch("aiautocommit.cli.run_command") as mock_run:
         mock_run.return_value.returncode = 0
         result = git_commit("test message")
         assert result == 0
@@ -292,12 +292,12 @@ def test_git_commit():
         assert "test message" in mock_run.call_args[0][0]
 
 
-def test_get_git_dir_failure():
-    from aiautocommit import get_git_dir
+def test_get_git_dir_failure(tmp_path):
+    from aiautocommit.repo import RepoContext
 
-    with patch("aiautocommit.run_command") as mock_run:
-        mock_run.side_effect = subprocess.CalledProcessError(1, "cmd")
-        assert get_git_dir() is None
+    with patch("aiautocommit.repo.run_command") as mock_run:
+        mock_run.return_value.returncode = 128
+        assert RepoContext(tmp_path).git_dir is None
 
 
 def test_whitespace_change(runner, git_repo):
@@ -314,7 +314,7 @@ def test_whitespace_change(runner, git_repo):
 
     # Mock the Agent to return a specific message if it's called (it shouldn't be if diff is empty)
     # But if it IS called (e.g. if ignore_whitespace fails), we still want to mock it.
-    with patch("aiautocommit.Agent") as mock_agent_class:
+    with patch_agent() as mock_agent_class:
         mock_agent = mock_agent_class.return_value
         mock_agent.run_sync.return_value.output = "style: format test file whitespace"
 
@@ -388,7 +388,7 @@ def test_lock_file_not_excluded(runner, git_repo):
     git_repo.cleanup_commit_editmsg()
 
     # Mock generate_commit_message to return a fixed string
-    with patch("aiautocommit.generate_commit_message", return_value="AI message"):
+    with patch("aiautocommit.cli.generate_commit_message", return_value="AI message"):
         # Run command with custom config
         result = runner.invoke(
             main, ["commit", "--print-message", "--config-dir", str(config_dir)]
@@ -5,7 +5,7 @@ from unittest.mock import MagicMock, patch
 
 import pytest
 
-from aiautocommit import (
+from aiautocommit.cli import (
     LOCK_FILE_MESSAGES,
     check_lock_files,
     configure_prompts,
@@ -18,6 +18,8 @@ from aiautocommit import (
 from aiautocommit.internet import wait_for_internet_connection
 from aiautocommit.utils import run_command
 
+from tests.utils import patch_agent
+
 
 def test_is_reversion_revert_head(git_repo):
     git_dir = Path(".git")
@@ -96,7 +98,7 @@ def test_check_lock_files_not_mise_lock(git_repo):
 
 
 def test_get_diff_exclusion_glob(git_repo):
-    from aiautocommit import configure_prompts, get_diff
+    from aiautocommit.cli import configure_prompts, get_diff
 
     # Setup a custom config with the glob pattern
     config_dir = Path("custom_config")
@@ -150,11 +152,11 @@ def test_configure_prompts_custom_dir(runner):
 
         configure_prompts(config_dir=str(custom_dir))
 
-        import aiautocommit
+        from aiautocommit import cli
 
-        assert aiautocommit.COMMIT_PROMPT == "custom prompt"
-        assert "file1" in aiautocommit.EXCLUDED_FILES
-        assert "custom suffix" in aiautocommit.COMMIT_SUFFIX
+        assert cli.COMMIT_PROMPT == "custom prompt"
+        assert "file1" in cli.EXCLUDED_FILES
+        assert "custom suffix" in cli.COMMIT_SUFFIX
 
 
 def test_configure_prompts_examples(runner):
@@ -166,12 +168,12 @@ def test_configure_prompts_examples(runner):
         (examples_dir / "example_1.md").write_text("example 1 content")
         (examples_dir / "example_2.md").write_text("example 2 content")
 
-        with patch("aiautocommit.CONFIG_PATHS", [config_dir]):
+        with patch("aiautocommit.cli.CONFIG_PATHS", [config_dir]):
             configure_prompts()
-            import aiautocommit
+            from aiautocommit import cli
 
-            assert "example 1 content" in aiautocommit.COMMIT_PROMPT
-            assert "example 2 content" in aiautocommit.COMMIT_PROMPT
+            assert "example 1 content" in cli.COMMIT_PROMPT
+            assert "example 2 content" in cli.COMMIT_PROMPT
 
 
 def test_wait_for_internet_connection_success():
@@ -214,7 +216,7 @@ def test_sort_git_diff_empty():
 
 
 def test_configure_prompts_no_config():
-    with patch("aiautocommit.CONFIG_PATHS", [Path("/non/existent/path")]):
+    with patch("aiautocommit.cli.CONFIG_PATHS", [Path("/non/existent/path")]):
         configure_prompts()
 
 
@@ -223,30 +225,30 @@ def test_get_diff_size_malformed():
 
 
 def test_generate_commit_message_empty_diff():
-    from aiautocommit import generate_commit_message
+    from aiautocommit.cli import generate_commit_message
 
     assert generate_commit_message("") == ""
 
 
 def test_generate_commit_message_empty_completion():
-    from aiautocommit import generate_commit_message
+    from aiautocommit.cli import generate_commit_message
 
-    with patch("aiautocommit.complete", return_value=""):
+    with patch("aiautocommit.cli.complete", return_value=""):
         assert generate_commit_message("some diff") == ""
 
 
 def test_generate_commit_message_quoted_empty():
-    from aiautocommit import generate_commit_message
+    from aiautocommit.cli import generate_commit_message
 
-    with patch("aiautocommit.complete", return_value='""'):
+    with patch("aiautocommit.cli.complete", return_value='""'):
         assert generate_commit_message("some diff") == ""
 
 
 def test_generate_commit_message_with_suffix():
-    from aiautocommit import generate_commit_message
+    from aiautocommit.cli import generate_commit_message
 
-    with patch("aiautocommit.complete", return_value="feat: test"):
-        with patch("aiautocommit.COMMIT_SUFFIX", " [suffix]"):
+    with patch("aiautocommit.cli.complete", return_value="feat: test"):
+        with patch("aiautocommit.cli.COMMIT_SUFFIX", " [suffix]"):
             assert generate_commit_message("some diff") == "feat: test [suffix]"
 
 
@@ -267,7 +269,7 @@ def test_dump_prompts_exists(runner):
 
 
 def test_is_reversion_no_git_dir():
-    with patch("aiautocommit.get_git_dir", return_value=None):
+    with patch("aiautocommit.cli.get_git_dir", return_value=None):
         assert is_reversion() is False
 
 
@@ -279,11 +281,8 @@ def test_is_reversion_amend_fail(git_repo):
     msg_path = Path("COMMIT_EDITMSG")
     msg_path.write_text("Different")
 
-    with patch("aiautocommit.run_command") as mock_run:
-        mock_result_dir = MagicMock()
-        mock_result_dir.stdout = ".git"
-
-        mock_run.side_effect = [mock_result_dir, Exception("git log failed")]
+    with patch("aiautocommit.repo.run_command") as mock_run:
+        mock_run.side_effect = Exception("git log failed")
         assert is_reversion(str(msg_path)) is False
 
 
@@ -291,9 +290,9 @@ def test_commit_no_internet(runner, git_repo):
     git_repo.create_file("test.py", "print('hello')")
     git_repo.git_add("test.py")
 
-    with patch("aiautocommit.get_diff", return_value="some diff"):
+    with patch("aiautocommit.cli.get_diff", return_value="some diff"):
         with patch(
-            "aiautocommit.wait_for_internet_connection",
+            "aiautocommit.cli.wait_for_internet_connection",
             side_effect=Exception("No internet"),
         ):
             result = runner.invoke(main, ["commit"])
@@ -304,14 +303,14 @@ def test_commit_empty_message(runner, git_repo):
     git_repo.create_file("test.py", "print('hello')")
     git_repo.git_add("test.py")
 
-    with patch("aiautocommit.generate_commit_message", return_value=""):
+    with patch("aiautocommit.cli.generate_commit_message", return_value=""):
         result = runner.invoke(main, ["commit", "--output-file", "out.txt"])
         assert result.exit_code == 0
 
 
 def test_dump_prompts_source_missing(runner):
     with runner.isolated_filesystem():
-        with patch("aiautocommit.Path.__truediv__") as mock_div:
+        with patch("aiautocommit.cli.Path.__truediv__") as mock_div:
             mock_path = MagicMock()
             mock_path.exists.return_value = False
             mock_div.return_value = mock_path
@@ -321,9 +320,9 @@ def test_dump_prompts_source_missing(runner):
 
 
 def test_git_commit_failure():
-    from aiautocommit import git_commit
+    from aiautocommit.cli import git_commit
 
-    with patch("aiautocommit.run_command") as mock_run:
+    with patch("aiautocommit.cli.run_command") as mock_run:
         mock_result = MagicMock()
         mock_result.returncode = 1
         mock_run.return_value = mock_result
@@ -333,8 +332,8 @@ def test_git_commit_failure():
 def test_commit_performs_git_commit(runner, git_repo):
     git_repo.create_file("test.py", "print('hello')")
     git_repo.git_add("test.py")
-    with patch("aiautocommit.generate_commit_message", return_value="feat: test"):
-        with patch("aiautocommit.git_commit", return_value=0) as mock_commit:
+    with patch("aiautocommit.cli.generate_commit_message", return_value="feat: test"):
+        with patch("aiautocommit.cli.git_commit", return_value=0) as mock_commit:
             result = runner.invoke(main, ["commit"])
             assert result.exit_code == 0
             assert mock_commit.called
@@ -352,9 +351,9 @@ def test_sort_git_diff_trailing_section():
 
 
 def test_complete_returns_none():
-    from aiautocommit import complete
+    from aiautocommit.cli import complete
 
-    with patch("aiautocommit.Agent") as MockAgent:
+    with patch_agent() as MockAgent:
         mock_agent_instance = MockAgent.return_value
         mock_result = MagicMock()
         mock_result.output = None
@@ -365,7 +364,7 @@ def test_complete_returns_none():
 def test_commit_with_output_file(runner, git_repo):
     git_repo.create_file("test.py", "print('hello')")
     git_repo.git_add("test.py")
-    with patch("aiautocommit.generate_commit_message", return_value="feat: test"):
+    with patch("aiautocommit.cli.generate_commit_message", return_value="feat: test"):
         result = runner.invoke(main, ["commit", "--output-file", "out.txt"])
         assert result.exit_code == 0
         assert Path("out.txt").read_text() == "feat: test"
@@ -376,7 +375,7 @@ def test_commit_with_existing_output_file(runner, git_repo):
     git_repo.git_add("test.py")
     out_path = Path("out.txt")
     out_path.write_text("# existing content")
-    with patch("aiautocommit.generate_commit_message", return_value="feat: test"):
+    with patch("aiautocommit.cli.generate_commit_message", return_value="feat: test"):
         result = runner.invoke(main, ["commit", "--output-file", "out.txt"])
         assert result.exit_code == 0
         assert out_path.read_text() == "feat: test\n\n# existing content"
@@ -410,7 +409,7 @@ def test_sort_git_diff_no_current_section():
 
 def test_commit_binary_file_exit_path(runner, git_repo):
     with patch(
-        "aiautocommit.get_diff",
+        "aiautocommit.cli.get_diff",
         side_effect=UnicodeDecodeError("codec", b"", 0, 1, "reason"),
     ):
         result = runner.invoke(main, ["commit"])
@@ -419,7 +418,7 @@ def test_commit_binary_file_exit_path(runner, git_repo):
 
 
 def test_commit_reversion_exit(runner):
-    with patch("aiautocommit.is_reversion", return_value=True):
+    with patch("aiautocommit.cli.is_reversion", return_value=True):
         result = runner.invoke(main, ["commit"])
         assert result.exit_code == 0
 
@@ -429,7 +428,7 @@ def test_main_default_invoke(runner):
     mock_ctx = MagicMock()
     mock_ctx.invoked_subcommand = None
     with patch("click.get_current_context", return_value=mock_ctx):
-        from aiautocommit import commit, main
+        from aiautocommit.cli import commit, main
 
         main.callback()
         mock_ctx.invoke.assert_called_with(commit)
@@ -0,0 +1,104 @@
+import time
+from unittest.mock import MagicMock, patch
+
+import pytest
+from pydantic_ai.exceptions import RunCancelled
+
+from aiautocommit.cli import main
+from aiautocommit.deadline import Deadline, DeadlineExceeded, deadline_scope
+from aiautocommit.utils import run_command
+
+from tests.utils import patch_agent
+
+
+@pytest.fixture
+def staged_change(git_repo):
+    git_repo.create_file("app.py", "x = 1\n")
+    git_repo.git_add("app.py")
+    return git_repo
+
+
+def test_stage_accounting():
+    deadline = Deadline(10_000)
+
+    with deadline.stage("diff"):
+        time.sleep(0.01)
+    with deadline.stage("diff"):
+        pass
+
+    report = deadline.report()
+    assert report["budget_ms"] == 10_000
+    assert report["stages_ms"]["diff"] >= 10
+    assert report["exhausted_by"] is None
+
+
+def test_unlimited_deadline_keeps_timeouts():
+    deadline = Deadline()
+
+    assert deadline.remaining() is None
+    assert deadline.timeout(5) == 5
+    assert deadline.timeout() is None
+
+
+def test_expired_stage_raises():
+    deadline = Deadline(1)
+    time.sleep(0.01)
+
+    with pytest.raises(DeadlineExceeded) as error:
+        with deadline.stage("diff"):
+            pass
+
+    assert error.value.stage == "diff"
+    assert deadline.report()["exhausted_by"] == "diff"
+
+
+def test_run_command_killed_at_deadline():
+    with deadline_scope(100) as deadline:
+        with pytest.raises(DeadlineExceeded):
+            with deadline.stage("diff"):
+                run_command(["sleep", "5"])
+
+    assert deadline.exhausted_by == "diff"
+    assert deadline.report()["elapsed_ms"] < 2_000
+
+
+def test_cancel_on_expiry():
+    cancel = MagicMock()
+    deadline = Deadline(20)
+
+    with deadline.cancel_on_expiry(cancel):
+        time.sleep(0.1)
+
+    cancel.assert_called_once()
+
+
+def test_commit_falls_back_when_generation_is_cancelled(runner, staged_change):
+    def run_sync(diff, cancellation_token, **kwargs):
+        # behave like a slow model call that stops once its run is cancelled
+        while not cancellation_token.cancelled:
+            time.sleep(0.01)
+        raise RunCancelled("cancelled")
+
+    with (
+        patch("aiautocommit.cli.DEADLINE_MS", 200),
+        patch_agent() as MockAgent,
+    ):
+        MockAgent.return_value.run_sync.side_effect = run_sync
+        result = runner.invoke(main, ["commit", "--print-message"])
+
+    assert result.exit_code == 0
+    assert (
+        "# aiautocommit: deadline exceeded during ai_generation. "
+        "Please enter a commit message manually." in result.output
+    )
+
+
+def test_commit_within_deadline(runner, staged_change):
+    with (
+        patch("aiautocommit.cli.DEADLINE_MS", 10_000),
+        patch("aiautocommit.cli.complete", return_value="feat: add app"),
+    ):
+        result = runner.invoke(main, ["commit", "--print-message"])
+
+    assert result.exit_code == 0
+    assert result.output.startswith("feat: add app")
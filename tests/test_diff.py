@@ -0,0 +1,158 @@
+import subprocess
+from unittest.mock import patch
+
+from aiautocommit.cli import get_diff, main
+from aiautocommit.diff import (
+    compact_diff,
+    dedupe_hunks,
+    get_section_path,
+    split_diff_sections,
+)
+
+
+def test_split_diff_sections():
+    diff = "diff --git a/a.py b/a.py\n+a\ndiff --git a/b.py b/b.py\n+b"
+    sections = split_diff_sections(diff)
+
+    assert len(sections) == 2
+    assert [get_section_path(section) for section in sections] == ["a.py", "b.py"]
+
+
+def test_compact_diff_headers():
+    diff = (
+        "diff --git a/new.py b/new.py\n"
+        "new file mode 100644\n"
+        "index 0000000..587be6b\n"
+        "--- /dev/null\n"
+        "+++ b/new.py\n"
+        "@@ -0,0 +1 @@\n"
+        "+x\n"
+        "diff --git a/old.py b/old.py\n"
+        "deleted file mode 100644\n"
+        "index 6178079..0000000\n"
+        "diff --git a/run.sh b/run.sh\n"
+        "old mode 100644\n"
+        "new mode 100755"
+    )
+
+    assert compact_diff(diff) == (
+        "diff --git a/new.py b/new.py\n"
+        "new file\n"
+        "@@ -0,0 +1 @@\n"
+        "+x\n"
+        "diff --git a/old.py b/old.py\n"
+        "deleted file\n"
+        "diff --git a/run.sh b/run.sh\n"
+        "mode 100644 => 100755"
+    )
+
+
+def test_get_diff_compact_mode(git_repo):
+    git_repo.create_file("deleted.py", "\n".join(f"line {i}" for i in range(50)))
+    git_repo.create_file("renamed.py", "\n".join(f"value {i}" for i in range(50)))
+    git_repo.git_add(".")
+    git_repo.git_commit("initial")
+
+    subprocess.check_call(["git", "rm", "-q", "deleted.py"])
+    subprocess.check_call(["git", "mv", "renamed.py", "moved.py"])
+
+    with patch("aiautocommit.cli.DIFF_MODE", "compact"):
+        diff = get_diff()
+
+    assert "line 0" not in diff
+    assert "deleted file" in diff
+    assert "rename from renamed.py" in diff
+    assert "value 0" not in diff
+    assert "\nindex " not in diff
+
+
+def test_diff_stats(runner, git_repo):
+    git_repo.create_file("a.py", "\n".join(f"line {i}" for i in range(50)))
+    git_repo.git_add("a.py")
+    git_repo.git_commit("initial")
+
+    subprocess.check_call(["git", "rm", "-q", "a.py"])
+    git_repo.git_commit("delete a.py")
+
+    result = runner.invoke(main, ["diff-stats", "HEAD~1..HEAD"])
+
+    assert result.exit_code == 0
+    assert "commits:        1" in result.output
+    assert "total savings:" in result.output
+
+
+def make_section(path, *hunks):
+    lines = [f"diff --git a/{path} b/{path}"]
+    for start, body in hunks:
+        lines += [f"@@ -{start},2 +{start},2 @@", " context", *body]
+    return "\n".join(lines)
+
+
+RENAME_IMPORT = ["-from old import thing", "+from new import thing"]
+
+
+def test_dedupe_hunks_collapses_repeated_hunks():
+    diff = "\n".join(
+        [
+            make_section("a.py", (1, RENAME_IMPORT)),
+            make_section("b.py", (7, RENAME_IMPORT), (20, ["+b = 1"])),
+            make_section("c.py", (3, [*RENAME_IMPORT[:1], RENAME_IMPORT[1] + "  "])),
+        ]
+    )
+
+    assert dedupe_hunks(diff) == "\n".join(
+        [
+            "diff --git a/a.py b/a.py",
+            "identical change applied in 3 files (a.py, b.py, c.py)",
+            make_section("a.py", (1, RENAME_IMPORT)).split("\n", 1)[1],
+            "diff --git a/b.py b/b.py",
+            "identical change as a.py",
+            make_section("b.py", (20, ["+b = 1"])).split("\n", 1)[1],
+            "diff --git a/c.py b/c.py",
+            "identical change as a.py",
+        ]
+    )
+
+
+def test_dedupe_hunks_keeps_renames_of_duplicated_files():
+    renamed = make_section("b.py", (1, RENAME_IMPORT)).replace(
+        "diff --git a/b.py b/b.py",
+        "diff --git a/old.py b/b.py\nsimilarity index 90%\nrename from old.py\nrename to b.py",
+    )
+    diff = make_section("a.py", (1, RENAME_IMPORT)) + "\n" + renamed
+
+    deduped = dedupe_hunks(diff)
+
+    assert deduped.endswith(
+        "diff --git a/old.py b/b.py\n"
+        "similarity index 90%\n"
+        "rename from old.py\n"
+        "rename to b.py\n"
+        "identical change as a.py"
+    )
+
+
+def test_dedupe_hunks_leaves_unique_diffs_alone():
+    diff = make_section("a.py", (1, ["+a"])) + "\n" + make_section("b.py", (1, ["+b"]))
+
+    assert dedupe_hunks(diff) == diff
+
+
+def test_dedupe_hunks_codemod():
+    diff = "\n".join(
+        make_section(f"src/module_{i}.py", (1, RENAME_IMPORT)) for i in range(10_000)
+    )
+
+    deduped = dedupe_hunks(diff)
+
+    assert deduped.count("diff --git") == 10_000
+    assert deduped.count("@@") == 2
+    assert (
+        "identical change applied in 10000 files (src/module_0.py, src/module_1.py, "
+        "src/module_2.py, src/module_3.py, src/module_4.py, …)"
+    ) in deduped
+    assert deduped.endswith(
+        "diff --git a/src/module_9999.py b/src/module_9999.py\n"
+        "identical change as src/module_0.py"
+    )
+    assert len(deduped) < len(diff) * 0.75
@@ -0,0 +1,71 @@
+import json
+from pathlib import Path
+from unittest.mock import AsyncMock, MagicMock
+
+from pydantic_ai.usage import RunUsage
+
+from aiautocommit.cli import main
+from aiautocommit.evaluation import percentile
+
+from tests.utils import patch_agent
+
+
+def test_percentile():
+    values = [float(value) for value in range(1, 101)]
+
+    assert percentile(values, 0.5) == 50
+    assert percentile(values, 0.9) == 90
+    assert percentile(values, 0.99) == 99
+    assert percentile([7.0], 0.99) == 7
+
+
+def test_eval_replays_commits_for_each_variant(runner, git_repo):
+    for name, message in [("a.py", "feat: add a"), ("b.py", "fix: repair b")]:
+        git_repo.create_file(name, "x = 1\n")
+        git_repo.git_add(name)
+        git_repo.git_commit(message)
+
+    variant_dir = Path("terse")
+    variant_dir.mkdir()
+    (variant_dir / "commit_prompt.txt").write_text("terse prompt")
+
+    async def run(diff, instructions):
+        result = MagicMock()
+        result.output = "feat: add a" if "terse" in instructions else "chore: update"
+        result.usage.return_value = RunUsage(input_tokens=100, output_tokens=10)
+        return result
+
+    with patch_agent() as mock_agent_class:
+        mock_agent_class.return_value.run = AsyncMock(side_effect=run)
+        result = runner.invoke(
+            main,
+            [
+                "eval",
+                "--range",
+                "HEAD",
+                "--prompt-variant",
+                str(variant_dir),
+                "--model",
+                "openai:gpt-test",
+                "--output",
+                "results.jsonl",
+            ],
+        )
+
+    assert result.exit_code == 0, result.output
+    header, *rows = result.output.strip().splitlines()
+    assert header.split()[:4] == ["variant", "model", "runs", "errors"]
+    assert [row.split()[:4] for row in rows] == [
+        ["current", "openai:gpt-test", "2", "0"],
+        ["terse", "openai:gpt-test", "2", "0"],
+    ]
+    # input and output tokens are summed per row
+    assert rows[0].split()[7:9] == ["200", "20"]
+
+    results = [
+        json.loads(line) for line in Path("results.jsonl").read_text().splitlines()
+    ]
+    assert len(results) == 4
+    terse = [r for r in results if r["variant"] == "terse"]
+    assert {r["original"] for r in terse} == {"feat: add a", "fix: repair b"}
+    assert all(r["message"] == "feat: add a" for r in terse)
@@ -1,29 +1,29 @@
-from unittest.mock import MagicMock, patch
+from unittest.mock import MagicMock
 
 from pydantic_ai.models.google import GoogleModel
 
-from aiautocommit import complete
+from aiautocommit.cli import complete
 
+from tests.utils import patch_agent
 
-@patch("aiautocommit.Agent")
-def test_complete_gemini_thinking_config(MockAgent):
-    mock_agent_instance = MockAgent.return_value
-    mock_agent_instance.model = MagicMock(spec=GoogleModel)
-    mock_agent_instance.run_sync.return_value = MagicMock(output="test message")
 
-    complete("test prompt", "test diff")
+def test_complete_gemini_thinking_config():
+    with patch_agent(model=MagicMock(spec=GoogleModel)) as MockAgent:
+        mock_agent_instance = MockAgent.return_value
+        mock_agent_instance.run_sync.return_value = MagicMock(output="test message")
 
-    args, kwargs = mock_agent_instance.run_sync.call_args
+        complete("test prompt", "test diff")
+
+    args, kwargs = MockAgent.call_args
     assert kwargs["model_settings"]["thinking"] == "low"
 
 
-@patch("aiautocommit.Agent")
-def test_complete_non_gemini_no_config(MockAgent):
-    mock_agent_instance = MockAgent.return_value
-    mock_agent_instance.model = MagicMock()
-    mock_agent_instance.run_sync.return_value = MagicMock(output="test message")
+def test_complete_non_gemini_no_config():
+    with patch_agent() as MockAgent:
+        mock_agent_instance = MockAgent.return_value
+        mock_agent_instance.run_sync.return_value = MagicMock(output="test message")
 
-    complete("test prompt", "test diff")
+        complete("test prompt", "test diff")
 
-    args, kwargs = mock_agent_instance.run_sync.call_args
+    args, kwargs = MockAgent.call_args
     assert kwargs.get("model_settings") is None
@@ -0,0 +1,125 @@
+import subprocess
+from unittest.mock import patch
+
+import pytest
+
+from aiautocommit.cli import generate_or_update_commit_message, get_diff
+from aiautocommit.incremental import (
+    build_update_input,
+    get_diff_paths,
+    load_last_generation,
+)
+
+
+@pytest.fixture(autouse=True)
+def no_commit_suffix():
+    with patch("aiautocommit.cli.COMMIT_SUFFIX", ""):
+        yield
+
+
+def stage_initial_commit(git_repo):
+    git_repo.create_file("README.md", "readme\n")
+    git_repo.git_add("README.md")
+    git_repo.git_commit("initial")
+
+
+def test_get_diff_paths():
+    diff = (
+        "diff --git a/src/a.py b/src/a.py\n@@ -1 +1 @@\n-a\n+b\n"
+        "diff --git a/b.py b/b.py\n@@ -1 +1 @@\n-a\n+b\n"
+    )
+    assert get_diff_paths(diff) == ["src/a.py", "b.py"]
+
+
+def test_records_generation(git_repo):
+    stage_initial_commit(git_repo)
+    git_repo.create_file("main.py", "print('hello')\n")
+    git_repo.git_add("main.py")
+
+    with (
+        patch("aiautocommit.cli.complete", return_value="feat: add main"),
+        patch("aiautocommit.cli.COMMIT_SUFFIX", "\n\n\nGenerated-by: aiautocommit"),
+    ):
+        message = generate_or_update_commit_message(get_diff())
+
+    assert message.endswith("Generated-by: aiautocommit")
+
+    # the suffix is stripped so updates don't end up with two trailers
+    last_generation = load_last_generation()
+    assert last_generation.message == "feat: add main"
+    assert last_generation.paths == ["main.py"]
+
+
+def test_small_superset_sends_only_delta(git_repo):
+    stage_initial_commit(git_repo)
+    git_repo.create_file("main.py", "print('hello')\n" * 50)
+    git_repo.git_add("main.py")
+
+    with patch("aiautocommit.cli.complete", return_value="feat: add main"):
+        generate_or_update_commit_message(get_diff())
+
+    git_repo.create_file("helper.py", "x = 1\n")
+    git_repo.git_add("helper.py")
+
+    with patch(
+        "aiautocommit.cli.complete", return_value="feat: add main and helper"
+    ) as m:
+        message = generate_or_update_commit_message(get_diff())
+
+    assert message == "feat: add main and helper"
+    sent = m.call_args[0][1]
+    assert "<previous_commit_message>\nfeat: add main\n" in sent
+    assert "helper.py" in sent
+    assert "main.py" not in sent.split("<additional_diff>")[1]
+
+
+def test_large_delta_falls_back_to_full_generation(git_repo):
+    stage_initial_commit(git_repo)
+    git_repo.create_file("main.py", "print('hello')\n")
+    git_repo.git_add("main.py")
+
+    with patch("aiautocommit.cli.complete", return_value="feat: add main"):
+        generate_or_update_commit_message(get_diff())
+
+    git_repo.create_file("big.py", "x = 1\n" * 1000)
+    git_repo.git_add("big.py")
+
+    with patch("aiautocommit.cli.complete", return_value="feat: add big") as m:
+        generate_or_update_commit_message(get_diff())
+
+    assert "<previous_commit_message>" not in m.call_args[0][1]
+
+
+def test_unstaged_previous_file_falls_back_to_full_generation(git_repo):
+    stage_initial_commit(git_repo)
+    git_repo.create_file("main.py", "print('hello')\n" * 50)
+    git_repo.git_add("main.py")
+
+    with patch("aiautocommit.cli.complete", return_value="feat: add main"):
+        generate_or_update_commit_message(get_diff())
+
+    git_repo.create_file("helper.py", "x = 1\n")
+    git_repo.git_add("helper.py")
+    subprocess.check_call(["git", "rm", "--cached", "-q", "main.py"])
+
+    with patch("aiautocommit.cli.complete", return_value="feat: add helper") as m:
+        generate_or_update_commit_message(get_diff())
+
+    assert "<previous_commit_message>" not in m.call_args[0][1]
+
+
+def test_fallback_messages_are_not_recorded(git_repo):
+    stage_initial_commit(git_repo)
+    git_repo.create_file("main.py", "print('hello')\n")
+    git_repo.git_add("main.py")
+
+    with patch("aiautocommit.cli.complete", return_value="# aiautocommit: unavailable"):
+        generate_or_update_commit_message(get_diff())
+
+    assert load_last_generation() is None
+
+
+def test_build_update_input():
+    update_input = build_update_input("feat: a", "diff --git a/b b/b")
+    assert "feat: a" in update_input
+    assert "diff --git a/b b/b" in update_input
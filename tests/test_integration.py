@@ -4,7 +4,7 @@ from unittest.mock import patch
 import pytest
 from click.testing import CliRunner
 
-from aiautocommit import DEFAULT_MODEL_NAME, main
+from aiautocommit.cli import DEFAULT_MODEL_NAME, main
 
 from tests.utils import GitTestMixin
 
@@ -41,7 +41,7 @@ class TestIntegration(GitTestMixin):
         This verifies that pydantic-ai is correctly configured and can talk to the configured AI provider.
         """
         # Patch the MODEL_NAME in the module to ensure our test model selection is used
-        with patch("aiautocommit.MODEL_NAME", self.model_name):
+        with patch("aiautocommit.cli.MODEL_NAME", self.model_name):
             with self.runner.isolated_filesystem():
                 self.init_repo()
 
@@ -0,0 +1,163 @@
+import socket
+import threading
+from unittest.mock import patch
+
+import pytest
+from pydantic_ai.usage import RunUsage
+
+from aiautocommit.cli import main
+from aiautocommit.deadline import Deadline
+from aiautocommit.metrics import (
+    CURRENT_METRICS,
+    MIN_TEXTFILE_WAIT,
+    Metrics,
+    parse_textfile,
+    record_deadline,
+    resolve_statsd_address,
+    send_statsd,
+    write_textfile,
+)
+from aiautocommit.utils import get_command_metric
+
+from tests.utils import patch_agent
+
+
+@pytest.fixture
+def statsd_listener():
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as listener:
+        listener.bind(("127.0.0.1", 0))
+        listener.settimeout(2)
+        host, port = listener.getsockname()
+
+        with patch("aiautocommit.metrics.STATSD_ADDRESS", f"{host}:{port}"):
+            yield listener
+
+
+def receive_lines(listener) -> list[str]:
+    lines = []
+    listener.settimeout(0.2)
+
+    try:
+        while True:
+            lines += listener.recv(65535).decode().splitlines()
+    except TimeoutError:
+        return lines
+
+
+def wait_for_textfile_writes():
+    for thread in threading.enumerate():
+        if thread.name == "aiautocommit-metrics":
+            thread.join()
+
+
+def test_commit_sends_statsd_metrics(runner, git_repo, statsd_listener):
+    git_repo.create_file("app.py", "x = 1\n")
+    git_repo.git_add("app.py")
+
+    with patch_agent() as mock_agent_class:
+        result = mock_agent_class.return_value.run_sync.return_value
+        result.output = "feat: add app"
+        result.usage.return_value = RunUsage(input_tokens=120, output_tokens=8)
+
+        cli_result = runner.invoke(main, ["commit", "--print-message"])
+
+    assert cli_result.exit_code == 0
+    lines = receive_lines(statsd_listener)
+    names = {line.split(":")[0] for line in lines}
+
+    assert {
+        "aiautocommit.overall_execution",
+        "aiautocommit.ai_generation",
+        "aiautocommit.git_diff",
+    } <= names
+    assert any(
+        line.startswith("aiautocommit.tokens.input.") and line.endswith(":120|c")
+        for line in lines
+    )
+
+
+def test_commit_accumulates_textfile(runner, git_repo, tmp_path):
+    textfile = tmp_path / "aiautocommit.prom"
+    git_repo.create_file("test.txt", "hello\n")
+    git_repo.git_add("test.txt")
+    git_repo.git_commit("initial")
+
+    # whitespace only changes never reach the model
+    git_repo.create_file("test.txt", "hello \n")
+    git_repo.git_add("test.txt")
+
+    with patch("aiautocommit.metrics.METRICS_TEXTFILE", str(textfile)):
+        for _ in range(2):
+            assert runner.invoke(main, ["commit", "--print-message"]).exit_code == 0
+            wait_for_textfile_writes()
+
+    content = textfile.read_text()
+    totals = parse_textfile(content)
+
+    assert "# TYPE aiautocommit_duration_seconds summary" in content
+    assert totals[("fast_path_total", (("path", "whitespace"),))] == 2
+    assert totals[("duration_seconds_count", (("timer", "overall_execution"),))] == 2
+
+
+def test_textfile_round_trip(tmp_path):
+    textfile = tmp_path / "metrics" / "aiautocommit.prom"
+    metrics = Metrics()
+    metrics.timing("ai_generation", 1.5)
+    metrics.increment("fallback", reason="deadline")
+    metrics.increment("tokens", 10, kind="input", model='odd"model')
+
+    write_textfile(metrics, textfile)
+    write_textfile(metrics, textfile)
+
+    assert parse_textfile(textfile.read_text()) == {
+        ("duration_seconds_sum", (("timer", "ai_generation"),)): 3.0,
+        ("duration_seconds_count", (("timer", "ai_generation"),)): 2,
+        ("fallback_total", (("reason", "deadline"),)): 2,
+        ("tokens_total", (("kind", "input"), ("model", 'odd"model'))): 20,
+    }
+
+
+def test_deadline_stages_are_labelled():
+    deadline = Deadline(1)
+    deadline.stages = {"git_diff": 0.25}
+    deadline.exceeded("ai_generation")
+
+    metrics = Metrics()
+    token = CURRENT_METRICS.set(metrics)
+    try:
+        record_deadline(deadline)
+    finally:
+        CURRENT_METRICS.reset(token)
+
+    totals = metrics.get_totals()
+    stage = (("stage", "git_diff"), ("timer", "deadline_stage"))
+    assert totals[("duration_seconds_sum", stage)] == 0.25
+    assert totals[("deadline_exceeded_total", (("stage", "ai_generation"),))] == 1
+    assert "aiautocommit.deadline_stage.git_diff:250.0|ms" in metrics.to_statsd()
+
+    # the budget is spent, so the textfile write only gets the minimum wait
+    assert metrics.write_timeout == MIN_TEXTFILE_WAIT
+
+
+def test_statsd_address_is_resolved_once(statsd_listener):
+    address = f"localhost:{statsd_listener.getsockname()[1]}"
+    metrics = Metrics()
+    metrics.increment("fast_path", path="whitespace")
+    resolve_statsd_address.cache_clear()
+
+    with patch(
+        "aiautocommit.metrics.socket.getaddrinfo", wraps=socket.getaddrinfo
+    ) as getaddrinfo:
+        send_statsd(metrics, address)
+        send_statsd(metrics, address)
+
+    getaddrinfo.assert_called_once()
+    assert (
+        receive_lines(statsd_listener) == ["aiautocommit.fast_path.whitespace:1|c"] * 2
+    )
+
+
+def test_command_metric():
+    assert get_command_metric(["git", "-c", "core.pager=cat", "diff"]) == "git_diff"
+    assert get_command_metric(["git", "check-attr", "--stdin"]) == "git_check_attr"
+    assert get_command_metric(["gh", "pr", "view"]) == "command"
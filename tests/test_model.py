@@ -0,0 +1,30 @@
+from aiautocommit.model import get_agent, get_pool_stats
+
+
+def test_agents_are_reused_per_model_and_settings(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+
+    agent = get_agent("openai:gpt-5-mini")
+
+    assert get_agent("openai:gpt-5-mini") is agent
+    assert get_agent("openai:gpt-5-mini", {"temperature": 0.2}) is not agent
+    assert get_pool_stats()["agent"] == {"hits": 1, "misses": 2}
+
+
+def test_models_of_one_provider_share_its_http_client(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+
+    mini = get_agent("openai:gpt-5-mini")
+    nano = get_agent("openai:gpt-5-nano")
+
+    assert mini.model is not nano.model
+    assert mini.model.client is nano.model.client
+    assert get_pool_stats()["provider"] == {"hits": 1, "misses": 1}
+
+
+def test_sdk_clients_leave_retries_to_aiautocommit(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    monkeypatch.setenv("ANTHROPIC_API_KEY", "test-key")
+
+    assert get_agent("openai:gpt-5-mini").model.client.max_retries == 0
+    assert get_agent("anthropic:claude-haiku-4-5").model.client.max_retries == 0
@@ -0,0 +1,121 @@
+from unittest.mock import patch
+
+from aiautocommit.cli import main
+from aiautocommit.offline import (
+    OFFLINE_DRAFT_NOTE,
+    generate_offline_message,
+    get_offline_fallback_message,
+)
+
+
+def make_section(path, added=(), removed=(), new=False, deleted=False):
+    lines = [f"diff --git a/{path} b/{path}"]
+    if new:
+        lines.append("new file mode 100644")
+    if deleted:
+        lines.append("deleted file mode 100644")
+    lines.append("@@ -1,1 +1,1 @@")
+    lines += [f"-{line}" for line in removed]
+    lines += [f"+{line}" for line in added]
+    return "\n".join(lines)
+
+
+def test_new_symbols_are_a_feature_scoped_to_their_directory():
+    diff = "\n".join(
+        [
+            make_section(
+                "src/billing/invoice.py",
+                added=["def send_invoice(invoice):", "    pass"],
+            ),
+            make_section(
+                "src/billing/tax.py", added=["RATE = 0.2"], removed=["RATE = 0.1"]
+            ),
+        ]
+    )
+
+    message = generate_offline_message(diff)
+
+    assert message.splitlines()[0] == "feat(billing): add send_invoice"
+    assert "- src/billing/invoice.py (+2 -0)" in message
+    assert "- src/billing/tax.py (+1 -1)" in message
+
+
+def test_type_from_paths():
+    tests = make_section("tests/test_app.py", added=["assert True"])
+    docs = make_section("README.md", added=["More docs"])
+    ci = make_section(".github/workflows/test.yml", added=["on: push"])
+
+    assert generate_offline_message(tests) == "test: update test_app.py"
+    assert generate_offline_message(docs) == "docs: update README.md"
+    assert generate_offline_message(ci) == "ci(workflows): update test.yml"
+
+
+def test_edited_source_without_new_symbols_is_a_fix():
+    diff = make_section(
+        "app.py",
+        added=["def total(items):", "    return sum(items)"],
+        removed=["def total(items):", "    return 0"],
+    )
+
+    assert generate_offline_message(diff) == "fix: update app.py"
+
+
+def test_removed_symbols_are_a_refactor():
+    diff = make_section(
+        "api/legacy.py", removed=["class OldClient:", "    pass"], deleted=True
+    )
+
+    assert generate_offline_message(diff) == "refactor(api): remove OldClient"
+
+
+def test_generated_files_dont_drive_the_message():
+    diff = "\n".join(
+        [
+            make_section("uv.lock", added=["x"] * 500),
+            make_section("docs/usage.md", added=["Usage"], new=True),
+        ]
+    )
+
+    message = generate_offline_message(diff)
+
+    assert message.startswith("docs: add usage.md\n\n")
+    assert "- uv.lock (+500 -0)" in message
+
+
+def test_fallback_message_keeps_the_reason_first():
+    reason = "# aiautocommit: AI model unavailable."
+    diff = make_section("app.py", added=["x = 1"])
+
+    assert get_offline_fallback_message(reason, "") == reason
+    assert get_offline_fallback_message(reason, diff).splitlines() == [
+        reason,
+        OFFLINE_DRAFT_NOTE,
+        "fix: update app.py",
+    ]
+
+
+def test_commit_offline_skips_the_model(runner, git_repo):
+    git_repo.create_file("app.py", "def main():\n    pass\n")
+    git_repo.git_add("app.py")
+
+    with patch("aiautocommit.cli.complete") as complete:
+        result = runner.invoke(main, ["commit", "--offline", "--print-message"])
+
+    assert result.exit_code == 0
+    assert result.output.startswith("feat: add main")
+    complete.assert_not_called()
+
+
+def test_commit_without_internet_uses_offline_draft(runner, git_repo):
+    git_repo.create_file("app.py", "def main():\n    pass\n")
+    git_repo.git_add("app.py")
+
+    with patch(
+        "aiautocommit.cli.wait_for_internet_connection",
+        side_effect=Exception("offline"),
+    ):
+        result = runner.invoke(main, ["commit", "--print-message"])
+
+    assert result.exit_code == 0
+    assert result.output.startswith("# aiautocommit: no internet connection.")
+    assert "feat: add main" in result.output
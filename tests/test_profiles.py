@@ -0,0 +1,81 @@
+import copy
+from unittest.mock import MagicMock, patch
+
+import pytest
+from pydantic_ai.exceptions import UserError
+from pydantic_ai.models.google import GoogleModel
+
+from aiautocommit import profiles
+from aiautocommit.cli import UserFacingError, complete
+from aiautocommit.model import get_agent, get_model_settings
+from aiautocommit.profiles import configure_profiles, get_profile_settings
+
+from tests.utils import patch_agent
+
+
+@pytest.fixture(autouse=True)
+def restore_profiles():
+    with patch.object(profiles, "PROFILES", copy.deepcopy(profiles.PROFILES)):
+        yield
+
+
+def test_profiles_pick_the_provider_row(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+
+    # reasoning models refuse a temperature, so the OpenAI row leaves it out
+    assert get_agent("openai:gpt-5-mini", profile="fast").model_settings == {
+        "thinking": False,
+        "max_tokens": 400,
+        "timeout": 15,
+    }
+    assert get_agent("openai:gpt-5-mini").model_settings is None
+
+    gemini = MagicMock(spec=GoogleModel)
+    assert get_profile_settings(gemini) == {"thinking": "low"}
+    # without a google row the `*` row applies
+    assert get_profile_settings(gemini, "quality") == {
+        "thinking": "medium",
+        "timeout": 60,
+    }
+
+
+def test_route_settings_override_the_profile():
+    gemini = MagicMock(spec=GoogleModel)
+
+    settings = get_model_settings(gemini, {"thinking": "high"}, "fast")
+
+    assert settings["thinking"] == "high"
+    assert settings["max_tokens"] == 400
+
+
+def test_config_extends_profiles():
+    configure_profiles(
+        {
+            "fast": {"google": {"max_tokens": 200}},
+            "tiny": {"*": {"max_tokens": 100}},
+        }
+    )
+
+    gemini = MagicMock(spec=GoogleModel)
+    assert get_profile_settings(gemini, "fast")["max_tokens"] == 200
+    assert get_profile_settings(gemini, "fast")["thinking"] == "low"
+    assert get_profile_settings(gemini, "tiny") == {"max_tokens": 100}
+
+
+def test_unknown_provider_rows_are_rejected():
+    with pytest.raises(
+        UserError, match=r"Unknown providers in \[profiles.fast\]: antropic"
+    ):
+        configure_profiles({"fast": {"antropic": {"max_tokens": 200}}})
+
+    with pytest.raises(UserError, match=r"\[profiles.fast.google\] must be a table"):
+        configure_profiles({"fast": {"google": 200}})
+
+
+def test_unknown_profile_is_reported():
+    with (
+        patch_agent(),
+        patch("aiautocommit.profiles.PROFILE", "turbo"),
+        pytest.raises(UserFacingError, match="Unknown profile 'turbo'"),
+    ):
+        complete("prompt", "diff")
@@ -0,0 +1,194 @@
+import json
+import sqlite3
+import subprocess
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+from aiautocommit.pull_request import compress_pr_body, get_pull_request_context
+from aiautocommit.repo import repo_context
+from aiautocommit.store import get_store_path, open_store
+from aiautocommit.utils import file_lock
+
+from tests.utils import patch_agent
+
+PR_TEMPLATE_BODY = (
+    """\
+<!-- Describe your change, link the issue -->
+Billing retries failed charges twice before giving up.
+
+![screenshot](https://example.com/shot.png)
+https://github.com/user-attachments/assets/0b6c8f0e
+
+## Checklist
+
+- [x] Tests added
+- [ ] Docs updated
+
+```python
+retry(charge, attempts=2)
+```
+
+```
+"""
+    + "\n".join(f"log line {i}" for i in range(40))
+    + """
+```
+"""
+)
+
+
+def test_compress_pr_body():
+    compressed = compress_pr_body(PR_TEMPLATE_BODY)
+
+    assert compressed == (
+        "Billing retries failed charges twice before giving up.\n\n"
+        "## Checklist\n\n"
+        "```python\nretry(charge, attempts=2)\n```\n\n"
+        "[40 line code block omitted]"
+    )
+
+
+def test_compress_pr_body_token_budget():
+    body = "\n".join(f"paragraph {i} " + "word " * 20 for i in range(100))
+
+    compressed = compress_pr_body(body, max_tokens=100)
+
+    assert len(compressed) <= 100 * 4 + len("\n[PR description truncated]")
+    assert compressed.startswith("paragraph 0 ")
+    assert compressed.endswith("\n[PR description truncated]")
+
+
+@pytest.fixture
+def pr_branch(git_repo):
+    git_repo.create_file("app.py", "x = 1\n")
+    git_repo.git_add("app.py")
+    git_repo.git_commit("initial")
+    subprocess.check_call(["git", "checkout", "-q", "-b", "feature"])
+    return git_repo
+
+
+def test_fetched_body_is_compressed(pr_branch):
+    gh_output = json.dumps(
+        {"number": 7, "title": "Retry charges", "body": PR_TEMPLATE_BODY}
+    )
+    completed = subprocess.CompletedProcess([], 0, stdout=gh_output, stderr="")
+
+    with (
+        patch("aiautocommit.pull_request.shutil.which", return_value="/usr/bin/gh"),
+        patch("aiautocommit.pull_request.run_command", return_value=completed),
+    ):
+        context = get_pull_request_context("feature", enabled=True)
+
+    assert "<pull_request_title>PR #7: Retry charges</pull_request_title>" in context
+    assert "log line" not in context
+    with open_store() as store:
+        assert store.get_pull_request("7") == context
+
+
+def test_summary_is_cached_until_the_pr_changes(pr_branch):
+    subprocess.check_call(["git", "config", "branch.feature.pr-number", "7"])
+    context = (
+        "<pull_request_title>PR #7: Retry charges</pull_request_title>\n"
+        "<pull_request_description>\nlong description\n</pull_request_description>\n"
+    )
+    with open_store() as store:
+        store.put_pull_request("7", context)
+
+    def summarize():
+        return get_pull_request_context(
+            "feature", enabled=True, summary_model="openai:gpt-test"
+        )
+
+    with patch_agent() as mock_agent_class:
+        run_sync = mock_agent_class.return_value.run_sync
+        run_sync.return_value.output = "- retry failed charges"
+
+        first = summarize()
+        assert summarize() == first
+        assert run_sync.call_count == 1
+
+        with open_store() as store:
+            store.put_pull_request("7", context.replace("long", "edited"))
+        summarize()
+        assert run_sync.call_count == 2
+
+    assert first == (
+        "<pull_request_title>PR #7: Retry charges</pull_request_title>\n"
+        "<pull_request_summary>\n- retry failed charges\n</pull_request_summary>\n"
+    )
+
+
+def test_linked_worktrees_share_the_cache(pr_branch, tmp_path):
+    subprocess.check_call(["git", "checkout", "-q", "-"])
+    subprocess.check_call(
+        ["git", "worktree", "add", "-q", str(tmp_path / "wt"), "feature"]
+    )
+
+    gh_output = json.dumps({"number": 7, "title": "Retry charges", "body": "Body"})
+    completed = subprocess.CompletedProcess([], 0, stdout=gh_output, stderr="")
+
+    with (
+        patch("aiautocommit.pull_request.shutil.which", return_value="/usr/bin/gh"),
+        patch("aiautocommit.pull_request.run_command", return_value=completed),
+        repo_context(tmp_path / "wt"),
+    ):
+        context = get_pull_request_context("feature", enabled=True)
+
+    with open_store(Path(".git/aiautocommit/state.sqlite3")) as store:
+        assert store.get_pull_request("7") == context
+    # the PR number lands in the shared config, so the main worktree finds the cached context
+    subprocess.check_call(["git", "config", "branch.feature.pr-number", "7"])
+
+    with patch("aiautocommit.pull_request.run_command") as run_command:
+        assert get_pull_request_context("feature", enabled=True) == context
+
+    run_command.assert_not_called()
+
+
+def test_fetch_lock_held_by_another_hook_times_out(pr_branch):
+    gh_output = json.dumps({"number": 7, "title": "Retry charges", "body": "Body"})
+    completed = subprocess.CompletedProcess([], 0, stdout=gh_output, stderr="")
+
+    # another worktree's hook in the middle of a slow fetch
+    with (
+        file_lock(Path(".git/aiautocommit/pull_request.lock")),
+        patch("aiautocommit.pull_request.MAX_FETCH_LOCK_WAIT", 0.1),
+        patch("aiautocommit.pull_request.shutil.which", return_value="/usr/bin/gh"),
+        patch("aiautocommit.pull_request.run_command", return_value=completed),
+    ):
+        context = get_pull_request_context("feature", enabled=True)
+
+    assert "PR #7: Retry charges" in context
+
+
+def test_locked_store_does_not_fail_the_hook(pr_branch):
+    subprocess.check_call(["git", "config", "branch.feature.pr-number", "7"])
+    context = "<pull_request_title>PR #7: Retry charges</pull_request_title>\n"
+    with open_store() as store:
+        store.put_pull_request("7", context)
+
+    # another worktree's hook in the middle of a write
+    writer = sqlite3.connect(get_store_path())
+    writer.execute("BEGIN IMMEDIATE")
+
+    try:
+        with (
+            patch("aiautocommit.store.BUSY_TIMEOUT", 0.1),
+            patch("aiautocommit.pull_request.run_command") as run_command,
+        ):
+            assert get_pull_request_context("feature", enabled=True) == context
+
+            # the summary is generated, but not stored while the writer holds the lock
+            with patch_agent() as mock_agent_class:
+                mock_agent_class.return_value.run_sync.return_value.output = "- retry"
+                summary = get_pull_request_context(
+                    "feature", enabled=True, summary_model="openai:gpt-test"
+                )
+                assert "<pull_request_summary>\n- retry" in summary
+    finally:
+        writer.rollback()
+        writer.close()
+
+    run_command.assert_not_called()
@@ -0,0 +1,103 @@
+from pathlib import Path
+from unittest.mock import patch
+
+from aiautocommit.cli import configure_prompts, get_diff, order_git_diff
+from aiautocommit.ranking import (
+    DEFAULT_WEIGHTS,
+    classify_path,
+    configure_ranking,
+    measure_source_retention,
+    rank_git_diff,
+)
+
+
+def make_section(path, changed_lines, new_file=False):
+    lines = [f"diff --git a/{path} b/{path}"]
+    if new_file:
+        lines.append("new file mode 100644")
+    lines.append("@@ -1,1 +1,1 @@")
+    lines += [f"+line {i}" for i in range(changed_lines)]
+    return "\n".join(lines)
+
+
+DIFF = "\n".join(
+    [
+        make_section("README.md", 1),
+        make_section("dist/app.min.js", 2),
+        make_section("tests/test_api.py", 5),
+        make_section("src/api.py", 40),
+    ]
+)
+
+
+def paths_in_order(diff):
+    return [
+        line.split(" b/")[1] for line in diff.splitlines() if line.startswith("diff")
+    ]
+
+
+def test_classify_path():
+    assert classify_path("src/api.py") == "source"
+    assert classify_path("tests/test_api.py") == "test"
+    assert classify_path("web/app.spec.ts") == "test"
+    assert classify_path("docs/guide.md") == "docs"
+    assert classify_path("pyproject.toml") == "config"
+    assert classify_path("dist/app.min.js") == "generated"
+    assert classify_path("proto/user_pb2.py") == "generated"
+
+
+def test_rank_puts_source_first_and_generated_last():
+    order = paths_in_order(rank_git_diff(DIFF))
+
+    assert order[0] == "src/api.py"
+    assert order[-1] == "dist/app.min.js"
+
+
+def test_size_order_is_still_available():
+    with patch("aiautocommit.cli.DIFF_ORDER", "size"):
+        order = paths_in_order(order_git_diff(DIFF))
+
+    assert order[0] == "README.md"
+
+
+def test_ranking_weights_from_config(git_repo):
+    config_dir = Path("custom_config")
+    config_dir.mkdir()
+    (config_dir / "commit_prompt.txt").write_text("prompt")
+    (config_dir / "config.toml").write_text("[ranking.weights]\ndocs = 10.0\n")
+    configure_prompts(config_dir=str(config_dir))
+
+    git_repo.create_file("README.md", "readme\n")
+    git_repo.create_file("api.py", "def api():\n    pass\n")
+    git_repo.git_add(".")
+
+    try:
+        assert paths_in_order(get_diff())[0] == "README.md"
+    finally:
+        configure_ranking({})
+
+
+def test_custom_scorer():
+    order = paths_in_order(
+        rank_git_diff(
+            DIFF,
+            scorer=lambda path, section, weights: 1.0 if path == "README.md" else 0.0,
+        )
+    )
+    assert order[0] == "README.md"
+
+
+def test_new_files_rank_higher():
+    diff = "\n".join(
+        [make_section("src/old.py", 3), make_section("src/new.py", 3, new_file=True)]
+    )
+    assert paths_in_order(rank_git_diff(diff, DEFAULT_WEIGHTS))[0] == "src/new.py"
+
+
+def test_measure_source_retention():
+    cutoff = len(make_section("README.md", 1)) + 1
+    kept, total = measure_source_retention(DIFF, cutoff)
+    assert (kept, total) == (0, 40)
+
+    kept, total = measure_source_retention(rank_git_diff(DIFF), cutoff + 400)
+    assert (kept, total) == (40, 40)
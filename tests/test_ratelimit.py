@@ -0,0 +1,157 @@
+import json
+import subprocess
+import sys
+import time
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+from pydantic_ai.exceptions import UserError
+
+from aiautocommit.cli import main
+from aiautocommit.deadline import deadline_scope
+from aiautocommit.ratelimit import (
+    RateLimit,
+    parse_rate_limits,
+    rate_limit,
+    take_from_bucket,
+    try_acquire_slot,
+)
+
+
+@pytest.fixture
+def rate_limit_dir(tmp_path):
+    with patch("aiautocommit.ratelimit.RATE_LIMIT_DIR", tmp_path):
+        yield tmp_path
+
+
+def drain(path, **levels):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps({"updated": time.time(), **levels}))
+
+
+def test_bucket_allows_a_minute_of_requests(tmp_path):
+    bucket = tmp_path / "bucket.json"
+    limit = RateLimit(requests_per_minute=2)
+
+    assert take_from_bucket(bucket, limit, 0) == 0
+    assert take_from_bucket(bucket, limit, 0) == 0
+    # one request refills every 30 seconds
+    assert take_from_bucket(bucket, limit, 0) == pytest.approx(30, abs=0.5)
+
+
+def test_bucket_waits_for_tokens(tmp_path):
+    bucket = tmp_path / "bucket.json"
+    limit = RateLimit(tokens_per_minute=6000)
+
+    assert take_from_bucket(bucket, limit, 5000) == 0
+    assert take_from_bucket(bucket, limit, 3000) == pytest.approx(20, abs=0.5)
+
+    # larger than the whole bucket, so it only waits for a full one
+    assert take_from_bucket(bucket, limit, 100_000) == pytest.approx(50, abs=0.5)
+
+
+def test_corrupt_bucket_starts_full(tmp_path):
+    bucket = tmp_path / "bucket.json"
+    bucket.write_text('{"updated": 1')
+
+    assert take_from_bucket(bucket, RateLimit(requests_per_minute=2), 0) == 0
+    assert json.loads(bucket.read_text())["requests"] == pytest.approx(1)
+
+
+def test_concurrency_slots_are_shared_across_processes(tmp_path):
+    script = (
+        "import fcntl, time\n"
+        f"f = open({str(tmp_path / 'slot-0.lock')!r}, 'a')\n"
+        "fcntl.flock(f, fcntl.LOCK_EX)\n"
+        "print('locked', flush=True)\n"
+        "time.sleep(30)\n"
+    )
+    holder = subprocess.Popen(
+        [sys.executable, "-c", script],
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+
+    try:
+        assert holder.stdout.readline().strip() == "locked"
+        assert try_acquire_slot(tmp_path, 1) is None
+    finally:
+        holder.kill()
+        holder.wait()
+
+    # the slot is freed when its process dies
+    slot = try_acquire_slot(tmp_path, 1)
+    assert slot is not None
+    slot.close()
+
+
+def test_rate_limit_queues_and_reports_wait(rate_limit_dir):
+    limits = {"openai": RateLimit(requests_per_minute=600)}
+    drain(rate_limit_dir / "openai" / "bucket.json", requests=0)
+
+    with deadline_scope(None) as deadline:
+        with rate_limit("openai:gpt-test", 100, limits):
+            pass
+
+    # one request refills every 100ms
+    assert deadline.report()["stages_ms"]["rate_limit"] >= 90
+
+
+def test_rate_limit_gives_up_instead_of_failing(rate_limit_dir):
+    limits = {"openai": RateLimit(requests_per_minute=1)}
+    drain(rate_limit_dir / "openai" / "bucket.json", requests=0)
+
+    with (
+        patch("aiautocommit.ratelimit.MAX_QUEUE_WAIT", 0.05),
+        patch("aiautocommit.ratelimit.log") as log,
+    ):
+        started = time.monotonic()
+        with rate_limit("openai:gpt-test", 100, limits):
+            pass
+
+    assert time.monotonic() - started < 1
+    log.warning.assert_called_once()
+
+
+def test_rate_limit_ignores_other_providers(rate_limit_dir):
+    with rate_limit("anthropic:claude-test", 100, {"openai": RateLimit(1, 1, 1)}):
+        pass
+
+    assert not any(rate_limit_dir.iterdir())
+
+
+def test_unknown_rate_limit_keys_are_rejected():
+    with pytest.raises(UserError, match=r"Unknown keys in \[rate_limits.openai\]: rpm"):
+        parse_rate_limits({"openai": {"rpm": 10}})
+
+
+@pytest.mark.parametrize(
+    "limit",
+    [
+        {"requests_per_minute": "60"},
+        {"tokens_per_minute": 0},
+        {"max_concurrency": 1.5},
+        {"max_concurrency": True},
+    ],
+)
+def test_invalid_limit_values_are_rejected(limit):
+    with pytest.raises(
+        UserError, match=r"in \[rate_limits.openai\] must be a positive"
+    ):
+        parse_rate_limits({"openai": limit})
+
+
+def test_config_typo_is_a_one_line_error(runner, git_repo):
+    Path(".aiautocommit").mkdir()
+    git_repo.create_file(
+        ".aiautocommit/config.toml", "[rate_limits.openai]\nrpm = 10\n"
+    )
+    git_repo.create_file("app.py", "x = 1\n")
+    git_repo.git_add("app.py")
+
+    result = runner.invoke(main, ["commit", "--print-message"])
+
+    assert result.exit_code == 1
+    assert "Unknown keys in [rate_limits.openai]: rpm" in result.output
+    assert "Traceback" not in result.output
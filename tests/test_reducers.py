@@ -0,0 +1,184 @@
+import json
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+from aiautocommit.cli import UserFacingError, configure_prompts, get_diff
+from aiautocommit.reducers import USER_REDUCERS, flatten_json
+from aiautocommit.repo import repo_context
+from aiautocommit.utils import get_staged_tree_id
+
+
+@pytest.fixture(autouse=True)
+def reset_user_reducers():
+    yield
+    USER_REDUCERS.clear()
+
+
+def write_notebook(path, sources, output):
+    cells = [
+        {"cell_type": "code", "source": source, "outputs": [{"text": output}]}
+        for source in sources
+    ]
+    Path(path).write_text(json.dumps({"cells": cells}, indent=1))
+
+
+def test_minified_bundle(git_repo):
+    git_repo.create_file("app.min.js", "var a=1;" * 500)
+    git_repo.git_add("app.min.js")
+
+    diff = get_diff()
+
+    assert "var a=1" not in diff
+    assert "minified bundle regenerated (+3.9 KB)" in diff
+
+
+def test_notebook_cell_sources_only(git_repo):
+    write_notebook("analysis.ipynb", ["x = 1\n", "print(x)\n"], "old output")
+    git_repo.git_add("analysis.ipynb")
+    git_repo.git_commit("initial")
+
+    write_notebook("analysis.ipynb", ["x = 2\n", "print(x)\n"], "new output")
+    git_repo.git_add("analysis.ipynb")
+
+    diff = get_diff()
+
+    assert "notebook cell source changes" in diff
+    assert "-x = 1" in diff
+    assert "+x = 2" in diff
+    assert "old output" not in diff
+
+
+def test_json_key_paths(git_repo):
+    before = {"items": [{"id": i, "name": f"item {i}"} for i in range(60)]}
+    Path("fixture.json").write_text(json.dumps(before, indent=2))
+    git_repo.git_add("fixture.json")
+    git_repo.git_commit("initial")
+
+    after = {"items": [{"id": i, "label": f"item {i}"} for i in range(60)]}
+    Path("fixture.json").write_text(json.dumps(after, indent=2))
+    git_repo.git_add("fixture.json")
+
+    diff = get_diff()
+
+    assert "JSON key paths changed: 120" in diff
+    assert "+ $.items[0].label" in diff
+    assert "- $.items[0].name" in diff
+
+
+def test_json_delta_against_an_earlier_tree(git_repo):
+    def write_items(key):
+        items = {"items": [{"id": i, key: f"item {i}"} for i in range(60)]}
+        Path("fixture.json").write_text(json.dumps(items, indent=2))
+        git_repo.git_add("fixture.json")
+
+    write_items("name")
+    git_repo.git_commit("initial")
+    write_items("label")
+    previous_tree = get_staged_tree_id()
+    write_items("title")
+
+    diff = get_diff(base=previous_tree)
+
+    # key paths are compared with the earlier tree, not HEAD
+    assert "- $.items[0].label" in diff
+    assert "+ $.items[0].title" in diff
+    assert "$.items[0].name" not in diff
+
+
+def test_small_json_is_kept(git_repo):
+    git_repo.create_file("package.json", '{"name": "demo"}\n')
+    git_repo.git_add("package.json")
+
+    assert '+{"name": "demo"}' in get_diff()
+
+
+def test_user_reducer_from_config(git_repo):
+    config_dir = Path("custom_config")
+    config_dir.mkdir()
+    (config_dir / "commit_prompt.txt").write_text("prompt")
+    (config_dir / "reducers.py").write_text(
+        "def reduce_proto(path, section):\n    return [f'protobuf stub {path} regenerated']\n"
+    )
+    (config_dir / "config.toml").write_text(
+        '[[reducers]]\npattern = "*_pb2.py"\nreducer = "reducers.py:reduce_proto"\n\n'
+        '[[reducers]]\npattern = "attr:linguist-generated"\nreducer = "summary"\n'
+    )
+    configure_prompts(config_dir=str(config_dir))
+
+    git_repo.create_file(".gitattributes", "schema.sql linguist-generated\n")
+    git_repo.create_file("user_pb2.py", "class User: pass\n")
+    git_repo.create_file("schema.sql", "create table users;\n")
+    git_repo.create_file("main.py", "print('hello')\n")
+    git_repo.git_add(".")
+
+    diff = get_diff()
+
+    assert "protobuf stub user_pb2.py regenerated" in diff
+    assert "file changed (+1 -0 lines, diff omitted)" in diff
+    assert "create table" not in diff
+    assert "print('hello')" in diff
+
+
+def test_unloadable_reducer_is_reported(git_repo):
+    config_dir = Path("custom_config")
+    config_dir.mkdir()
+    (config_dir / "config.toml").write_text(
+        '[[reducers]]\npattern = "*_pb2.py"\nreducer = "reducers.py:reduce_proto"\n'
+    )
+
+    with (
+        patch("aiautocommit.cli.CONFIG_PATHS", [config_dir]),
+        pytest.raises(UserFacingError, match="Cannot load 'reducers.py:reduce_proto'"),
+    ):
+        configure_prompts()
+
+
+def test_flatten_json():
+    assert flatten_json({"a": {"b": [1, {}]}}) == {"$.a.b[0]": 1, "$.a.b[1]": {}}
+
+
+def test_gitattributes_exclusions(git_repo):
+    Path(".gitattributes").write_text(
+        "api_pb2.py linguist-generated\n"
+        "vendor/** linguist-vendored\n"
+        "*.snap -diff\n"
+        "fixtures.sql aiautocommit-ignore\n"
+    )
+    Path("vendor").mkdir()
+    files = {
+        "api_pb2.py": "stub = 1\n" * 40,
+        "vendor/lib.js": "vendored();\n" * 10,
+        "app.snap": "snapshot\n",
+        "fixtures.sql": "insert into t values (1);\n" * 3,
+        "app.py": "x = 1\n",
+    }
+    for path, content in files.items():
+        git_repo.create_file(path, content)
+    git_repo.git_add(".")
+
+    diff = get_diff()
+
+    assert "stub = 1" not in diff
+    assert "generated file changed (+40 -0 lines, diff omitted)" in diff
+    assert "vendored file changed (+10 -0 lines, diff omitted)" in diff
+    assert "file changed (diff disabled in .gitattributes)" in diff
+    assert "file changed (+3 -0 lines, diff omitted)" in diff
+    assert "+x = 1" in diff
+
+
+def test_gitattributes_from_a_subdirectory(git_repo, monkeypatch):
+    Path(".gitattributes").write_text("gen/* linguist-generated\n")
+    Path("gen").mkdir()
+    Path("sub").mkdir()
+    git_repo.create_file("gen/x.py", "stub = 1\n" * 40)
+    git_repo.create_file("sub/app.py", "x = 1\n")
+    git_repo.git_add(".")
+
+    monkeypatch.chdir("sub")
+    with repo_context():
+        diff = get_diff()
+
+    assert "stub = 1" not in diff
+    assert "generated file changed (+40 -0 lines, diff omitted)" in diff
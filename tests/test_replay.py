@@ -0,0 +1,107 @@
+import json
+import time
+from unittest.mock import MagicMock, patch
+
+import pytest
+from pydantic_ai.exceptions import UserError
+from pydantic_ai.usage import RunUsage
+
+from aiautocommit.cli import complete, main
+from aiautocommit.internet import wait_for_internet_connection
+from aiautocommit.model import get_agent
+
+from tests.utils import patch_agent
+
+
+@pytest.fixture
+def cassettes(tmp_path):
+    with patch("aiautocommit.replay.REPLAY_DIR", tmp_path / "cassettes"):
+        yield tmp_path / "cassettes"
+
+
+def record(prompt, diff, output="feat: recorded", delay=0.0):
+    def run_sync(user_prompt, **kwargs):
+        time.sleep(delay)
+        result = MagicMock(output=output)
+        result.usage.return_value = RunUsage(input_tokens=50, output_tokens=5)
+        return result
+
+    with (
+        patch("aiautocommit.replay.REPLAY_MODE", "record"),
+        patch_agent() as mock_agent_class,
+    ):
+        mock_agent_class.return_value.run_sync.side_effect = run_sync
+        return complete(prompt, diff)
+
+
+def test_record_then_replay_without_a_provider(cassettes):
+    assert record("prompt", "diff", delay=0.05) == "feat: recorded"
+
+    [cassette_file] = cassettes.glob("*.json")
+    cassette = json.loads(cassette_file.read_text())
+    assert cassette["output"] == "feat: recorded"
+    assert cassette["usage"]["input_tokens"] == 50
+    assert cassette["latency_ms"] >= 50
+
+    with (
+        patch("aiautocommit.replay.REPLAY_MODE", "replay"),
+        patch("aiautocommit.model.infer_model") as infer_model,
+    ):
+        started = time.monotonic()
+        assert complete("prompt", "diff") == "feat: recorded"
+
+        # the recorded latency is reproduced
+        assert time.monotonic() - started >= 0.05
+        infer_model.assert_not_called()
+
+
+def test_replay_latency_can_be_skipped(cassettes):
+    record("prompt", "diff", delay=0.2)
+
+    with (
+        patch("aiautocommit.replay.REPLAY_MODE", "replay"),
+        patch("aiautocommit.replay.REPLAY_LATENCY", False),
+    ):
+        started = time.monotonic()
+        assert complete("prompt", "diff") == "feat: recorded"
+        assert time.monotonic() - started < 0.2
+
+
+def test_replay_is_keyed_by_prompt_and_diff(cassettes):
+    record("prompt", "diff")
+
+    with patch("aiautocommit.replay.REPLAY_MODE", "replay"):
+        with pytest.raises(UserError, match="No recorded model response"):
+            get_agent("openai:gpt-test").run_sync("other diff", instructions="prompt")
+
+
+def test_commit_replays_offline(runner, git_repo, cassettes):
+    git_repo.create_file("app.py", "x = 1\n")
+    git_repo.git_add("app.py")
+
+    def run_sync(user_prompt, **kwargs):
+        result = MagicMock(output="feat: add app")
+        result.usage.return_value = RunUsage()
+        return result
+
+    with (
+        patch("aiautocommit.replay.REPLAY_MODE", "record"),
+        patch_agent() as mock_agent_class,
+    ):
+        mock_agent_class.return_value.run_sync.side_effect = run_sync
+        recorded = runner.invoke(main, ["commit", "--print-message"])
+
+    with (
+        patch("aiautocommit.replay.REPLAY_MODE", "replay"),
+        # the real connectivity check, which replays skip
+        patch(
+            "aiautocommit.cli.wait_for_internet_connection",
+            wraps=wait_for_internet_connection,
+        ),
+        patch("socket.socket", side_effect=AssertionError("network used")),
+    ):
+        replayed = runner.invoke(main, ["commit", "--print-message"])
+
+    assert replayed.exit_code == 0, replayed.output
+    assert replayed.output == recorded.output
+    assert replayed.output.startswith("feat: add app")
@@ -0,0 +1,121 @@
+import subprocess
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+from aiautocommit.cli import is_reversion, main
+from aiautocommit.repo import RepoContext, parse_git_config, repo_context
+from aiautocommit.store import open_store
+
+
+@pytest.fixture
+def feature_branch(git_repo):
+    git_repo.create_file("app.py", "x = 1\n")
+    git_repo.git_add("app.py")
+    git_repo.git_commit("initial")
+    subprocess.check_call(["git", "checkout", "-q", "-b", "feature"])
+
+    git_repo.create_file("app.py", "x = 2\n")
+    git_repo.git_add("app.py")
+    return git_repo
+
+
+@pytest.fixture
+def count_processes():
+    with patch("aiautocommit.utils.subprocess.run", wraps=subprocess.run) as run:
+        yield run
+
+
+def test_commit_subprocess_count(runner, feature_branch, count_processes):
+    with patch("aiautocommit.cli.complete", return_value="feat: bump x"):
+        result = runner.invoke(main, ["commit", "--output-file", "message.txt"])
+
+    assert result.exit_code == 0
+    # staged diff with and without whitespace, one `git check-attr` for both, plus `git write-tree` for the
+    # incremental snapshot
+    assert count_processes.call_count == 4
+
+
+def test_commit_with_pr_context_subprocess_count(
+    runner, feature_branch, count_processes, monkeypatch
+):
+    monkeypatch.setenv("AIAUTOCOMMIT_INCLUDE_PR_CONTEXT", "true")
+    subprocess.check_call(["git", "config", "branch.feature.pr-number", "42"])
+    with open_store() as store:
+        store.put_pull_request("42", "PR #42: bump")
+
+    with patch("aiautocommit.cli.complete", return_value="feat: bump x") as complete:
+        result = runner.invoke(main, ["commit", "--output-file", "message.txt"])
+
+    assert result.exit_code == 0
+    assert "PR #42: bump" in complete.call_args[0][0]
+    # branch, default branch and PR number all come from files under .git
+    assert count_processes.call_count == 4
+
+
+def test_amend_detection_subprocess_count(feature_branch, count_processes):
+    Path("COMMIT_EDITMSG").write_text("initial\n")
+
+    with repo_context():
+        assert is_reversion("COMMIT_EDITMSG") is True
+
+    # only reading the HEAD commit message needs git
+    assert count_processes.call_count == 1
+
+
+def test_packed_refs_and_default_branch(feature_branch):
+    head = subprocess.check_output(["git", "rev-parse", "HEAD"], text=True).strip()
+    subprocess.check_call(["git", "pack-refs", "--all"])
+    subprocess.check_call(
+        ["git", "update-ref", "refs/remotes/origin/trunk", "HEAD"],
+    )
+    subprocess.check_call(
+        [
+            "git",
+            "symbolic-ref",
+            "refs/remotes/origin/HEAD",
+            "refs/remotes/origin/trunk",
+        ]
+    )
+
+    context = RepoContext()
+
+    assert context.head_commit == head
+    assert context.branch == "feature"
+    assert context.default_branch == "trunk"
+
+
+def test_linked_worktree(feature_branch, tmp_path):
+    worktree = tmp_path / "worktree"
+    subprocess.check_call(["git", "worktree", "add", "-q", str(worktree), "master"])
+
+    context = RepoContext(worktree)
+
+    assert context.git_dir == (Path(".git") / "worktrees" / "worktree").resolve()
+    assert context.common_dir == Path(".git").resolve()
+    assert context.branch == "master"
+
+
+def test_detached_head_and_unborn_branch(git_repo):
+    assert RepoContext().branch is None
+
+    git_repo.create_file("app.py", "x = 1\n")
+    git_repo.git_add("app.py")
+    git_repo.git_commit("initial")
+    subprocess.check_call(["git", "checkout", "-q", "--detach"])
+
+    assert RepoContext().branch == "HEAD"
+
+
+def test_parse_git_config():
+    config = parse_git_config(
+        '[core]\n\tbare = false\n[branch "feat/x"]\n'
+        "\tremote = origin\n\tmerge = refs/pull/12/head\n\tPR-Number = 12\n"
+    )
+
+    assert config[("branch", "feat/x")] == {
+        "remote": "origin",
+        "merge": "refs/pull/12/head",
+        "pr-number": "12",
+    }
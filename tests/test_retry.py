@@ -0,0 +1,106 @@
+from unittest.mock import MagicMock, patch
+
+import pytest
+from pydantic_ai.exceptions import ModelHTTPError
+from pydantic_ai.usage import RunUsage
+
+from aiautocommit.cli import FALLBACK_MESSAGE, complete
+from aiautocommit.deadline import deadline_scope
+from aiautocommit.retry import get_retry_delay, parse_duration
+
+from tests.utils import patch_agent
+
+
+@pytest.fixture
+def sleep():
+    with patch("backoff._sync.time.sleep") as sleep:
+        yield sleep
+
+
+def http_error(status_code, headers=None, body=None):
+    return ModelHTTPError(status_code, "openai:gpt-test", body, headers=headers)
+
+
+def succeed():
+    result = MagicMock(output="feat: add app")
+    result.usage.return_value = RunUsage()
+    return result
+
+
+def test_transient_errors_are_retried(sleep):
+    with patch_agent() as mock_agent_class:
+        run_sync = mock_agent_class.return_value.run_sync
+        run_sync.side_effect = [http_error(503), http_error(500), succeed()]
+
+        with deadline_scope(None) as deadline:
+            assert complete("prompt", "diff") == "feat: add app"
+
+    assert run_sync.call_count == 3
+    assert deadline.labels["model_attempts"] == "3"
+    # full jitter exponential backoff, capped at the first and second delay
+    assert 0 <= sleep.call_args_list[0].args[0] <= 0.5
+    assert 0 <= sleep.call_args_list[1].args[0] <= 1
+
+
+def test_retry_after_replaces_backoff(sleep):
+    with patch_agent() as mock_agent_class:
+        run_sync = mock_agent_class.return_value.run_sync
+        run_sync.side_effect = [http_error(429, {"Retry-After": "2"}), succeed()]
+
+        assert complete("prompt", "diff") == "feat: add app"
+
+    sleep.assert_called_once_with(2.0)
+
+
+@pytest.mark.parametrize(
+    "error",
+    [
+        http_error(400),
+        http_error(401),
+        http_error(429, body={"error": {"code": "insufficient_quota"}}),
+    ],
+)
+def test_permanent_errors_fall_back_immediately(sleep, error):
+    with patch_agent() as mock_agent_class:
+        run_sync = mock_agent_class.return_value.run_sync
+        run_sync.side_effect = error
+
+        assert complete("prompt", "diff") == FALLBACK_MESSAGE
+
+    run_sync.assert_called_once()
+    sleep.assert_not_called()
+
+
+def test_retries_never_outlast_the_deadline(sleep):
+    with patch_agent() as mock_agent_class:
+        run_sync = mock_agent_class.return_value.run_sync
+        run_sync.side_effect = http_error(503, {"retry-after": "5"})
+
+        with deadline_scope(2000):
+            assert complete("prompt", "diff") == FALLBACK_MESSAGE
+
+    run_sync.assert_called_once()
+
+
+def test_provider_rate_limit_headers():
+    error = http_error(
+        429,
+        {
+            "x-ratelimit-remaining-requests": "12",
+            "x-ratelimit-reset-requests": "1s",
+            "x-ratelimit-remaining-tokens": "0",
+            "x-ratelimit-reset-tokens": "1m30s",
+        },
+    )
+
+    # only the exhausted limit counts
+    assert get_retry_delay(error) == 90
+    assert get_retry_delay(http_error(503, {"retry-after-ms": "250"})) == 0.25
+    assert get_retry_delay(http_error(503)) is None
+
+
+def test_parse_duration():
+    assert parse_duration("6m0s") == 360
+    assert parse_duration("250ms") == 0.25
+    assert parse_duration("1h2m3.5s") == 3723.5
+    assert parse_duration("soon") is None
@@ -0,0 +1,124 @@
+from unittest.mock import patch
+
+import pytest
+from pydantic_ai.exceptions import UserError
+
+from aiautocommit.cli import complete
+from aiautocommit.deadline import deadline_scope
+from aiautocommit.routing import (
+    configure_routing,
+    get_diff_stats,
+    select_route,
+    validate_routes,
+)
+
+from tests.utils import patch_agent
+
+ROUTES = [
+    {"name": "docs", "kinds": ["docs"], "model": "openai:docs-model"},
+    {"name": "small", "max_lines": 10, "model": "openai:small-model"},
+    {
+        "name": "large",
+        "min_lines": 500,
+        "model": "openai:large-model",
+        "thinking": "high",
+        "prompt_cutoff": "*",
+    },
+]
+
+
+def make_diff(path, lines):
+    return "\n".join(
+        [f"diff --git a/{path} b/{path}", "@@ -0,0 +1 @@", *["+x"] * lines]
+    )
+
+
+@pytest.fixture
+def routes():
+    configure_routing(ROUTES)
+    yield
+    configure_routing([])
+
+
+def test_diff_stats():
+    diff = (
+        "previous message\n" + make_diff("app.py", 3) + "\n" + make_diff("README.md", 2)
+    )
+
+    stats = get_diff_stats(diff)
+
+    assert (stats.lines, stats.files) == (5, 2)
+    assert stats.kinds == {"source", "docs"}
+
+
+def test_first_matching_route_wins():
+    assert (
+        select_route(make_diff("README.md", 2), "default", 100, ROUTES).name == "docs"
+    )
+    assert select_route(make_diff("app.py", 2), "default", 100, ROUTES).name == "small"
+
+    medium = select_route(make_diff("app.py", 100), "openai:default", 100, ROUTES)
+    assert (medium.name, medium.model_name, medium.prompt_cutoff) == (
+        "default",
+        "openai:default",
+        100,
+    )
+
+    large = select_route(make_diff("app.py", 600), "openai:default", 100, ROUTES)
+    assert large.model_name == "openai:large-model"
+    assert large.prompt_cutoff is None
+    assert large.model_settings == {"thinking": "high"}
+
+
+def test_unknown_route_keys_are_rejected():
+    with pytest.raises(UserError, match=r"Unknown keys in \[\[routes\]\]: max_size"):
+        configure_routing([{"max_size": 10}])
+
+
+@pytest.mark.parametrize(
+    ("rule", "error"),
+    [
+        (
+            {"max_lines": "30"},
+            r"max_lines of route route-0 must be a non-negative integer, got '30'",
+        ),
+        (
+            {"prompt_cutoff": 1.5},
+            r'prompt_cutoff of route route-0 must be an integer or "\*"',
+        ),
+        (
+            {"name": "docs", "kinds": "docs"},
+            r"kinds of route docs must be a list of strings",
+        ),
+    ],
+)
+def test_wrongly_typed_route_values_are_rejected(rule, error):
+    with pytest.raises(UserError, match=error):
+        validate_routes([rule])
+
+
+def test_complete_uses_route_and_records_it(routes):
+    diff = make_diff("app.py", 600)
+
+    with (
+        patch_agent() as mock_agent_class,
+        patch("aiautocommit.cli.PROMPT_CUTOFF", 100),
+        patch("aiautocommit.completion.increment") as increment,
+        deadline_scope(None) as deadline,
+    ):
+        mock_agent_class.return_value.run_sync.return_value.output = "feat: routed"
+
+        assert complete("prompt", diff) == "feat: routed"
+
+        # the whole diff is sent, the large route has no cutoff
+        assert mock_agent_class.return_value.run_sync.call_args[0][0] == diff
+        assert mock_agent_class.call_args.kwargs["model_settings"] == {
+            "thinking": "high"
+        }
+
+    assert increment.call_args.kwargs["route"] == "large"
+    assert deadline.report()["labels"] == {
+        "route": "large",
+        "model": "openai:large-model",
+        "profile": "balanced",
+    }
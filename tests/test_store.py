@@ -0,0 +1,89 @@
+import sqlite3
+from unittest.mock import patch
+
+import pytest
+
+from aiautocommit.cli import main
+from aiautocommit.store import Store, get_store_path, open_store
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = Store(sqlite3.connect(tmp_path / "state.sqlite3"))
+    yield store
+    store.close()
+
+
+def test_changed_context_drops_the_summary(store):
+    store.put_pull_request("12", "context")
+    store.put_pull_request_summary("12", "sha", "summary")
+
+    # the same context keeps the summary written for it
+    store.put_pull_request("12", "context")
+    assert store.get_pull_request_summary("12", "sha") == "summary"
+    assert store.stats()["pull_requests"]["bytes"] == len("context") + len("summary")
+
+    store.put_pull_request("12", "new context")
+    assert store.get_pull_request("12") == "new context"
+    assert store.get_pull_request_summary("12", "sha") is None
+    assert store.stats()["pull_requests"]["bytes"] == len("new context")
+
+
+def test_expired_rows_are_hidden_and_pruned(store):
+    with patch("aiautocommit.store.time.time", return_value=1000.0):
+        store.put_pull_request("12", "context", ttl=60)
+        store.put_pull_request_missing("feature", ttl=60)
+        store.put("style", "key", "value")
+
+    with patch("aiautocommit.store.time.time", return_value=1061.0):
+        assert store.get_pull_request("12") is None
+        assert not store.is_pull_request_missing("feature")
+        assert store.get("style", "key") == "value"
+
+        assert store.stats()["pull_requests"]["expired"] == 1
+        assert store.prune() == (2, 0)
+        assert store.stats()["pull_requests"]["rows"] == 0
+
+
+def test_least_recently_read_rows_are_evicted(store):
+    with patch("aiautocommit.store.MAX_STORE_BYTES", 10):
+        with patch("aiautocommit.store.time.time", return_value=1.0):
+            store.put("cache", "old", "aaaa")
+        with patch("aiautocommit.store.time.time", return_value=2.0):
+            store.put_pull_request("12", "bbbb")
+        with patch("aiautocommit.store.time.time", return_value=3.0):
+            assert store.get("cache", "old") == "aaaa"
+        with patch("aiautocommit.store.time.time", return_value=4.0):
+            store.put("cache", "new", "cccc")
+
+    # reading `old` made the PR the least recently used row
+    assert store.get_pull_request("12") is None
+    assert store.get("cache", "old") == "aaaa"
+    assert store.get("cache", "new") == "cccc"
+
+
+def test_cache_commands(git_repo, runner):
+    with open_store() as store:
+        store.put_pull_request("12", "context", ttl=-1)
+        store.put("cache", "key", "value")
+
+    legacy_file = get_store_path().parent / "12_pull_request.md"
+    legacy_file.write_text("context")
+    branch_lock = get_store_path().parent / "pull_request_feature.lock"
+    branch_lock.touch()
+
+    result = runner.invoke(main, ["cache", "stats"])
+    assert result.exit_code == 0, result.output
+    assert "pull_requests:        1 rows, 0.0 KB, 1 expired" in result.output
+
+    result = runner.invoke(main, ["cache", "prune", "--max-bytes", "0"])
+    assert result.exit_code == 0, result.output
+    assert result.output == (
+        "Deleted 1 expired and evicted 1 least recently used rows, "
+        "removed 2 legacy cache files\n"
+    )
+    assert not legacy_file.exists()
+    assert not branch_lock.exists()
+
+    with open_store() as store:
+        assert store.stats()["entries"]["rows"] == 0
@@ -0,0 +1,96 @@
+import json
+from unittest.mock import MagicMock, patch
+
+import pytest
+from pydantic_ai.exceptions import IncompleteToolCall
+from pydantic_ai.usage import RunUsage
+
+from aiautocommit.cli import FALLBACK_MESSAGE, complete
+from aiautocommit.structured import CommitMessage, render_commit_message
+
+from tests.utils import patch_agent
+
+
+@pytest.fixture
+def structured_output():
+    with (
+        patch("aiautocommit.cli.STRUCTURED_OUTPUT", True),
+        patch("aiautocommit.cli.MAX_OUTPUT_TOKENS", 200),
+    ):
+        yield
+
+
+def succeed(output):
+    result = MagicMock(output=output)
+    result.usage.return_value = RunUsage()
+    return result
+
+
+def test_render_fixes_conventional_commit_rules():
+    message = CommitMessage(
+        type="Feat",
+        scope="Auth Module",
+        subject="Add  login page.",
+        bullets=["- validate tokens", "  ", "2. log failures"],
+        breaking=True,
+    )
+
+    assert render_commit_message(message) == (
+        "feat(auth-module)!: add login page\n\n- validate tokens\n- log failures"
+    )
+
+
+def test_render_keeps_acronyms_and_omits_empty_body():
+    message = CommitMessage(type="fix", subject="API retries", bullets=[])
+
+    assert render_commit_message(message) == "fix: API retries"
+
+
+def test_complete_renders_structured_output(structured_output):
+    with patch_agent() as mock_agent_class:
+        run_sync = mock_agent_class.return_value.run_sync
+        run_sync.return_value = succeed(
+            CommitMessage(type="feat", scope="cli", subject="add structured output")
+        )
+
+        assert complete("prompt", "diff") == "feat(cli): add structured output"
+
+    kwargs = run_sync.call_args.kwargs
+    assert kwargs["output_type"] is CommitMessage
+    assert kwargs["model_settings"]["max_tokens"] == 200
+    assert kwargs["retries"] == {"output": 0}
+    assert "## Structured Output" in kwargs["instructions"]
+
+
+def test_truncated_output_falls_back(structured_output):
+    with patch_agent() as mock_agent_class:
+        run_sync = mock_agent_class.return_value.run_sync
+        run_sync.side_effect = IncompleteToolCall("output token limit reached")
+
+        assert complete("prompt", "diff") == FALLBACK_MESSAGE
+
+    run_sync.assert_called_once()
+
+
+def test_structured_output_is_recorded_and_replayed(structured_output, tmp_path):
+    output = CommitMessage(type="fix", subject="handle empty diff")
+
+    with (
+        patch("aiautocommit.replay.REPLAY_DIR", tmp_path),
+        patch("aiautocommit.replay.REPLAY_MODE", "record"),
+        patch_agent() as mock_agent_class,
+    ):
+        mock_agent_class.return_value.run_sync.return_value = succeed(output)
+        assert complete("prompt", "diff") == "fix: handle empty diff"
+
+    [cassette_file] = tmp_path.glob("*.json")
+    cassette = json.loads(cassette_file.read_text())
+    assert cassette["output_type"] == "CommitMessage"
+    assert cassette["output"]["subject"] == "handle empty diff"
+
+    with (
+        patch("aiautocommit.replay.REPLAY_DIR", tmp_path),
+        patch("aiautocommit.replay.REPLAY_MODE", "replay"),
+        patch("aiautocommit.replay.REPLAY_LATENCY", False),
+    ):
+        assert complete("prompt", "diff") == "fix: handle empty diff"
@@ -0,0 +1,134 @@
+import json
+import subprocess
+from pathlib import Path
+
+from aiautocommit import cli
+from aiautocommit.cli import main
+from aiautocommit.repo import repo_context
+from aiautocommit.style import analyze_commit, get_style_prompt
+
+
+def test_analyze_commit():
+    style = analyze_commit(
+        "abc",
+        "feat(api)!: add retries.\n\n"
+        "- retry failed charges\n- log attempts\n\n"
+        "Co-authored-by: A <a@example.com>\nRefs: #12\n",
+    )
+
+    assert style.conventional_type == "feat"
+    assert style.scope == "api"
+    assert style.breaking
+    assert style.lowercase
+    assert style.trailing_period
+    assert style.has_body and style.bullets
+    assert style.body_width == len("- retry failed charges")
+    assert style.trailers == ["Co-authored-by", "Refs"]
+
+
+def test_plain_subject():
+    style = analyze_commit("abc", "Update README\n")
+
+    assert style.conventional_type is None
+    assert not style.lowercase
+    assert not style.has_body
+    assert style.trailers == []
+
+
+def commit(git_repo, name, message):
+    git_repo.create_file(name, name)
+    git_repo.git_add(name)
+    git_repo.git_commit(message)
+
+
+def test_learned_profile_replaces_examples(runner, git_repo):
+    commit(git_repo, "a.py", "feat(api): add endpoint\n\n- validate input")
+    commit(git_repo, "b.py", "fix(cli): handle empty diff")
+    commit(git_repo, "c.py", "docs: describe setup")
+
+    result = runner.invoke(main, ["learn-style", "--limit", "10"])
+
+    assert result.exit_code == 0
+    assert "Learned from the last 3 commits" in result.output
+    assert "docs (33%), fix (33%), feat (33%)" in result.output
+    assert "Scopes appear in 67% of subjects, most often: cli, api" in result.output
+    assert "start lowercase and have no trailing period" in result.output
+
+    # the next run picks up the new commit without reading the older ones again
+    commit(git_repo, "d.py", "fix: guard against None")
+
+    prompt = runner.invoke(main, ["output-prompt"]).output
+    assert "Learned from the last 4 commits" in prompt
+    assert "## Examples" not in prompt
+
+    profile = json.loads(Path(".git/aiautocommit/style_profile.json").read_text())
+    assert [c["conventional_type"] for c in profile["commits"]] == [
+        "fix",
+        "docs",
+        "fix",
+        "feat",
+    ]
+
+    assert runner.invoke(main, ["learn-style", "--clear"]).exit_code == 0
+    assert "## Examples" in runner.invoke(main, ["output-prompt"]).output
+
+
+def test_linked_worktrees_keep_their_own_profile(
+    runner, git_repo, tmp_path, monkeypatch
+):
+    commit(git_repo, "a.py", "feat(api): add endpoint")
+    assert runner.invoke(main, ["learn-style", "--limit", "10"]).exit_code == 0
+    shared_profile = Path(".git/aiautocommit/style_profile.json").read_text()
+
+    worktree = tmp_path / "wt"
+    subprocess.check_call(["git", "worktree", "add", "-q", "-b", "docs", str(worktree)])
+    subprocess.check_call(
+        ["git", "commit", "-q", "--allow-empty", "-m", "docs: describe setup"],
+        cwd=worktree,
+    )
+
+    main_worktree = Path.cwd()
+    monkeypatch.chdir(worktree)
+
+    # the new worktree starts from the main worktree's profile and refreshes a copy of its own
+    with repo_context():
+        assert "Learned from the last 2 commits" in get_style_prompt()
+
+    monkeypatch.chdir(main_worktree)
+    assert Path(".git/worktrees/wt/aiautocommit/style_profile.json").exists()
+    assert Path(".git/aiautocommit/style_profile.json").read_text() == shared_profile
+
+    assert runner.invoke(main, ["learn-style", "--clear"]).exit_code == 0
+    assert not Path(".git/worktrees/wt/aiautocommit/style_profile.json").exists()
+
+
+def test_watch_refreshes_the_style_prompt(runner, git_repo, monkeypatch):
+    commit(git_repo, "a.py", "feat(api): add endpoint")
+    assert runner.invoke(main, ["learn-style", "--limit", "10"]).exit_code == 0
+
+    monkeypatch.setattr(cli, "COMMIT_PROMPT", "prompt")
+    monkeypatch.setattr(cli, "STYLE_PROMPT", None)
+    cli.configure_prompts()
+    assert "Learned from the last 1 commits" in cli.COMMIT_PROMPT
+
+    commit(git_repo, "b.py", "fix: guard against None")
+    with repo_context():
+        cli.refresh_style_prompt()
+
+    assert "Learned from the last 2 commits" in cli.COMMIT_PROMPT
+    assert "Learned from the last 1 commits" not in cli.COMMIT_PROMPT
+
+
+def test_learn_style_without_commits(runner, git_repo):
+    result = runner.invoke(main, ["learn-style"])
+
+    assert result.exit_code != 0
+    assert "No commits to learn from" in result.output
+
+
+def test_learn_style_outside_a_repository(runner):
+    with runner.isolated_filesystem():
+        result = runner.invoke(main, ["learn-style"])
+
+    assert result.exit_code == 1
+    assert "Not in a git repository" in result.output
@@ -3,7 +3,8 @@ from unittest.mock import ANY, patch
 
 import pytest
 
-from aiautocommit.utils import get_current_branch, run_command
+from aiautocommit.repo import get_current_branch
+from aiautocommit.utils import file_lock, run_command
 
 
 def test_run_command_success():
@@ -29,6 +30,17 @@ def test_run_command_failure():
         run_command(["ls", "/non-existent-directory-12345"], check=True)
 
 
+def test_file_lock_gives_up_after_the_timeout(tmp_path):
+    lock_file = tmp_path / "fetch.lock"
+
+    with file_lock(lock_file):
+        with file_lock(lock_file, timeout=0.1) as locked:
+            assert not locked
+
+    with file_lock(lock_file, timeout=0.1) as locked:
+        assert locked
+
+
 def test_get_current_branch():
     branch = get_current_branch()
     # In a git repo, this should return something
@@ -20,45 +20,45 @@ def test_version_unknown():
 
 
 def test_config_paths_env():
-    if "aiautocommit" in sys.modules:
-        del sys.modules["aiautocommit"]
+    if "aiautocommit.cli" in sys.modules:
+        del sys.modules["aiautocommit.cli"]
 
     with patch.dict(os.environ, {"AIAUTOCOMMIT_CONFIG": "/tmp/custom_config"}):
-        import aiautocommit
+        import aiautocommit.cli
 
-        assert Path("/tmp/custom_config") in aiautocommit.CONFIG_PATHS
+        assert Path("/tmp/custom_config") in aiautocommit.cli.CONFIG_PATHS
 
-    if "aiautocommit" in sys.modules:
-        del sys.modules["aiautocommit"]
-    import aiautocommit
+    if "aiautocommit.cli" in sys.modules:
+        del sys.modules["aiautocommit.cli"]
+    import aiautocommit.cli  # noqa: F401
 
 
 def test_logging_suppression():
-    if "aiautocommit" in sys.modules:
-        del sys.modules["aiautocommit"]
+    if "aiautocommit.cli" in sys.modules:
+        del sys.modules["aiautocommit.cli"]
 
     with patch.dict(os.environ, {}, clear=True):
         with patch("logging.getLogger") as mock_get_logger:
-            import aiautocommit  # noqa: F401
+            import aiautocommit.cli  # noqa: F401
 
             assert mock_get_logger.called
 
-    if "aiautocommit" in sys.modules:
-        del sys.modules["aiautocommit"]
+    if "aiautocommit.cli" in sys.modules:
+        del sys.modules["aiautocommit.cli"]
 
 
 def test_logging_not_suppressed():
-    if "aiautocommit" in sys.modules:
-        del sys.modules["aiautocommit"]
+    if "aiautocommit.cli" in sys.modules:
+        del sys.modules["aiautocommit.cli"]
 
     with patch.dict(os.environ, {"AIAUTOCOMMIT_LOG_PATH": "/tmp/test.log"}):
         with patch("logging.getLogger") as mock_get_logger:
-            import aiautocommit  # noqa: F401
+            import aiautocommit.cli  # noqa: F401
 
             assert not mock_get_logger.called
 
-    if "aiautocommit" in sys.modules:
-        del sys.modules["aiautocommit"]
+    if "aiautocommit.cli" in sys.modules:
+        del sys.modules["aiautocommit.cli"]
 
 
 def test_log_path_env():
@@ -0,0 +1,151 @@
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+from aiautocommit.cli import get_diff, main
+from aiautocommit.utils import get_staged_tree_id
+from aiautocommit.watch import (
+    IndexWatcher,
+    load_precomputed_message,
+    store_precomputed_message,
+)
+
+
+def test_load_precomputed_message_without_watch(git_repo):
+    git_repo.create_file("test.py", "print('hello')")
+    git_repo.git_add("test.py")
+
+    with patch("aiautocommit.watch.get_staged_tree_id") as mock_tree_id:
+        assert load_precomputed_message() is None
+
+    # no precomputed directory means we never pay for `git write-tree`
+    mock_tree_id.assert_not_called()
+
+
+def test_precomputed_message_roundtrip(git_repo):
+    git_repo.create_file("test.py", "print('hello')")
+    git_repo.git_add("test.py")
+
+    store_precomputed_message(get_staged_tree_id(), "feat: precomputed")
+    assert load_precomputed_message() == "feat: precomputed"
+
+    # a different staged tree does not reuse the message
+    git_repo.create_file("other.py", "print('other')")
+    git_repo.git_add("other.py")
+    assert load_precomputed_message() is None
+
+
+def test_commit_uses_precomputed_message(runner, git_repo):
+    git_repo.create_file("test.py", "print('hello')")
+    git_repo.git_add("test.py")
+    store_precomputed_message(get_staged_tree_id(), "feat: precomputed")
+
+    with patch("aiautocommit.cli.generate_commit_message") as mock_generate:
+        result = runner.invoke(main, ["commit", "--print-message"])
+
+    assert result.exit_code == 0
+    assert "feat: precomputed" in result.output
+    mock_generate.assert_not_called()
+
+
+def make_watcher(index_path, tree_ids, generate=None):
+    store = MagicMock()
+    watcher = IndexWatcher(
+        index_path,
+        generate or (lambda tree_id: "feat: generated"),
+        debounce=1.0,
+        min_interval=5.0,
+        tree_id_getter=lambda: tree_ids[0],
+        store=store,
+    )
+    watcher.executor = MagicMock()
+    return watcher, store
+
+
+def touch_index(index_path: Path, content: str):
+    index_path.write_text(content)
+
+
+def test_watcher_debounces_index_changes(tmp_path):
+    index_path = tmp_path / "index"
+    touch_index(index_path, "a")
+    watcher, _ = make_watcher(index_path, ["tree-a"])
+
+    touch_index(index_path, "ab")
+    watcher.tick(10.0)
+    watcher.tick(10.5)
+    watcher.executor.submit.assert_not_called()
+
+    watcher.tick(11.0)
+    watcher.executor.submit.assert_called_once_with(watcher.generate_for_tree, "tree-a")
+
+
+def test_watcher_rate_limits_and_cancels_superseded(tmp_path):
+    index_path = tmp_path / "index"
+    touch_index(index_path, "a")
+    tree_ids = ["tree-a"]
+    watcher, _ = make_watcher(index_path, tree_ids)
+
+    touch_index(index_path, "ab")
+    watcher.tick(0.0)
+    watcher.tick(1.0)
+    first_future = watcher.pending
+    assert watcher.executor.submit.call_count == 1
+
+    tree_ids[0] = "tree-b"
+    touch_index(index_path, "abc")
+    watcher.tick(2.0)
+    watcher.tick(3.0)
+
+    # inside min_interval, nothing new is started
+    assert watcher.executor.submit.call_count == 1
+
+    watcher.tick(6.0)
+    assert watcher.executor.submit.call_count == 2
+    first_future.cancel.assert_called_once()
+
+
+def test_watcher_discards_superseded_result(tmp_path):
+    index_path = tmp_path / "index"
+    touch_index(index_path, "a")
+    watcher, store = make_watcher(index_path, ["tree-a"])
+
+    watcher.current_tree_id = "tree-b"
+    watcher.generate_for_tree("tree-a")
+    store.assert_not_called()
+
+    watcher.current_tree_id = "tree-a"
+    watcher.generate_for_tree("tree-a")
+    store.assert_called_once_with("tree-a", "feat: generated")
+
+
+def test_watcher_skips_fallback_messages(tmp_path):
+    index_path = tmp_path / "index"
+    touch_index(index_path, "a")
+    watcher, store = make_watcher(
+        index_path,
+        ["tree-a"],
+        generate=lambda tree_id: "# aiautocommit: AI model unavailable",
+    )
+
+    watcher.current_tree_id = "tree-a"
+    watcher.generate_for_tree("tree-a")
+    store.assert_not_called()
+
+
+def test_diff_for_a_tree_ignores_later_staging(git_repo):
+    git_repo.create_file("test.py", "print('hello')\n")
+    git_repo.git_add("test.py")
+    git_repo.git_commit("initial")
+
+    git_repo.create_file("app.py", "x = 1\n")
+    git_repo.git_add("app.py")
+    tree_id = get_staged_tree_id()
+
+    # staged while the debounced generation for `tree_id` was waiting
+    git_repo.create_file("late.py", "y = 2\n")
+    git_repo.git_add("late.py")
+
+    diff = get_diff(tree=tree_id)
+
+    assert "app.py" in diff
+    assert "late.py" not in diff
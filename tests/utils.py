@@ -1,5 +1,7 @@
 import os
 import subprocess
+from contextlib import contextmanager
+from unittest.mock import MagicMock, patch
 
 
 class GitTestMixin:
@@ -29,3 +31,13 @@ class GitTestMixin:
         """Remove COMMIT_EDITMSG to avoid stale detection."""
         if os.path.exists(".git/COMMIT_EDITMSG"):
             os.remove(".git/COMMIT_EDITMSG")
+
+
+@contextmanager
+def patch_agent(model=None):
+    """Patch the pooled agent class, and model inference so no provider or API key is needed."""
+    with (
+        patch("aiautocommit.model.infer_model", return_value=model or MagicMock()),
+        patch("aiautocommit.model.Agent") as mock_agent_class,
+    ):
+        yield mock_agent_class